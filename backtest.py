@@ -0,0 +1,323 @@
+"""
+历史回测
+在每条 K 线序列上滑动窗口，以每一根历史 K 线收盘时的状态重新触发 rule_variants.json 中的规则
+信号出现后模拟交易 (与 index.html 计算器一致):
+    入场: 之后的 K 线触及突破价 (breakout)，跳空越过突破价按开盘价成交
+    止损: 规则给出的止损价 (stop，如 w3.low)
+    目标: 1:1 平衡点 target1 = 入场价 + |入场价 - 止损价| × 方向
+按品种统计命中率 (止盈 / (止盈 + 止损)) 和期望值 (平均 R 倍数)
+
+规则在一个大矩阵上求值: 所有 (合约, 时点) 的窗口一次堆成 BarPanel
+成交模拟按未来第 1..H 根 K 线推进，每一步对所有信号同时判断
+
+用法:
+    python backtest.py                                  # 期货周线 (futures_data.js)，pending_kdj 规则集
+    python backtest.py --stocks                         # A股季线 (bar_cache/daily 日线缓存合成)，stock_pending 规则集
+    python backtest.py --rules pending_long_max_breakout --horizon 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bar_store import BarStore
+from indicators import kdj_arrays
+from resample import resample_many
+from rule_engine import PANEL_FIELDS, RULE_SETS, BarPanel, product_contracts
+
+# 交易结果
+WIN, LOSS, OPEN = 1, -1, 0
+
+
+def rolling_panel(items, window):
+    """
+    把每条序列的每一个历史时点展开成一行: 第 t 行是截至该 K 线收盘时最近 window 根 K 线
+
+    items: [(key, BarSeries), ...]
+    返回 (panel, full, series_idx, bar_idx)
+        panel:      BarPanel，每行一个 (序列, 时点)，length 为截至该时点的 K 线数
+        full:       整段历史的右对齐矩阵 (序列 × T)，成交模拟用
+        series_idx: 每行对应 items 中的序号
+        bar_idx:    每行对应的 K 线在 full 中的列号
+    只展开之后还有 K 线的时点 (最后一根之后无法成交)
+    """
+    items = list(items)
+    total = max((len(bars) for _, bars in items), default=0)
+    full = BarPanel.from_series(items, total)
+    # 左侧多补 window - 1 列，让第一根 K 线也有完整窗口
+    padded = {name: np.pad(getattr(full, name), ((0, 0), (window - 1, 0)), constant_values=np.nan)
+              for name in PANEL_FIELDS}
+
+    first = total - np.minimum(full.length, total)
+    cols = np.arange(total - 1)
+    series_idx, bar_idx = np.nonzero(cols[np.newaxis, :] >= first[:, np.newaxis])
+
+    fields = {name: sliding_window_view(padded[name], window, axis=1)[series_idx, bar_idx]
+              for name in PANEL_FIELDS}
+    keys = [items[i][0] for i in series_idx]
+    panel = BarPanel(keys, bar_idx - first[series_idx] + 1, **fields)
+    return panel, full, series_idx, bar_idx
+
+
+def simulate(full, series_idx, bar_idx, direction, breakout, stop, horizon=12, entry_bars=1):
+    """
+    从信号 K 线之后逐根推进，所有信号同时模拟
+
+    direction: +1 做多 / -1 做空；breakout / stop: 突破价 / 止损价
+    entry_bars: 信号后多少根 K 线内未触及突破价即放弃 (默认只看下一根，之后由新的信号接力)
+    同一根 K 线既触及止损又触及目标时按止损计 (保守)
+    返回 {entered, entry, target, exit, outcome, r, held}
+    """
+    n = len(series_idx)
+    last = full.window - 1
+    # 空头把价格取负，统一按多头处理
+    level = direction * breakout
+    stop_ = direction * stop
+
+    entered = np.zeros(n, dtype=bool)
+    done = np.zeros(n, dtype=bool)
+    entry = np.full(n, np.nan)
+    target = np.full(n, np.nan)
+    exit_ = np.full(n, np.nan)
+    outcome = np.full(n, OPEN, dtype=np.int8)
+    held = np.zeros(n, dtype=np.int64)
+
+    for step in range(1, horizon + 1):
+        col = bar_idx + step
+        alive = ~done & (col <= last)
+        if not alive.any():
+            break
+        col = np.minimum(col, last)
+        up = direction > 0
+        o = direction * full.open[series_idx, col]
+        hi = np.where(up, full.high[series_idx, col], -full.low[series_idx, col])
+        lo = np.where(up, full.low[series_idx, col], -full.high[series_idx, col])
+
+        # 已持仓: 先看开盘跳空，再看盘中触及
+        holding = alive & entered
+        held[holding] += 1
+        gap_stop = holding & (o <= stop_)
+        hit_stop = holding & ~gap_stop & (lo <= stop_)
+        gap_target = holding & ~gap_stop & ~hit_stop & (o >= target)
+        hit_target = holding & ~gap_stop & ~hit_stop & ~gap_target & (hi >= target)
+        exit_[gap_stop | gap_target] = o[gap_stop | gap_target]
+        exit_[hit_stop] = stop_[hit_stop]
+        exit_[hit_target] = target[hit_target]
+        outcome[gap_stop | hit_stop] = LOSS
+        outcome[gap_target | hit_target] = WIN
+        done |= gap_stop | hit_stop | gap_target | hit_target
+
+        # 等待入场
+        waiting = alive & ~entered
+        trigger = waiting & (hi >= level)
+        fill = np.where(o > level, o, level)
+        entry[trigger] = fill[trigger]
+        target[trigger] = 2 * fill[trigger] - stop_[trigger]
+        entered |= trigger
+        held[trigger] = 1
+        # 入场当根: 不知道盘中先后，触及止损按止损计
+        same_stop = trigger & (lo <= stop_)
+        same_target = trigger & ~same_stop & (hi >= target)
+        exit_[same_stop] = stop_[same_stop]
+        exit_[same_target] = target[same_target]
+        outcome[same_stop] = LOSS
+        outcome[same_target] = WIN
+        done |= same_stop | same_target
+        done |= waiting & ~trigger & (step >= entry_bars)
+
+    # 到期仍持仓: 按最后一根收盘价计浮动盈亏
+    still_open = entered & ~done
+    close_col = np.minimum(bar_idx + horizon, last)
+    mark = direction * full.close[series_idx, close_col]
+    exit_[still_open] = mark[still_open]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (exit_ - entry) / (entry - stop_)
+    sign = direction.astype(float)
+    return {
+        'entered': entered,
+        'entry': sign * entry,
+        'target': sign * target,
+        'exit': sign * exit_,
+        'outcome': outcome,
+        'r': r,
+        'held': held,
+    }
+
+
+def backtest(items, rule_set, horizon=12, entry_bars=1):
+    """
+    items: [((品种, 合约), BarSeries), ...]
+    rule_set: rule_dsl.RuleSet，只回测定义了 breakout / stop 价位的状态
+    返回 (panel, trades)
+        trades: 每个信号一行的数组字典，含 row (panel 行号)、status、direction 及 simulate() 的结果
+    """
+    items = list(items)
+    panel, full, series_idx, bar_idx = rolling_panel(items, rule_set.window)
+    return panel, backtest_panel(panel, full, series_idx, bar_idx, rule_set, horizon, entry_bars)
+
+
+def backtest_panel(panel, full, series_idx, bar_idx, rule_set, horizon=12, entry_bars=1, **overrides):
+    """
+    在 rolling_panel() 的结果上回测 (同一个矩阵可换不同的 K/D 反复回测，见 kdj_sweep.py)
+    overrides: 透传给 rule_set.levels，如 K=, D= (每行信号 K 线的值)
+    返回 trades
+    """
+    status, levels = rule_set.levels(panel, **overrides)
+    if 'breakout' not in levels or 'stop' not in levels:
+        raise ValueError(f"规则集 {rule_set.name} 没有定义 breakout / stop 价位，无法回测")
+
+    rows = np.flatnonzero(~np.isnan(levels['breakout']) & ~np.isnan(levels['stop']))
+    direction = np.array([1 if 'long' in s else -1 for s in status[rows]], dtype=np.int64)
+    breakout = levels['breakout'][rows]
+    stop = levels['stop'][rows]
+    # 止损必须在突破价的另一侧
+    valid = direction * (breakout - stop) > 0
+    rows, direction, breakout, stop = rows[valid], direction[valid], breakout[valid], stop[valid]
+
+    trades = simulate(full, series_idx[rows], bar_idx[rows], direction, breakout, stop,
+                      horizon=horizon, entry_bars=entry_bars)
+    trades.update(row=rows, status=status[rows], direction=direction, breakout=breakout, stop=stop)
+    return trades
+
+
+def summarize(panel, trades):
+    """
+    按品种 (key 的第一项) 汇总
+    返回 [{product, signals, entered, wins, losses, open, hit_rate, expectancy, avg_held}, ...]
+    expectancy 为已平仓交易的平均 R 倍数 (1:1 目标下约等于 2 × 命中率 - 1，跳空会有偏差)
+    """
+    products = np.array([panel.keys[row][0] for row in trades['row']], dtype=object)
+    if not len(products):
+        return []
+    names, group = np.unique(products, return_inverse=True)
+    count = len(names)
+
+    def total(mask, weights=None):
+        return np.bincount(group[mask], weights=None if weights is None else weights[mask], minlength=count)
+
+    everything = np.ones(len(group), dtype=bool)
+    entered = trades['entered']
+    wins = total(trades['outcome'] == WIN)
+    losses = total(trades['outcome'] == LOSS)
+    closed_mask = entered & (trades['outcome'] != OPEN)
+    closed = wins + losses
+    r_sum = total(closed_mask, trades['r'])
+    held_sum = total(closed_mask, trades['held'].astype(float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = wins / closed
+        expectancy = r_sum / closed
+        avg_held = held_sum / closed
+
+    signals = total(everything)
+    entries = total(entered)
+    return [{
+        'product': names[i],
+        'signals': int(signals[i]),
+        'entered': int(entries[i]),
+        'wins': int(wins[i]),
+        'losses': int(losses[i]),
+        'open': int(entries[i] - closed[i]),
+        'hit_rate': float(hit_rate[i]),
+        'expectancy': float(expectancy[i]),
+        'avg_held': float(avg_held[i]),
+    } for i in range(count)]
+
+
+def futures_items(path="futures_data.js", main_only=False):
+    """futures_data.js -> [((品种代码, 合约), BarSeries), ...]，附 {代码: 名称}"""
+    from futures_loader import load_futures_series
+
+    products = load_futures_series(path)
+    items = [((code, contract.symbol), contract.bars)
+             for code, _, contract in product_contracts(products, main_only)]
+    return items, {code: product.name for code, product in products.items()}
+
+
+def attach_kdj(series):
+    """一次算出所有序列的 KDJ (右对齐矩阵，按时间递推、跨序列向量化)，写回各 BarSeries"""
+    if not series:
+        return
+    width = max(len(bars) for bars in series)
+    matrix = {name: np.full((len(series), width), np.nan) for name in ('high', 'low', 'close')}
+    for i, bars in enumerate(series):
+        for name in matrix:
+            matrix[name][i, width - len(bars):] = getattr(bars, name)
+    k, d, j = (np.round(x, 2) for x in kdj_arrays(matrix['high'], matrix['low'], matrix['close']))
+    for i, bars in enumerate(series):
+        bars.K, bars.D, bars.J = k[i, width - len(bars):], d[i, width - len(bars):], j[i, width - len(bars):]
+
+
+def stock_items(root="bar_cache/daily"):
+    """日线缓存目录 -> [((代码, 代码), 季线 BarSeries), ...]"""
+    store = BarStore(root)
+    codes, daily = [], []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        if not name.endswith('.npy'):
+            continue
+        code = name[:-4]
+        bars = store.load(code, mmap=False)
+        if bars is None or len(bars) == 0:
+            continue
+        codes.append(code)
+        daily.append(bars)
+    # 季线与 fetch_stocks_quarterly.daily_to_quarterly 相同，所有股票一次聚合
+    items = [((code, code), bars) for code, bars in zip(codes, resample_many(daily, 'Q'))]
+    attach_kdj([bars for _, bars in items])
+    return items, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则历史回测: 突破入场，止损 / 1:1 目标离场")
+    parser.add_argument('--rules', default=None, help="规则集名称 (默认期货 pending_kdj，股票 stock_pending)")
+    parser.add_argument('--data', default="futures_data.js")
+    parser.add_argument('--stocks', action='store_true', help="回测 A 股季线 (日线缓存合成)")
+    parser.add_argument('--bar-cache', default="bar_cache/daily")
+    parser.add_argument('--main-only', action='store_true')
+    parser.add_argument('--horizon', type=int, default=12, help="入场后最多持有的 K 线数")
+    parser.add_argument('--entry-bars', type=int, default=1, help="信号后多少根 K 线内等待突破")
+    parser.add_argument('--top', type=int, default=30, help="按信号数列出前 N 个品种 (0 为全部)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.stocks:
+        items, names = stock_items(args.bar_cache)
+        rule_name = args.rules or 'stock_pending'
+    else:
+        items, names = futures_items(args.data, args.main_only)
+        rule_name = args.rules or 'pending_kdj'
+    if not items:
+        print("没有可回测的 K 线数据")
+        return 1
+    loaded = time.perf_counter()
+
+    panel, trades = backtest(items, RULE_SETS[rule_name], args.horizon, args.entry_bars)
+    rows = summarize(panel, trades)
+    done = time.perf_counter()
+
+    rows.sort(key=lambda r: (-r['signals'], r['product']))
+    shown = rows[:args.top] if args.top else rows
+    print(f"规则集: {rule_name}  序列: {len(items)}  历史时点: {len(panel)}  信号: {len(trades['row'])}")
+    print(f"{'品种':<12}{'信号':>6}{'入场':>6}{'止盈':>6}{'止损':>6}{'持仓':>6}{'命中率':>9}{'期望R':>8}{'平均持有':>9}")
+    for r in shown:
+        label = f"{names.get(r['product'], '')}({r['product']})" if names else r['product']
+        hit = f"{r['hit_rate']:.1%}" if r['wins'] + r['losses'] else "-"
+        exp = f"{r['expectancy']:+.2f}" if r['wins'] + r['losses'] else "-"
+        held = f"{r['avg_held']:.1f}" if r['wins'] + r['losses'] else "-"
+        print(f"{label:<12}{r['signals']:>6}{r['entered']:>6}{r['wins']:>6}{r['losses']:>6}{r['open']:>6}{hit:>9}{exp:>8}{held:>9}")
+
+    closed = trades['entered'] & (trades['outcome'] != OPEN)
+    if closed.any():
+        wins = int((trades['outcome'] == WIN).sum())
+        print(f"\n合计: 入场 {int(trades['entered'].sum())}，平仓 {int(closed.sum())}，"
+              f"命中率 {wins / closed.sum():.1%}，期望 {np.mean(trades['r'][closed]):+.3f} R")
+    print(f"读取 {(loaded - start) * 1000:.1f} ms，回测 {(done - loaded) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
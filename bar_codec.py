@@ -0,0 +1,322 @@
+"""
+K 线紧凑存储编码
+[{date, open, high, low, close, volume, K, D, J}, ...] 的字典列表改为列式整数:
+    价格      按最小变动价位 (futures_specs.js 的 tickSize，股票 0.01) 换成跳数；
+              收盘价存相邻 K 线的差，开 / 高 / 低存与当根收盘价的差 (都是小整数)
+    日期      第一天 + 相邻日期的天数差
+    K/D/J     两位小数定点整数 (× 100)
+    成交量    整数
+解码结果与原始记录逐值相同 (编码时校验，价格不在 tick 网格上时改用能精确表示的 10^-n，仍不行则保留原样)；
+值的类型也保持不变: 默认价格 / KDJ 为 float、成交量为 int，不同的列 (如 PK 补丁数据中整数的 K/D/J) 记在 types 中，
+同一列 int 与 float 混用的记录不编码。decode_many / decode_columns 返回的数组统一为 float
+
+使用编码的存储 (读取时自动解码，调用方拿到的仍是原来的 data 列表):
+    futures_data.shards/*.json   futures_store 的品种分片 (浏览器包 futures_data.js 仍为普通 JSON)
+    scan_state/done.ndjson       股票扫描检查点
+    json_stream.iter_records     遇到编码过的记录同样解码
+
+用法: python bar_codec.py [futures_data.js] [stock_quarterly_pending.json]   # 体积和解码速度对比
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import re
+import time
+from decimal import Decimal
+from functools import lru_cache
+
+import numpy as np
+
+SPECS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "futures_specs.js")
+STOCK_TICK = 0.01
+RECORD_KEYS = ('date', 'open', 'high', 'low', 'close', 'volume', 'K', 'D', 'J')
+KDJ_KEYS = ('K', 'D', 'J')
+KDJ_SCALE = 100
+# 价格不在给定 tick 上时依次尝试的小数位数
+FALLBACK_DECIMALS = range(0, 7)
+
+_TICK_PATTERN = re.compile(r"'(\w+)':\s*\{[^}]*?tickSize:\s*([0-9.]+)")
+
+
+@lru_cache(maxsize=None)
+def load_tick_sizes(path=SPECS_FILE):
+    """futures_specs.js -> {品种代码: tickSize}；文件不存在时为空"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return {}
+    return {code.upper(): float(tick) for code, tick in _TICK_PATTERN.findall(text)}
+
+
+def tick_size(code, path=SPECS_FILE):
+    """品种的最小变动价位，未知品种为 None (编码时按价格的小数位数自动选择)"""
+    return load_tick_sizes(path).get(str(code).upper())
+
+
+def _tick_units(tick):
+    """tick -> (units, scale)，tick == units / scale，两者都是整数"""
+    exponent = Decimal(repr(float(tick))).normalize().as_tuple().exponent
+    scale = 10 ** max(0, -exponent)
+    return int(round(tick * scale)), scale
+
+
+def _to_ticks(values, tick):
+    """价格 -> 跳数；不能精确还原时返回 None"""
+    units, scale = _tick_units(tick)
+    if units <= 0:
+        return None
+    with np.errstate(invalid='ignore'):
+        counts = np.rint(values * scale / units)
+    if not np.isfinite(counts).all() or np.abs(counts).max(initial=0) * units >= 2 ** 53:
+        return None
+    counts = counts.astype(np.int64)
+    return counts if np.array_equal(counts * units / scale, values) else None
+
+
+def _fit_ticks(prices, tick):
+    """先用品种 tick，不行再试 10^-n (n 从小到大)；返回 (tick, 跳数矩阵) 或 (None, None)"""
+    candidates = ([tick] if tick else []) + [float(10.0 ** -d) for d in FALLBACK_DECIMALS]
+    for candidate in candidates:
+        counts = _to_ticks(prices, candidate)
+        if counts is not None:
+            return candidate, counts
+    return None, None
+
+
+def encode_records(records, tick=None):
+    """
+    K 线记录列表 -> 编码后的字典；记录字段不是标准的 9 个、或有值无法精确编码时返回 None
+    tick: 最小变动价位 (None 时按价格的小数位数选择)
+    """
+    if not records or any(tuple(r) != RECORD_KEYS for r in records):
+        return None
+    try:
+        columns = {key: np.array([r[key] for r in records], dtype=float) for key in RECORD_KEYS[1:]}
+        dates = np.array([r['date'] for r in records], dtype='datetime64[D]')
+    except (TypeError, ValueError):
+        return None
+    if np.datetime_as_string(dates, unit='D').tolist() != [r['date'] for r in records]:
+        return None
+    types = {}
+    for key in RECORD_KEYS[1:]:
+        kinds = {type(r[key]) for r in records}
+        if len(kinds) != 1 or not kinds <= {int, float}:
+            return None
+        kind = 'int' if kinds == {int} else 'float'
+        if kind != _default_type(key):
+            types[key] = kind
+
+    tick, prices = _fit_ticks(np.stack([columns[key] for key in ('open', 'high', 'low', 'close')]), tick)
+    volume = columns['volume']
+    kdj = np.stack([columns[key] for key in KDJ_KEYS]) * KDJ_SCALE
+    with np.errstate(invalid='ignore'):
+        kdj_int = np.rint(kdj)
+    if (tick is None or not np.isfinite(volume).all() or not np.array_equal(volume, np.rint(volume))
+            or not np.isfinite(kdj_int).all()
+            or not np.array_equal(kdj_int / KDJ_SCALE, np.stack([columns[key] for key in KDJ_KEYS]))):
+        return None
+
+    open_, high, low, close = prices
+    encoded = {
+        'tick': tick,
+        't0': records[0]['date'],
+        'dt': np.diff(dates.astype(np.int64)).tolist(),
+        'c': np.diff(close, prepend=0).tolist(),
+        'o': (open_ - close).tolist(),
+        'h': (high - close).tolist(),
+        'l': (low - close).tolist(),
+        'v': volume.astype(np.int64).tolist(),
+    }
+    for key, values in zip(KDJ_KEYS, kdj_int.astype(np.int64)):
+        encoded[key] = values.tolist()
+    if types:
+        encoded['types'] = types
+    return encoded
+
+
+def _default_type(key):
+    return 'int' if key == 'volume' else 'float'
+
+
+def is_encoded(value):
+    return isinstance(value, dict) and 'tick' in value and 'c' in value
+
+
+def _segment_cumsum(values, lengths):
+    """按段 (每段一条序列) 分别求累加和"""
+    total = np.cumsum(values)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    base = total[starts] - values[starts] if len(values) else total[:0]
+    return total - np.repeat(base, lengths)
+
+
+def decode_many(encoded_list):
+    """
+    一批编码字典 -> [{字段: NumPy 数组}, ...]，date 为 datetime64[D]
+    所有序列拼成一个数组一次解码再切开 (单条序列只有十几根 K 线，逐条解码时 NumPy 调用开销占大头)
+    """
+    encoded_list = list(encoded_list)
+    if not encoded_list:
+        return []
+    lengths = np.array([len(e['c']) for e in encoded_list], dtype=np.int64)
+    count = int(lengths.sum())
+
+    def column(key):
+        return np.fromiter(itertools.chain.from_iterable(e[key] for e in encoded_list), np.int64, count)
+
+    days = np.fromiter(itertools.chain.from_iterable(itertools.chain((0,), e['dt']) for e in encoded_list),
+                       np.int64, count)
+    first = np.array([e['t0'] for e in encoded_list], dtype='datetime64[D]')
+    date = np.repeat(first, lengths) + _segment_cumsum(days, lengths).astype('timedelta64[D]')
+    ticks = [_tick_units(e['tick']) for e in encoded_list]
+    units = np.repeat([u for u, _ in ticks], lengths)
+    scale = np.repeat([s for _, s in ticks], lengths).astype(float)
+    close = _segment_cumsum(column('c'), lengths)
+
+    columns = {'date': date}
+    for key in ('open', 'high', 'low'):
+        columns[key] = (close + column(key[0])) * units / scale
+    columns['close'] = close * units / scale
+    columns['volume'] = column('v').astype(float)
+    for key in KDJ_KEYS:
+        columns[key] = column(key) / KDJ_SCALE
+
+    bounds = np.cumsum(lengths)[:-1]
+    split = {key: np.split(values, bounds) for key, values in columns.items()}
+    return [{key: split[key][i] for key in columns} for i in range(len(encoded_list))]
+
+
+def decode_columns(encoded):
+    """编码字典 -> {字段: NumPy 数组}，date 为 datetime64[D]"""
+    return decode_many([encoded])[0]
+
+
+def decode_records(encoded):
+    """编码字典 -> 原来的记录列表 (各列恢复原来的 int / float 类型)"""
+    columns = decode_columns(encoded)
+    types = encoded.get('types') or {}
+    values = [np.datetime_as_string(columns['date'], unit='D').tolist()]
+    for key in RECORD_KEYS[1:]:
+        column = columns[key].astype(np.int64) if types.get(key, _default_type(key)) == 'int' else columns[key]
+        values.append(column.tolist())
+    return [dict(zip(RECORD_KEYS, row)) for row in zip(*values)]
+
+
+def decode_series(encoded_list):
+    """一批编码字典 -> [BarSeries, ...] (不经过字典列表)"""
+    from bar_series import BarSeries
+
+    return [BarSeries(*(columns[key] for key in BarSeries.FIELDS)) for columns in decode_many(encoded_list)]
+
+
+def pack(container, tick=None):
+    """
+    把字典中的 data (K 线记录列表) 换成编码后的 bars，其余字段和顺序不变
+    无法编码时原样返回
+    """
+    encoded = encode_records(container.get('data'), tick)
+    if encoded is None:
+        return container
+    return {('bars' if key == 'data' else key): (encoded if key == 'data' else value)
+            for key, value in container.items()}
+
+
+def unpack(container):
+    """pack 的逆操作；没有编码的字典原样返回"""
+    if not isinstance(container, dict) or not is_encoded(container.get('bars')):
+        return container
+    return {('data' if key == 'bars' else key): (decode_records(value) if key == 'bars' else value)
+            for key, value in container.items()}
+
+
+def pack_product(code, product):
+    """期货品种 (futures_data.js 中的一项): 主力 / 次主力按品种 tick 编码"""
+    tick = tick_size(code)
+    return {key: (pack(value, tick) if key in ('main', 'sub') and value else value)
+            for key, value in product.items()}
+
+
+def unpack_product(product):
+    return {key: (unpack(value) if key in ('main', 'sub') and value else value)
+            for key, value in product.items()}
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(name, file_bytes, plain, encoded, to_series, repeat=5):
+    """
+    plain / encoded: 同一份数据的普通 / 编码 JSON 文本
+    to_series(obj, encoded): 把解析后的对象转成 BarSeries 列表 (计时包含 json.loads)
+    """
+    bars = sum(len(s) for s in to_series(json.loads(plain), False))
+    sizes = {
+        'file': file_bytes,
+        'json': len(plain.encode('utf-8')),
+        'codec': len(encoded.encode('utf-8')),
+        'json.gz': len(gzip.compress(plain.encode('utf-8'), 6)),
+        'codec.gz': len(gzip.compress(encoded.encode('utf-8'), 6)),
+    }
+    plain_time = _best_time(lambda: to_series(json.loads(plain), False), repeat)
+    codec_time = _best_time(lambda: to_series(json.loads(encoded), True), repeat)
+    print(f"{name}: {bars} 根 K 线")
+    print("  体积  " + "  ".join(f"{key} {value / 2 ** 10:.0f} KB" for key, value in sizes.items())
+          + f"  (codec / 原文件 {sizes['codec'] / file_bytes:.1%})")
+    print(f"  解码  JSON {bars / plain_time / 1e6:.2f} M bars/s ({plain_time * 1000:.1f} ms)  "
+          f"codec {bars / codec_time / 1e6:.2f} M bars/s ({codec_time * 1000:.1f} ms)")
+
+
+def main():
+    from bar_series import BarSeries
+    from futures_loader import parse_futures_js
+    from json_stream import PENDING_FILE
+
+    parser = argparse.ArgumentParser(description="K 线编码的体积和解码速度对比")
+    parser.add_argument('futures', nargs='?', default="futures_data.js")
+    parser.add_argument('stocks', nargs='?', default=PENDING_FILE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    def to_series(containers, encoded):
+        if encoded:
+            return decode_series(c['bars'] for c in containers)
+        return [BarSeries.from_records(c.get('data') or []) for c in containers]
+
+    def contract_series(data, encoded):
+        return to_series([product[key] for product in data.values() for key in ('main', 'sub') if product.get(key)],
+                         encoded)
+
+    def stock_series(records, encoded):
+        return to_series(records, encoded)
+
+    if os.path.exists(args.futures):
+        with open(args.futures, 'r', encoding='utf-8') as f:
+            data = parse_futures_js(f.read())
+        packed = {code: pack_product(code, product) for code, product in data.items()}
+        # 按序列化结果比较，int / float 不同也算不一致
+        assert _dumps({code: unpack_product(p) for code, p in packed.items()}) == _dumps(data)
+        compare(args.futures, os.path.getsize(args.futures), _dumps(data), _dumps(packed), contract_series, args.repeat)
+    if os.path.exists(args.stocks):
+        with open(args.stocks, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        packed = [pack(r, STOCK_TICK) for r in records]
+        assert _dumps([unpack(r) for r in packed]) == _dumps(records)
+        compare(args.stocks, os.path.getsize(args.stocks), _dumps(records), _dumps(packed), stock_series, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+K 线序列的列式表示
+每个字段一个 NumPy 数组，替代 [{date, open, high, ...}, ...] 的字典列表
+规则脚本用数组切片 (series.high[-3]) 代替 bars[-3]['high']
+"""
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+KDJ_FIELDS = ('K', 'D', 'J')
+
+
+class BarSeries:
+    """一条 K 线序列: date 为 datetime64[D]，其余为 float64 (缺失为 NaN)"""
+
+    __slots__ = ('date', 'open', 'high', 'low', 'close', 'volume', 'K', 'D', 'J')
+    FIELDS = __slots__
+
+    def __init__(self, date, open, high, low, close, volume=None, K=None, D=None, J=None):
+        self.date = np.asarray(date, dtype='datetime64[D]')
+        n = len(self.date)
+        self.open = np.asarray(open, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self.volume = np.full(n, np.nan) if volume is None else np.asarray(volume, dtype=float)
+        self.K = np.full(n, np.nan) if K is None else np.asarray(K, dtype=float)
+        self.D = np.full(n, np.nan) if D is None else np.asarray(D, dtype=float)
+        self.J = np.full(n, np.nan) if J is None else np.asarray(J, dtype=float)
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, index):
+        """切片返回新的 BarSeries (共享底层数组)"""
+        if not isinstance(index, slice):
+            raise TypeError("BarSeries 只支持切片，单根 K 线请直接取字段: series.high[i]")
+        return BarSeries(*(getattr(self, name)[index] for name in self.FIELDS))
+
+    def __repr__(self):
+        if not len(self):
+            return "BarSeries(0 bars)"
+        return f"BarSeries({len(self)} bars, {self.date[0]} ~ {self.date[-1]})"
+
+    def tail(self, n):
+        return self[-n:] if n else self[:0]
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    @classmethod
+    def from_records(cls, records):
+        """从 futures_data.js 中的 data 列表构建"""
+        def column(key):
+            return [np.nan if r.get(key) is None else r[key] for r in records]
+        return cls(
+            [r['date'] for r in records],
+            *(column(key) for key in PRICE_FIELDS),
+            volume=column('volume'),
+            K=column('K'), D=column('D'), J=column('J'),
+        )
+
+    @classmethod
+    def from_frame(cls, df):
+        """从 DataFrame (date/open/high/low/close/volume[/K/D/J]) 构建"""
+        def column(key):
+            return df[key].to_numpy(dtype=float) if key in df.columns else None
+        return cls(
+            pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]'),
+            *(df[key].to_numpy(dtype=float) for key in PRICE_FIELDS),
+            volume=column('volume'),
+            K=column('K'), D=column('D'), J=column('J'),
+        )
+
+    def to_records(self):
+        """转回 futures_data.js 的 data 列表格式"""
+        dates = np.datetime_as_string(self.date, unit='D').tolist()
+        volume = np.nan_to_num(self.volume, nan=0).astype(np.int64).tolist()
+        columns = [getattr(self, name).tolist() for name in PRICE_FIELDS + KDJ_FIELDS]
+        records = []
+        for i, date in enumerate(dates):
+            record = {"date": date}
+            for name, values in zip(PRICE_FIELDS, columns[:4]):
+                record[name] = values[i]
+            record["volume"] = volume[i]
+            for name, values in zip(KDJ_FIELDS, columns[4:]):
+                record[name] = values[i]
+            records.append(record)
+        return records
+
+
+class ContractSeries:
+    """单个合约: 合约代码 + 最新 KDJ 汇总 + K 线序列"""
+
+    __slots__ = ('symbol', 'contract_type', 'last_update', 'latest_kdj', 'bars')
+
+    def __init__(self, symbol, contract_type, last_update, latest_kdj, bars):
+        self.symbol = symbol
+        self.contract_type = contract_type
+        self.last_update = last_update
+        self.latest_kdj = latest_kdj
+        self.bars = bars
+
+    @classmethod
+    def from_dict(cls, contract):
+        if not contract:
+            return None
+        return cls(
+            contract.get('symbol', 'N/A'),
+            contract.get('contractType'),
+            contract.get('lastUpdate'),
+            contract.get('latestKDJ') or {},
+            BarSeries.from_records(contract.get('data') or []),
+        )
+
+
+class FuturesProduct:
+    """一个期货品种: 主力 + 次主力合约"""
+
+    __slots__ = ('code', 'name', 'period', 'main', 'sub')
+
+    def __init__(self, code, name, period, main, sub):
+        self.code = code
+        self.name = name
+        self.period = period
+        self.main = main
+        self.sub = sub
+
+    def contracts(self):
+        """依次返回 ('主力', ContractSeries) / ('次主力', ContractSeries)，缺失的跳过"""
+        if self.main is not None:
+            yield '主力', self.main
+        if self.sub is not None:
+            yield '次主力', self.sub
+
+    @classmethod
+    def from_dict(cls, code, info):
+        return cls(
+            info.get('code', code),
+            info.get('name', code),
+            info.get('period'),
+            ContractSeries.from_dict(info.get('main')),
+            ContractSeries.from_dict(info.get('sub')),
+        )
+
+
+def products_from_data(data):
+    """FUTURES_DATA 字典 -> {代码: FuturesProduct}"""
+    return {code: FuturesProduct.from_dict(code, info) for code, info in data.items()}
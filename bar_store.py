@@ -0,0 +1,133 @@
+"""
+本地日线 K 线缓存
+每个代码一个 .npy 文件 (结构化数组，可 mmap 读取)，增量拉取新交易日并追加
+前复权 (qfq) 价格被调整时，仅对该代码重新全量拉取
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'i8'),
+])
+
+# 增量拉取时与缓存重叠的 K 线数量
+# 最后一根可能是盘中未收盘的 K 线，所以用倒数第二根做前复权校验
+OVERLAP_BARS = 2
+
+
+class BarStore:
+    """按代码存放的日线缓存目录"""
+
+    DTYPE = BAR_DTYPE
+    KEY = 'date'            # 时间列，append 按它合并
+
+    def __init__(self, root="bar_cache/daily"):
+        self.root = root
+
+    def path(self, code):
+        return os.path.join(self.root, f"{code}.npy")
+
+    def load(self, code, mmap=True):
+        """读取缓存，不存在时返回 None"""
+        path = self.path(code)
+        if not os.path.exists(path):
+            return None
+        try:
+            bars = np.load(path, mmap_mode='r' if mmap else None)
+        except (OSError, ValueError):
+            return None
+        if bars.dtype != self.DTYPE:
+            return None
+        return bars
+
+    def save(self, code, bars):
+        """整体写入 (先写临时文件再替换，避免写到一半被其他进程读到)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(code)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=self.DTYPE))
+        os.replace(tmp, path)
+
+    def append(self, code, bars, cached=None):
+        """
+        合并新拉取的 K 线并写回，返回合并后的全部 K 线
+        缓存中早于 bars 第一根的部分保留，重叠部分以新数据为准 (缓存的最后一根可能未走完)
+        cached: 调用方已读取的缓存，None 时从文件读取
+        """
+        if not len(bars):
+            return cached if cached is not None else self.load(code, mmap=False)
+        if cached is None:
+            cached = self.load(code, mmap=False)
+        if cached is not None and len(cached):
+            bars = np.concatenate([cached[cached[self.KEY] < bars[self.KEY][0]], bars])
+        self.save(code, bars)
+        return bars
+
+
+def frame_to_bars(df):
+    """
+    DataFrame (date/open/high/low/close/volume) -> 结构化数组
+    """
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+    for col in ('open', 'high', 'low', 'close'):
+        bars[col] = df[col].to_numpy(dtype=float)
+    bars['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).to_numpy().astype('i8')
+    return bars
+
+
+def bars_to_frame(bars):
+    """结构化数组 -> DataFrame (date 列为 datetime64)"""
+    df = pd.DataFrame({name: np.asarray(bars[name]) for name in BAR_DTYPE.names})
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df
+
+
+def update_bars(store, code, fetch, start_date, end_date):
+    """
+    增量更新某代码的日线缓存并返回 [start_date, end_date] 区间的 DataFrame
+
+    参数:
+        fetch(code, start, end): 拉取 [start, end] 日线，返回 DataFrame
+                                 (date/open/high/low/close/volume 列) 或 None
+        start_date, end_date: 'YYYYMMDD'
+    返回:
+        DataFrame 或 None (无数据)
+    """
+    cached = store.load(code, mmap=False)
+    bars = None
+
+    if cached is not None and len(cached) > OVERLAP_BARS:
+        probe = cached[-OVERLAP_BARS]
+        probe_start = pd.Timestamp(probe['date']).strftime('%Y%m%d')
+        df = fetch(code, probe_start, end_date)
+        if df is None or df.empty:
+            bars = cached
+        else:
+            fresh = frame_to_bars(df)
+            # 前复权调整后，历史价格会整体变化：最早一根对不上就重新全量拉取
+            if fresh['date'][0] == probe['date'] and np.isclose(fresh['close'][0], probe['close'], rtol=0, atol=1e-6):
+                bars = store.append(code, fresh, cached)
+
+    if bars is None:
+        df = fetch(code, start_date, end_date)
+        if df is None or df.empty:
+            return None
+        bars = frame_to_bars(df)
+        store.save(code, bars)
+
+    start = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+    end = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+    window = bars[(bars['date'] >= start) & (bars['date'] <= end)]
+    if len(window) == 0:
+        return None
+    return bars_to_frame(window)
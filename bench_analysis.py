@@ -0,0 +1,218 @@
+"""
+分析脚本基准测试 (合成数据)
+按当前规模 (62 个期货品种 / 约 4000 只股票) 的倍数用 synth_data 生成数据，
+每个脚本在独立进程中运行两次:
+    cold  删除 futures_loader 的解析缓存后运行 (首次解析 futures_data.js)
+    warm  缓存已存在时再运行一次
+各阶段耗时 (load / rules / report，regenerate_pending 为单遍 stream) 由脚本中的 instrument.span 记录，
+结果追加到 bench_results.ndjson，与同一脚本同一规模的上一次结果对比
+
+用法: python bench_analysis.py [--scales 1 10 100] [--tools scan_pending regenerate_pending] [--keep DIR]
+"""
+
+import argparse
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import synth_data
+from futures_loader import CACHE_SUFFIX, SERIES_CACHE_SUFFIX
+from instrument import finish_run, start_run
+from json_stream import ALL_FILE
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+BASE_PRODUCTS = 62          # futures_list.json 的品种数
+BASE_STOCKS = 4000          # 剔除北交所 / 科创板 / ST / 亏损股后一天的扫描数量
+RESULTS_FILE = "bench_results.ndjson"
+TIMEOUT = 1800              # 单次运行超时 (秒)
+
+# 脚本 -> 使用的数据集
+TOOLS = {
+    'scan_pending': 'futures',
+    'filter_pending': 'futures',
+    'filter_pending_new': 'futures',
+    'find_first_breakout': 'futures',
+    'find_trend_patterns': 'futures',
+    'verify_dual_conditions': 'futures',
+    'regenerate_pending': 'stocks',
+}
+DATA_FILES = {'futures': "futures_data.js", 'stocks': ALL_FILE}
+
+
+def _max_rss_mb():
+    """本进程的内存峰值 (MB)；Linux 的 ru_maxrss 会继承 fork 前父进程 (生成数据时) 的峰值，优先读 VmHWM"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 2 ** 10, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:         # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return round(rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def child(tool, out_dir):
+    """子进程: 在当前目录 (数据目录) 运行脚本，把 run summary 写到 out_dir"""
+    start_run(tool, profile='')
+    try:
+        runpy.run_path(os.path.join(REPO, f"{tool}.py"), run_name='__main__')
+    finally:
+        finish_run(out_dir, extra={'max_rss_mb': _max_rss_mb()}, quiet=True)
+
+
+def generate(dataset, scale, data_dir, seed=0):
+    """生成 scale 倍规模的数据集，返回 {count, file_mb, seconds}"""
+    start = time.perf_counter()
+    if dataset == 'futures':
+        count = BASE_PRODUCTS * scale
+        synth_data.write_futures_js(synth_data.make_futures_data(count, seed=seed),
+                                    os.path.join(data_dir, DATA_FILES[dataset]))
+    else:
+        count = BASE_STOCKS * scale
+        synth_data.write_stock_files(count, data_dir, seed=seed)
+    return {
+        'count': count,
+        'file_mb': round(os.path.getsize(os.path.join(data_dir, DATA_FILES[dataset])) / 2 ** 20, 2),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def clear_caches(data_dir):
+    path = os.path.join(data_dir, DATA_FILES['futures'])
+    for suffix in (CACHE_SUFFIX, SERIES_CACHE_SUFFIX):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def run_once(tool, data_dir, label, timeout=TIMEOUT):
+    """运行一次脚本，返回 {wall, elapsed, stages, max_rss_mb} 或 {error}"""
+    out_dir = os.path.join(data_dir, f"runs_{label}")
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(out_dir, f"{tool}.out"), 'w', encoding='utf-8') as out:
+        try:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', tool, out_dir],
+                                  cwd=data_dir, stdout=out, stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'error': f"timeout after {timeout}s"}
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        return {'error': f"exit code {proc.returncode}, see {out.name}"}
+    with open(os.path.join(out_dir, f"{tool}.run.json"), 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    return {
+        'wall': round(wall, 3),
+        'elapsed': summary['elapsed'],
+        'stages': {stage: s['total'] for stage, s in summary['stages'].items()},
+        'max_rss_mb': summary.get('max_rss_mb'),
+    }
+
+
+def load_results(path=RESULTS_FILE):
+    results = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except ValueError:
+                    continue
+    return results
+
+
+def previous(results, tool, count):
+    """同一脚本、同一数据量的上一次结果"""
+    for entry in reversed(results):
+        if entry['tool'] == tool and entry['count'] == count and 'error' not in entry['warm']:
+            return entry
+    return None
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _fmt(run, stage=None):
+    if 'error' in run:
+        return f"{'ERR':>8s}"
+    value = run['elapsed'] if stage is None else run['stages'].get(stage)
+    return f"{value:8.3f}" if value is not None else f"{'-':>8s}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="相对当前规模的倍数")
+    parser.add_argument('--tools', nargs='+', choices=list(TOOLS), default=list(TOOLS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=TIMEOUT)
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--keep', default=None, help="数据和脚本输出保存到此目录 (默认用临时目录，结束后删除)")
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    revision = _git_revision()
+    root = args.keep or tempfile.mkdtemp(prefix="bench_analysis_")
+    datasets = sorted({TOOLS[tool] for tool in args.tools})
+    print(f"{'脚本':<24s}{'规模':>6s}{'数量':>9s}{'cold':>9s}{'load':>9s}{'rules':>9s}{'report':>9s}"
+          f"{'warm':>9s}{'RSS MB':>8s}  对比上次 (warm)")
+    try:
+        with open(args.results, 'a', encoding='utf-8') as results:
+            for scale in args.scales:
+                data_dir = os.path.join(root, f"x{scale}")
+                os.makedirs(data_dir, exist_ok=True)
+                generated = {dataset: generate(dataset, scale, data_dir, args.seed) for dataset in datasets}
+                for dataset, info in generated.items():
+                    print(f"  [x{scale}] {DATA_FILES[dataset]}: {info['count']} 条, {info['file_mb']} MB, "
+                          f"生成 {info['seconds']}s")
+                for tool in args.tools:
+                    info = generated[TOOLS[tool]]
+                    clear_caches(data_dir)
+                    cold = run_once(tool, data_dir, 'cold', args.timeout)
+                    warm = run_once(tool, data_dir, 'warm', args.timeout)
+                    entry = {
+                        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'revision': revision,
+                        'tool': tool, 'scale': scale, 'count': info['count'], 'file_mb': info['file_mb'],
+                        'cold': cold, 'warm': warm,
+                    }
+                    before = previous(history, tool, info['count'])
+                    compare = "-"
+                    if before and 'error' not in warm:
+                        ratio = warm['elapsed'] / before['warm']['elapsed'] if before['warm']['elapsed'] else float('inf')
+                        compare = f"{ratio:.2f}x ({before['revision'] or '?'} {before['time']})"
+                    stage = 'stream' if tool == 'regenerate_pending' else 'load'
+                    rss = cold.get('max_rss_mb') or '-'
+                    print(f"{tool:<24s}{'x' + str(scale):>6s}{info['count']:>9d}{_fmt(cold)} {_fmt(cold, stage)}"
+                          f" {_fmt(cold, 'rules')} {_fmt(cold, 'report')} {_fmt(warm)}{rss:>8}  {compare}")
+                    for label, run in (('cold', cold), ('warm', warm)):
+                        if 'error' in run:
+                            print(f"    {label}: {run['error']}")
+                    results.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+                    results.flush()
+                    history.append(entry)
+    finally:
+        if args.keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+    print(f"结果已追加到 {args.results}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,81 @@
+"""
+期货抓取流程离线基准测试
+用 mock_akshare 替代 AKShare，对比串行 (并发 1) 与并发抓取的耗时，并校验两者输出一致
+
+用法: python bench_fetch_futures.py [--workers 8] [--latency 0.05 0.15] [--failure-rate 0.02]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import mock_akshare
+from fetch_pool import TokenBucket
+
+# 在导入抓取脚本之前替换 akshare，离线环境也能运行
+sys.modules.setdefault('akshare', mock_akshare)
+
+import fetch_futures  # noqa: E402
+
+
+def strip_volatile(data):
+    """去掉 lastUpdate 等随运行时间变化的字段"""
+    clean = json.loads(json.dumps(data, ensure_ascii=False))
+    for info in clean.values():
+        for key in ('main', 'sub'):
+            if info.get(key):
+                info[key].pop('lastUpdate', None)
+    return clean
+
+
+def run(workers, out_dir):
+    fetch_futures.ak = mock_akshare
+    mock_akshare.configure(seed=0)
+    filename = os.path.join(out_dir, f"futures_data_{workers}.js")
+    before = dict(fetch_futures.SCHEDULER.stats)
+    start = time.perf_counter()
+    # 每次运行用各自的合约索引文件，都包含合约发现阶段
+    index_file = os.path.join(out_dir, f"contract_index_{workers}.json")
+    data = fetch_futures.fetch_futures_data(max_workers=workers, filename=filename, index_file=index_file)
+    elapsed = time.perf_counter() - start
+    stats = {k: fetch_futures.SCHEDULER.stats[k] - before[k] for k in before}
+    stats['endpoints'] = dict(mock_akshare.call_counts)
+    return data, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=fetch_futures.MAX_WORKERS)
+    parser.add_argument('--latency', type=float, nargs=2, default=list(mock_akshare.LATENCY))
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--rate', type=float, default=None, help='令牌桶每秒请求数 (默认沿用脚本配置)')
+    args = parser.parse_args()
+
+    mock_akshare.LATENCY = tuple(args.latency)
+    mock_akshare.FAILURE_RATE = args.failure_rate
+    if args.rate:
+        fetch_futures.SCHEDULER.bucket = TokenBucket(args.rate, args.rate)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        serial, t_serial, s_serial = run(1, out_dir)
+        concurrent, t_conc, s_conc = run(args.workers, out_dir)
+
+    same = strip_volatile(serial) == strip_volatile(concurrent)
+    # 旧版每个品种固定 sleep 0.5s，有次主力时再加 0.5s
+    old_sleep = sum(0.5 + (0.5 if info.get('sub') else 0) for info in serial.values())
+
+    print("\n" + "=" * 60)
+    print(f"品种数: {len(serial)}")
+    print(f"串行 (并发 1): {t_serial:.2f}s  {s_serial}")
+    print(f"并发 ({args.workers}):   {t_conc:.2f}s  {s_conc}")
+    print(f"旧版固定 sleep 额外耗时: {old_sleep:.1f}s")
+    print(f"输出一致: {'是' if same else '否'}")
+    print("=" * 60)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
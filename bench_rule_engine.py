@@ -0,0 +1,129 @@
+"""
+规则引擎基准测试
+对比逐个品种 Python 判断 (原脚本写法) 与 rule_engine 矩阵求值的耗时，并校验结果一致
+
+用法: python bench_rule_engine.py [--instruments 4000] [--bars 13] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bar_series import BarSeries
+from indicators import kdj_arrays
+from rule_engine import BarPanel, PATTERN_WINDOW, pattern_status
+
+
+def make_universe(instruments, bars, seed=0):
+    """随机游走生成 K 线 + KDJ，长度在 [bars/2, bars] 之间随机"""
+    rng = np.random.default_rng(seed)
+    universe = []
+    for i in range(instruments):
+        n = int(rng.integers(max(3, bars // 2), bars + 1))
+        close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.03, n))), 2)
+        open_ = np.round(np.r_[100, close[:-1]], 2)
+        spread = np.abs(rng.normal(0, 0.02, n)) * close
+        high = np.round(np.maximum(open_, close) + spread, 2)
+        low = np.round(np.minimum(open_, close) - spread, 2)
+        k, d, j = (np.round(x, 2) for x in kdj_arrays(high, low, close))
+        dates = np.datetime64('2020-01-05') + np.arange(n) * 7
+        universe.append(((f"P{i:04d}", f"P{i:04d}2605"), BarSeries(dates, open_, high, low, close, None, k, d, j)))
+    return universe
+
+
+def s2_loop(bars):
+    """原 fetch_futures.check_rules 规则2 的逐个品种写法"""
+    if len(bars) < 3:
+        return None
+    h1, h2, h3 = bars.high[-3:]
+    l1, l2, l3 = bars.low[-3:]
+    c3 = bars.close[-1]
+    is_k_gt_d = bars.K[-1] > bars.D[-1]
+    is_k_lt_d = bars.K[-1] < bars.D[-1]
+    if (h2 > h1) and (c3 > h2) and is_k_gt_d:
+        return 'long'
+    if (h2 > h1) and (c3 > l1) and (c3 <= h2) and (h3 < h2) and is_k_gt_d:
+        return 'pending_long'
+    if (l2 < l1) and (c3 < l2) and is_k_lt_d:
+        return 'short'
+    if (l2 < l1) and (c3 < h1) and (c3 >= l2) and (l3 > l2) and is_k_lt_d:
+        return 'pending_short'
+    return None
+
+
+def trend_loop(bars):
+    """原 find_trend_patterns.check_rules 的逐个品种写法"""
+    if len(bars) < 4:
+        return None
+    w2_high, w3_high = bars.high[-3:-1]
+    w2_low, w3_low = bars.low[-3:-1]
+    w4_close = bars.close[-1]
+    if (w3_low > w2_low) and (w4_close > w3_high):
+        return 'long'
+    if (w3_high < w2_high) and (w4_close < w3_low):
+        return 'short'
+    return None
+
+
+def first_breakout_loop(bars):
+    """原 find_first_breakout.check_first_breakout 的逐个品种写法 (w2 须为之前 10 根 K 线的极值)"""
+    if len(bars) < 12:
+        return None
+    w2_high, w3_high = bars.high[-3:-1]
+    w2_low, w3_low = bars.low[-3:-1]
+    w4_close = bars.close[-1]
+    if (w3_low > w2_low) and (w4_close > w3_high):
+        if w2_low <= np.min(bars.low[-13:-3]):
+            return 'long'
+    elif (w3_high < w2_high) and (w4_close < w3_low):
+        if w2_high >= np.max(bars.high[-13:-3]):
+            return 'short'
+    return None
+
+
+LOOPS = {
+    's2': s2_loop,
+    'trend': trend_loop,
+    'first_breakout': first_breakout_loop,
+}
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--instruments', type=int, default=4000)
+    parser.add_argument('--bars', type=int, default=13)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    universe = make_universe(args.instruments, max(args.bars, 13))
+    print(f"品种数: {len(universe)}, 每个品种最多 {max(args.bars, 13)} 根 K 线")
+
+    t_panel, panel = best_of(args.repeat, lambda: BarPanel.from_series(universe, max(PATTERN_WINDOW.values())))
+    print(f"构建矩阵: {t_panel * 1000:.2f} ms")
+
+    ok = True
+    for name, loop in LOOPS.items():
+        t_loop, expected = best_of(args.repeat, lambda: [loop(bars) for _, bars in universe])
+        t_vec, status = best_of(args.repeat, lambda: pattern_status(panel, name))
+        same = list(status) == expected
+        ok = ok and same
+        hits = sum(1 for s in expected if s)
+        print(f"{name:15s} 逐个: {t_loop * 1000:8.2f} ms  矩阵: {t_vec * 1000:7.2f} ms  "
+              f"加速 {t_loop / max(t_vec, 1e-9):6.1f}x  信号 {hits:5d}  一致: {'是' if same else '否'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+Pending 合约实时突破监控 (asyncio)
+从 futures_data.js 按规则集 (默认 pending_kdj，同 filter_pending_new.py) 得到每个 Pending 合约的突破价和止损价，
+每个合约按穿越方向放进两条按价格排序的价位梯:
+    上穿梯   做多突破价 (w2.high)、做空止损价 (w3.high)    价格 > 价位时触发
+    下穿梯   做多止损价 (w3.low)、做空突破价 (w2.low)      价格 < 价位时触发
+每条行情只查自己合约的两条梯，二分找到被穿越的价位 (O(log n + 触发数))，不重新扫描全部合约；
+一个 setup 的突破或止损先发生的一方生效 (triggered / invalidated)，另一方作废
+
+行情来源:
+    实时    按间隔轮询 ak.futures_zh_realtime (每个品种一次请求，返回该品种全部合约)，可 --record 录下来
+    回放    --replay 读取录制 / 合成的行情文件 (NDJSON，每行 {"t": 秒, "quotes": {合约: {open, high, low, trade}}})，
+            用于离线测量每条行情的处理延迟
+
+用法:
+    python breakout_monitor.py [--rules pending_kdj] [--interval 3] [--record ticks.ndjson]
+    python breakout_monitor.py --make-replay ticks.ndjson [--ticks 2000]     # 按当前 setup 生成随机游走行情
+    python breakout_monitor.py --replay ticks.ndjson [--speed 0]             # 0 为不等待，尽快回放
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from futures_loader import load_futures_series
+from instrument import finish_run, start_run
+from rule_engine import RULE_SETS, BarPanel, product_contracts
+
+POLL_INTERVAL = 3.0             # 实时行情轮询间隔 (秒)
+CONCURRENCY = 8                 # 同时进行的行情请求数
+DEFAULT_RULES = ('pending_kdj',)
+EVENTS_FILE = "breakout_events.ndjson"
+LATENCY_SAMPLES = 100000        # 保留最近的处理延迟样本数
+
+
+class Setup:
+    """一个待触发的形态: 突破价 breakout、止损价 stop，state 为 pending / triggered / invalidated"""
+
+    __slots__ = ('code', 'name', 'symbol', 'contract_type', 'rule_set', 'status', 'direction',
+                 'breakout', 'stop', 'price', 'state')
+
+    def __init__(self, code, name, symbol, contract_type, rule_set, status, breakout, stop, price):
+        self.code = code
+        self.name = name
+        self.symbol = symbol
+        self.contract_type = contract_type
+        self.rule_set = rule_set
+        self.status = status
+        self.direction = 'long' if 'long' in status else 'short'
+        self.breakout = breakout
+        self.stop = stop
+        self.price = price          # 生成 setup 时的收盘价 (w3.close)
+        self.state = 'pending'
+
+
+def load_setups(data, rule_sets=DEFAULT_RULES):
+    """{代码: FuturesProduct} -> [Setup]，每个规则集取有 breakout / stop 价位的状态"""
+    rows = [row for row in product_contracts(data) if row[2].latest_kdj]
+    if not rows:
+        return []
+    k = np.array([contract.latest_kdj['K'] for _, _, contract in rows], dtype=float)
+    d = np.array([contract.latest_kdj['D'] for _, _, contract in rows], dtype=float)
+    setups = []
+    for name in rule_sets:
+        rule_set = RULE_SETS[name]
+        panel = BarPanel.from_series((((code, contract.symbol), contract.bars) for code, _, contract in rows),
+                                     rule_set.window)
+        status, levels = rule_set.levels(panel, K=k, D=d)
+        if 'breakout' not in levels or 'stop' not in levels:
+            raise ValueError(f"规则集 {name} 没有 breakout / stop 价位")
+        for i, (code, contract_type, contract) in enumerate(rows):
+            if status[i] is None or np.isnan(levels['breakout'][i]) or np.isnan(levels['stop'][i]):
+                continue
+            setups.append(Setup(code, data[code].name, contract.symbol, contract_type, name, status[i],
+                                float(levels['breakout'][i]), float(levels['stop'][i]),
+                                float(panel.close[i, -1])))
+    return setups
+
+
+class Ladder:
+    """
+    单个合约一个穿越方向的价位梯
+    rising=True: 价格上穿 (> 价位) 时触发；False: 下穿 (< 价位) 时触发
+    键为 ±价位的升序数组，最先会被触发的价位在末尾，触发后从末尾截掉
+    """
+
+    __slots__ = ('sign', 'keys', 'items')
+
+    def __init__(self, rising):
+        self.sign = -1.0 if rising else 1.0
+        self.keys = []
+        self.items = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, level, item):
+        key = self.sign * level
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.items.insert(i, item)
+
+    def pop_crossed(self, price):
+        """取出并删除被 price 穿越的全部条目"""
+        i = bisect.bisect_right(self.keys, self.sign * price)
+        if i == len(self.keys):
+            return []
+        crossed = self.items[i:]
+        del self.keys[i:]
+        del self.items[i:]
+        return crossed
+
+
+class Monitor:
+    """按合约组织的价位梯；on_quotes 处理一批行情并返回触发的事件"""
+
+    def __init__(self, setups=()):
+        self.ladders = {}           # 合约 -> (上穿梯, 下穿梯)
+        self.setups = []
+        self.tick_latency = deque(maxlen=LATENCY_SAMPLES)      # 每条行情的处理耗时 (秒)
+        self.batch_latency = deque(maxlen=LATENCY_SAMPLES)     # 每批行情的处理耗时
+        self.quotes = 0
+        self.events = 0
+        for setup in setups:
+            self.add(setup)
+
+    def add(self, setup):
+        up, down = self.ladders.setdefault(setup.symbol, (Ladder(rising=True), Ladder(rising=False)))
+        if setup.direction == 'long':
+            up.add(setup.breakout, (setup, 'triggered'))
+            down.add(setup.stop, (setup, 'invalidated'))
+        else:
+            down.add(setup.breakout, (setup, 'triggered'))
+            up.add(setup.stop, (setup, 'invalidated'))
+        self.setups.append(setup)
+
+    @property
+    def pending(self):
+        return sum(1 for setup in self.setups if setup.state == 'pending')
+
+    def on_quote(self, symbol, price):
+        """一条行情 -> 事件列表"""
+        ladders = self.ladders.get(symbol)
+        if ladders is None:
+            return []
+        events = []
+        for ladder in ladders:
+            for setup, state in ladder.pop_crossed(price):
+                # 同一 setup 的另一侧价位留在梯里，被穿越时在这里跳过
+                if setup.state != 'pending':
+                    continue
+                setup.state = state
+                events.append(event_record(setup, state, price))
+        return events
+
+    def on_quotes(self, quotes):
+        """{合约: {trade, ...}} -> 事件列表，同时记录处理延迟"""
+        batch_start = time.perf_counter()
+        events = []
+        for symbol, quote in quotes.items():
+            start = time.perf_counter()
+            events.extend(self.on_quote(symbol, quote['trade']))
+            self.tick_latency.append(time.perf_counter() - start)
+        self.quotes += len(quotes)
+        self.events += len(events)
+        self.batch_latency.append(time.perf_counter() - batch_start)
+        return events
+
+
+def latency_summary(samples):
+    """延迟样本 -> {count, p50, p95, p99, max} (微秒)"""
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1e6
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': len(values), 'p50': round(float(p50), 2), 'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2), 'max': round(float(values.max()), 2)}
+
+
+def event_record(setup, state, price):
+    level = setup.breakout if state == 'triggered' else setup.stop
+    return {
+        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'code': setup.code, 'name': setup.name, 'symbol': setup.symbol, 'type': setup.contract_type,
+        'rules': setup.rule_set, 'status': setup.status, 'event': state,
+        'level': level, 'price': price, 'breakout': setup.breakout, 'stop': setup.stop,
+    }
+
+
+def format_event(event):
+    action = {('long', 'triggered'): "突破 ↑", ('short', 'triggered'): "破位 ↓",
+              ('long', 'invalidated'): "失效 ↓", ('short', 'invalidated'): "失效 ↑"}
+    direction = 'long' if 'long' in event['status'] else 'short'
+    return (f"[{event['time']}] {event['name']} ({event['symbol']}) [{event['type']}] {event['status']} "
+            f"{action[(direction, event['event'])]} {event['level']} (现价 {event['price']})")
+
+
+# ---- 行情来源 ----
+
+class AkshareFeed:
+    """轮询 ak.futures_zh_realtime，每个品种一次请求 (在线程中执行，最多 concurrency 个同时进行)"""
+
+    def __init__(self, names, interval=POLL_INTERVAL, concurrency=CONCURRENCY, record=None):
+        self.names = names          # 查询用的品种名列表
+        self.interval = interval
+        self.concurrency = concurrency
+        self.record = record
+
+    async def batches(self):
+        # 实时行情的拉取沿用 refresh_intraday (经 fetch_futures.SCHEDULER 限速 / 重试)
+        from refresh_intraday import fetch_quotes
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(name):
+            async with semaphore:
+                return await asyncio.to_thread(fetch_quotes, name)
+
+        recorder = open(self.record, 'a', encoding='utf-8') if self.record else None
+        start = time.monotonic()
+        try:
+            while True:
+                polled = time.monotonic()
+                quotes = {}
+                for part in await asyncio.gather(*(fetch(name) for name in self.names)):
+                    quotes.update(part)
+                if recorder is not None:
+                    recorder.write(json.dumps({'t': round(polled - start, 3), 'quotes': quotes},
+                                              separators=(',', ':')) + '\n')
+                    recorder.flush()
+                yield quotes
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - polled)))
+        finally:
+            if recorder is not None:
+                recorder.close()
+
+
+class ReplayFeed:
+    """回放录制的行情文件；speed > 0 时按记录的时间间隔 / speed 等待，0 为不等待"""
+
+    def __init__(self, path, speed=0.0):
+        self.path = path
+        self.speed = speed
+
+    async def batches(self):
+        start = time.monotonic()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    tick = json.loads(line)
+                except ValueError:
+                    continue
+                if self.speed > 0:
+                    await asyncio.sleep(max(0.0, tick['t'] / self.speed - (time.monotonic() - start)))
+                yield tick['quotes']
+
+
+def make_replay(setups, path, ticks=2000, interval=POLL_INTERVAL, seed=0):
+    """
+    为 setup 涉及的合约生成随机游走行情 (从 w3.close 出发，步长按突破价与止损价的距离缩放，部分合约会穿越价位)
+    返回写出的行情条数
+    """
+    rng = np.random.default_rng(seed)
+    start = {}
+    scale = {}
+    for setup in setups:
+        start.setdefault(setup.symbol, setup.price)
+        scale[setup.symbol] = max(scale.get(setup.symbol, 0.0), abs(setup.breakout - setup.stop))
+    symbols = sorted(start)
+    if not symbols:
+        return 0
+    prices = np.array([start[s] for s in symbols])
+    steps = np.array([max(scale[s], 1e-6) for s in symbols]) / np.sqrt(ticks) * 1.5
+    paths = prices + np.cumsum(rng.normal(0, 1, (ticks, len(symbols))) * steps, axis=0)
+    with open(path, 'w', encoding='utf-8') as f:
+        for t in range(ticks):
+            row = np.round(paths[t], 2).tolist()
+            quotes = {s: {'open': start[s], 'high': max(start[s], p), 'low': min(start[s], p), 'trade': p}
+                      for s, p in zip(symbols, row)}
+            f.write(json.dumps({'t': round(t * interval, 3), 'quotes': quotes}, separators=(',', ':')) + '\n')
+    return ticks * len(symbols)
+
+
+async def run(monitor, feed, events_file=None, exit_when_done=False, quiet=False):
+    """消费行情直到行情结束 (回放) / 全部 setup 触发或失效 (exit_when_done) / 被中断"""
+    out = open(events_file, 'a', encoding='utf-8') if events_file else None
+    try:
+        async for quotes in feed.batches():
+            for event in monitor.on_quotes(quotes):
+                if not quiet:
+                    print(format_event(event), flush=True)
+                if out is not None:
+                    out.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+                    out.flush()
+            if exit_when_done and not monitor.pending:
+                break
+    finally:
+        if out is not None:
+            out.close()
+
+
+def query_names(setups):
+    """futures_zh_realtime 的查询名 (futures_list.json 中的名称，缺省用数据里的品种名)"""
+    try:
+        with open("futures_list.json", 'r', encoding='utf-8') as f:
+            names = {item['code']: item['name'] for item in json.load(f)}
+    except (OSError, ValueError):
+        names = {}
+    return sorted({names.get(setup.code, setup.name) for setup in setups})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pending 合约实时突破监控")
+    parser.add_argument('--file', default="futures_data.js")
+    parser.add_argument('--rules', nargs='+', default=list(DEFAULT_RULES), help="带 breakout / stop 价位的规则集")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--record', default=None, help="实时行情同时追加写入此文件 (可回放)")
+    parser.add_argument('--replay', default=None, help="回放行情文件，不联网")
+    parser.add_argument('--speed', type=float, default=0.0, help="回放速度倍数，0 为不等待")
+    parser.add_argument('--make-replay', default=None, help="按当前 setup 生成合成行情文件后退出")
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--events', default=EVENTS_FILE)
+    parser.add_argument('--exit-when-done', action='store_true', help="全部 setup 触发或失效后退出")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    setups = load_setups(load_futures_series(args.file), args.rules)
+    if args.make_replay:
+        quotes = make_replay(setups, args.make_replay, args.ticks, args.interval)
+        print(f"{args.make_replay}: {args.ticks} 批, {quotes} 条行情 ({len({s.symbol for s in setups})} 个合约)")
+        return
+
+    start_run('breakout_monitor')
+    monitor = Monitor(setups)
+    print(f"监控 {len(setups)} 个 setup ({len(monitor.ladders)} 个合约, 规则集 {', '.join(args.rules)})")
+    if args.replay:
+        feed = ReplayFeed(args.replay, args.speed)
+    else:
+        feed = AkshareFeed(query_names(setups), args.interval, args.concurrency, args.record)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(run(monitor, feed, args.events, args.exit_when_done, args.quiet))
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    tick = latency_summary(monitor.tick_latency)
+    batch = latency_summary(monitor.batch_latency)
+    print(f"{monitor.quotes} 条行情, {monitor.events} 个事件, 剩余 {monitor.pending} 个 pending, {elapsed:.2f}s")
+    if tick['count']:
+        print(f"处理延迟 (us): 每条 p50 {tick['p50']} p95 {tick['p95']} p99 {tick['p99']} max {tick['max']}; "
+              f"每批 p50 {batch['p50']} p95 {batch['p95']}")
+    finish_run(extra={'setups': len(setups), 'quotes': monitor.quotes, 'events': monitor.events,
+                      'tick_latency': tick, 'batch_latency': batch}, quiet=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,17 @@
-import json
 import os
 
+from futures_loader import load_futures_data
+
 def check_missing():
     if not os.path.exists('futures_data.js'):
         print("futures_data.js not found")
         return
 
-    with open('futures_data.js', 'r', encoding='utf-8') as f:
-        content = f.read()
-        # Extract JSON part
-        start = content.find('{')
-        end = content.rfind('};') + 1
-        if start == -1 or end == 0:
-            print("Could not parse futures_data.js")
-            return
-        
-        try:
-            data = json.loads(content[start:end])
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error: {e}")
-            return
+    try:
+        data = load_futures_data('futures_data.js')
+    except ValueError as e:
+        print(f"Could not parse futures_data.js: {e}")
+        return
 
     missing = []
     for code, info in data.items():
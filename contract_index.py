@@ -0,0 +1,150 @@
+"""
+主力 / 次主力合约发现
+每个交易所取一次全市场日行情快照 (ak.get_futures_daily)，按持仓量 (open_interest) 排序，
+建立 品种代码 -> [合约, ...] 索引；主力/次主力选择变成字典查找，不再逐个品种请求实时行情
+
+索引写入 contract_index.json，TTL 内 fetch_futures.py / fetch_fix.py 直接复用
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import akshare as ak
+
+INDEX_FILE = "contract_index.json"
+INDEX_TTL = 30 * 60            # 秒
+MARKETS = ("SHFE", "INE", "DCE", "CZCE", "GFEX")
+LOOKBACK_DAYS = 10             # 向前找最近交易日的天数
+
+SYMBOL_RE = re.compile(r'^([A-Z]+)(\d{3,4})$')
+
+
+def normalize_symbol(symbol, today=None):
+    """
+    交易所合约代码 -> 新浪格式 (大写，4 位年月)
+    郑商所只用 3 位 (SR605)，年份取离 today 最近、且不早于去年的那个十年
+    返回 (品种代码, 合约代码)；无法识别返回 (None, None)
+    """
+    match = SYMBOL_RE.match(str(symbol).strip().upper())
+    if not match:
+        return None, None
+    code, digits = match.groups()
+    if len(digits) == 3:
+        year = (today or date.today()).year
+        full = year - year % 10 + int(digits[0])
+        if full < year - 1:
+            full += 10
+        digits = f"{full % 100:02d}{digits[1:]}"
+    return code, f"{code}{digits}"
+
+
+class ContractIndex:
+    """品种代码 -> 按持仓量降序的合约列表"""
+
+    def __init__(self, contracts, trade_dates=None, created=None):
+        self.contracts = contracts          # {代码: [[合约, 持仓量], ...]}
+        self.trade_dates = trade_dates or {}  # {交易所: 'YYYYMMDD'}
+        self.created = time.time() if created is None else created
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def __contains__(self, code):
+        return bool(self.contracts.get(code))
+
+    def ranked(self, code):
+        return [symbol for symbol, _ in self.contracts.get(code, [])]
+
+    def main_and_sub(self, code):
+        """(主力, 次主力)，缺失为 None"""
+        ranked = self.ranked(code)
+        return (ranked[0] if ranked else None), (ranked[1] if len(ranked) > 1 else None)
+
+    def expired(self, ttl=INDEX_TTL):
+        return time.time() - self.created > ttl
+
+    def to_dict(self):
+        return {'created': self.created, 'trade_dates': self.trade_dates, 'contracts': self.contracts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['contracts'], data.get('trade_dates'), data.get('created', 0))
+
+
+def fetch_market(market, today=None, call=None, lookback=LOOKBACK_DAYS):
+    """
+    某交易所最近一个交易日的全部合约日行情
+    返回 (交易日 'YYYYMMDD', DataFrame)；取不到返回 (None, None)
+    """
+    call = call or (lambda func, *args, **kwargs: func(*args, **kwargs))
+    day = today or date.today()
+    for _ in range(lookback):
+        if day.weekday() < 5:
+            stamp = day.strftime('%Y%m%d')
+            try:
+                df = call(ak.get_futures_daily, start_date=stamp, end_date=stamp, market=market)
+            except Exception:
+                df = None
+            if df is not None and not df.empty:
+                return stamp, df
+        day -= timedelta(days=1)
+    return None, None
+
+
+def build_index(markets=MARKETS, today=None, call=None, max_workers=len(MARKETS)):
+    """每个交易所一次快照，合并成 ContractIndex"""
+    today = today or date.today()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        snapshots = list(pool.map(lambda m: fetch_market(m, today, call), markets))
+
+    contracts = {}
+    trade_dates = {}
+    for market, (stamp, df) in zip(markets, snapshots):
+        if df is None:
+            continue
+        trade_dates[market] = stamp
+        oi_col = 'open_interest' if 'open_interest' in df.columns else 'hold'
+        for symbol, oi in zip(df['symbol'], df[oi_col]):
+            code, symbol = normalize_symbol(symbol, today)
+            if code is None or oi != oi:
+                continue
+            contracts.setdefault(code, []).append([symbol, int(oi)])
+    for ranked in contracts.values():
+        ranked.sort(key=lambda item: -item[1])
+    return ContractIndex(contracts, trade_dates)
+
+
+def load_contract_index(path=INDEX_FILE, ttl=INDEX_TTL, call=None, refresh=False):
+    """
+    读取缓存的索引，过期或不存在时重新构建并写回
+    快照全部失败时返回空索引 (调用方回退到逐品种实时行情)
+    """
+    if not refresh and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = ContractIndex.from_dict(json.load(f))
+            if not index.expired(ttl):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = build_index(call=call)
+    if len(index):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+    return index
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    index = load_contract_index(refresh=True)
+    print(f"{len(index)} 个品种，交易日 {index.trade_dates}，耗时 {time.perf_counter() - start:.2f}s")
+    for code in sorted(index.contracts):
+        main, sub = index.main_and_sub(code)
+        print(f"  {code:4s} 主力 {main}  次主力 {sub or '-'}")
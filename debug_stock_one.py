@@ -5,28 +5,14 @@ import json
 import ssl
 from datetime import datetime
 
+from resample import resample_frame
+
 # Disable SSL verification globally
 ssl._create_default_https_context = ssl._create_unverified_context
 
 def daily_to_quarterly(df):
     print("Converting to quarterly...")
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    
-    try:
-        quarterly = df.resample('QE').agg({
-            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-        }).dropna()
-        print("Used 'QE' frequency")
-    except Exception as e:
-        print(f"QE failed: {e}, trying Q")
-        quarterly = df.resample('Q').agg({
-            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-        }).dropna()
-        
-    quarterly.reset_index(inplace=True)
-    quarterly['date'] = quarterly['date'].dt.strftime('%Y-%m-%d')
-    return quarterly
+    return resample_frame(df, 'Q')
 
 def test_fetch(code):
     print(f"Testing fetch for {code}...")
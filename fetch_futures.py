@@ -9,9 +9,25 @@
 import akshare as ak
 import json
 import os
-from datetime import datetime
-import pandas as pd
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from bar_series import BarSeries
+from contract_index import INDEX_FILE, load_contract_index
+from fetch_pool import FetchScheduler
+from futures_store import FuturesStore, save_products
+from indicators import KDJState, calculate_kdj
+from instrument import finish_run, span, start_run
+from resample import resample_frame
+from rule_engine import classify_latest
+
+
+# 所有 AKShare 请求经由调度器：令牌桶限速、超时、抖动退避重试
+SCHEDULER = FetchScheduler(rate=8, burst=8, timeout=30, retries=3)
+
+# 同时处理的品种数
+MAX_WORKERS = 8
 
 
 def load_futures_list(filename="futures_list.json"):
@@ -42,19 +58,24 @@ DEFAULT_FUTURES_LIST = [
 ]
 
 
-def get_main_and_sub_contracts(name):
+def get_main_and_sub_contracts(name, code=None, index=None):
     """
     获取某品种的主力和次主力合约代码
     
     参数:
         name: 品种中文名称（如 "螺纹钢"、"白糖"）
+        code: 品种代码；index (ContractIndex) 中有该品种时直接查表
     
     返回:
         (主力合约代码, 次主力合约代码) 或 (None, None)
     """
+    if index is not None and code in index:
+        return index.main_and_sub(code)
+    
+    # 索引中没有: 回退到该品种的实时行情
     try:
         # 获取该品种所有合约的实时行情
-        df = ak.futures_zh_realtime(symbol=name)
+        df = SCHEDULER.call(ak.futures_zh_realtime, symbol=name)
         
         if df is None or df.empty:
             return None, None
@@ -90,35 +111,6 @@ def get_main_and_sub_contracts(name):
         return None, None
 
 
-def calculate_kdj(df, n=9, m1=3, m2=3):
-    """
-    计算 KDJ 指标
-    """
-    low_n = df['low'].rolling(window=n, min_periods=1).min()
-    high_n = df['high'].rolling(window=n, min_periods=1).max()
-    
-    rsv = (df['close'] - low_n) / (high_n - low_n) * 100
-    rsv = rsv.fillna(50)
-    
-    k = pd.Series(index=df.index, dtype=float)
-    d = pd.Series(index=df.index, dtype=float)
-    
-    k.iloc[0] = 50
-    d.iloc[0] = 50
-    
-    for i in range(1, len(df)):
-        k.iloc[i] = (m1 - 1) / m1 * k.iloc[i-1] + 1 / m1 * rsv.iloc[i]
-        d.iloc[i] = (m2 - 1) / m2 * d.iloc[i-1] + 1 / m2 * k.iloc[i]
-    
-    j = 3 * k - 2 * d
-    
-    df['K'] = round(k, 2)
-    df['D'] = round(d, 2)
-    df['J'] = round(j, 2)
-    
-    return df
-
-
 def analyze_kdj_pattern(k, d, j):
     """分析 KDJ 形态"""
     patterns = []
@@ -145,119 +137,29 @@ def analyze_kdj_pattern(k, d, j):
 
 
 def daily_to_weekly(df):
-    """将日线数据转换为周线数据"""
-    df = df.copy()
-    
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-    
-    weekly = df.resample('W').agg({
-        'open': 'first',
-        'high': 'max',
-        'low': 'min',
-        'close': 'last',
-        'volume': 'sum'
-    }).dropna()
-    
-    weekly.reset_index(inplace=True)
-    weekly['date'] = weekly['date'].dt.strftime('%Y-%m-%d')
-    
-    return weekly
+    """将日线数据转换为周线数据 (resample.resample_frame)"""
+    return resample_frame(df, 'W')
 
 
 def check_rules(df, current_kdj):
     """
-    检查是否符合自定义交易规则
+    检查是否符合自定义交易规则 (规则定义见 rule_engine.rule_s1 / rule_s2)
     df: 周线数据 DataFrame (包含 K, D, J)
     current_kdj: 最新 KDJ 数据字典
     返回: (pattern_1_status, pattern_2_status)
+    
+    规则1 (S1): w2.high > w3.high 且金叉 -> 复苏 long; 高点连续下降且死叉 -> 转弱 short
+    规则2 (S2, 3根K线, 做多须金叉 K>D，做空须死叉 K<D):
+        long          w2.high > w1.high 且 w3.close > w2.high
+        pending_long  w2.high > w1.high, w3.close > w1.low, w3.close <= w2.high, w3.high < w2.high
+        short         w2.low < w1.low 且 w3.close < w2.low
+        pending_short w2.low < w1.low, w3.close < w1.high, w3.close >= w2.low, w3.low > w2.low
     """
     if len(df) < 3:
         return None, None
-
-    # 获取最后3周的数据 (改为3根K线)
-    # w3: 本周 (Current)
-    # w2: 上周 (Peak/Trough)  
-    # w1: 前周 (Start)
-    w3 = df.iloc[-1]
-    w2 = df.iloc[-2]
-    w1 = df.iloc[-3]
-
-    # 规则1：复苏/转弱 (S1)
-    p1_status = None
-    is_k_gt_d = current_kdj['K'] > current_kdj['D']
-    is_k_lt_d = current_kdj['K'] < current_kdj['D']
     
-    # S1 Long (复苏):
-    # 原逻辑: w1 > w2 (Highs Descending), KDJ Gold.
-    # W2, W3, W4 (Last 3). 
-    # User said: "W1 > W2 (Descending) + Gold Cross". 
-    # Let's use w3 and w2.
-    if (w2['high'] > w3['high']) and is_k_gt_d:
-        p1_status = 'long'
-    # S1 Short (转弱):
-    elif (w1['high'] > w2['high']) and (w2['high'] > w3['high']) and is_k_lt_d:
-        p1_status = 'short'
-
-    # 规则2：3根K线 Pending形态 (菜油类型)
-    # 新增条件：做多必须KDJ金叉(K>D)，做空必须KDJ死叉(K<D)
-    p2_status = None
-    
-    # Pattern 2 Long (Pending Setup - 3-Bar):
-    # 核心逻辑:
-    # 1. w2是一个显著的上涨K线 (Peak)
-    # 2. w3回调但未跌破w1的低点 (Support holds)
-    # 3. w3收盘未突破w2的高点 (Pending breakout)
-    # 4. w3的高点低于w2 (确保w3是回调而非继续上涨)
-    # 5. KDJ已经金叉 (K > D) - 新增条件
-    
-    # 做多Pending (3-Bar):
-    # 1. w2.high > w1.high (有明显的上涨)
-    # 2. w3.close > w1.low (未跌破起点支撑)
-    # 3. w3.close <= w2.high (尚未突破高点)
-    # 4. w3.high < w2.high (w3确实是回调)
-    # 5. K > D (KDJ金叉) - 新增
-    cond_pending_long = (w2['high'] > w1['high']) and \
-                        (w3['close'] > w1['low']) and \
-                        (w3['close'] <= w2['high']) and \
-                        (w3['high'] < w2['high']) and \
-                        is_k_gt_d  # 新增：必须金叉
-    
-    # 做多Active (已突破):
-    # 同样要求KDJ金叉
-    cond_active_long = (w2['high'] > w1['high']) and \
-                       (w3['close'] > w2['high']) and \
-                       is_k_gt_d  # 新增：必须金叉
-    
-    # 做空Pending (3-Bar):
-    # 1. w2.low < w1.low (有明显的下跌)
-    # 2. w3.close < w1.high (未突破起点阻力)
-    # 3. w3.close >= w2.low (尚未跌破低点)
-    # 4. w3.low > w2.low (w3确实是反弹)
-    # 5. K < D (KDJ死叉) - 新增
-    cond_pending_short = (w2['low'] < w1['low']) and \
-                         (w3['close'] < w1['high']) and \
-                         (w3['close'] >= w2['low']) and \
-                         (w3['low'] > w2['low']) and \
-                         is_k_lt_d  # 新增：必须死叉
-    
-    # 做空Active (已破位):
-    # 同样要求KDJ死叉
-    cond_active_short = (w2['low'] < w1['low']) and \
-                        (w3['close'] < w2['low']) and \
-                        is_k_lt_d  # 新增：必须死叉
-    
-    if cond_active_long:
-        p2_status = 'long'
-    elif cond_pending_long:
-        p2_status = 'pending_long'
-    elif cond_active_short:
-        p2_status = 'short'
-    elif cond_pending_short:
-        p2_status = 'pending_short'
-        
-    return p1_status, p2_status
+    return classify_latest(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+                           current_kdj['K'], current_kdj['D'])
 
 
 def fetch_contract_data(symbol, contract_type="主力"):
@@ -265,7 +167,7 @@ def fetch_contract_data(symbol, contract_type="主力"):
     获取单个合约的周线数据和 KDJ 指标
     """
     try:
-        df = ak.futures_zh_daily_sina(symbol=symbol)
+        df = SCHEDULER.call(ak.futures_zh_daily_sina, symbol=symbol)
         
         if df is None or df.empty:
             return None
@@ -273,14 +175,16 @@ def fetch_contract_data(symbol, contract_type="主力"):
         df.columns = [col.lower() for col in df.columns]
         df = df.tail(90)  # 约4个月的日线数据
         
-        weekly_df = daily_to_weekly(df)
+        with span('resample'):
+            weekly_df = daily_to_weekly(df)
         weekly_df = weekly_df.tail(13)  # 约3个月的周线
         
         if weekly_df.empty:
             return None
         
         # 计算 KDJ
-        weekly_df = calculate_kdj(weekly_df)
+        with span('kdj'):
+            weekly_df = calculate_kdj(weekly_df)
         
         # 获取最新KDJ数据
         latest_kdj = {
@@ -291,29 +195,19 @@ def fetch_contract_data(symbol, contract_type="主力"):
         }
 
         # 检查自定义规则
-        p1, p2 = check_rules(weekly_df, latest_kdj)
+        with span('rules'):
+            p1, p2 = check_rules(weekly_df, latest_kdj)
         latest_kdj['custom_rule_1'] = p1  # 'long' or 'short' or None
         latest_kdj['custom_rule_2'] = p2  # 'long' or 'short' or None
 
-        records = []
-        for _, row in weekly_df.iterrows():
-            records.append({
-                "date": str(row["date"]),
-                "open": float(row["open"]),
-                "high": float(row["high"]),
-                "low": float(row["low"]),
-                "close": float(row["close"]),
-                "volume": int(row["volume"]) if pd.notna(row["volume"]) else 0,
-                "K": float(row["K"]),
-                "D": float(row["D"]),
-                "J": float(row["J"]),
-            })
+        records = BarSeries.from_frame(weekly_df).to_records()
         
         return {
             "symbol": symbol,
             "contractType": contract_type,
             "lastUpdate": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "latestKDJ": latest_kdj,
+            "kdjState": KDJState.from_bars(records).to_dict(),  # 盘中刷新 (refresh_intraday.py) 用
             "data": records
         }
         
@@ -322,97 +216,106 @@ def fetch_contract_data(symbol, contract_type="主力"):
         return None
 
 
-def fetch_futures_data():
-    """获取所有期货品种的主力和次主力合约数据"""
+def fetch_product(future, index=None):
+    """
+    获取单个品种的主力和次主力合约数据
+    index: 合约发现阶段得到的 ContractIndex
+    返回: (code, 品种数据, 日志行列表)
+    """
+    name = future["name"]
+    code = future["code"]
+    display = future.get("display", name)
+    log = []
+    
+    # 获取主力和次主力合约代码
+    main_contract, sub_contract = get_main_and_sub_contracts(name, code, index)
+    
+    if main_contract:
+        log.append(f"  主力合约: {main_contract}")
+    else:
+        main_contract = f"{code}0"  # 回退到连续合约
+        log.append(f"  主力合约: {main_contract} (连续合约)")
+    
+    if sub_contract:
+        log.append(f"  次主力合约: {sub_contract}")
+    else:
+        log.append(f"  次主力合约: 无")
+    
+    # 获取主力合约数据
+    main_data = fetch_contract_data(main_contract, "主力")
+    if main_data:
+        log.append(f"    ✓ 主力: K={main_data['latestKDJ']['K']:.1f}, D={main_data['latestKDJ']['D']:.1f}, J={main_data['latestKDJ']['J']:.1f} ({main_data['latestKDJ']['pattern']})")
+    else:
+        log.append(f"    ✗ 主力数据获取失败")
+    
+    # 获取次主力合约数据
+    sub_data = None
+    if sub_contract:
+        sub_data = fetch_contract_data(sub_contract, "次主力")
+        if sub_data:
+            log.append(f"    ✓ 次主力: K={sub_data['latestKDJ']['K']:.1f}, D={sub_data['latestKDJ']['D']:.1f}, J={sub_data['latestKDJ']['J']:.1f} ({sub_data['latestKDJ']['pattern']})")
+        else:
+            log.append(f"    ✗ 次主力数据获取失败")
+    
+    entry = {
+        "name": display.split(" (")[0],  # 只要中文名
+        "code": code,
+        "period": "weekly",
+        "main": main_data,
+        "sub": sub_data
+    }
+    return code, entry, log
+
+
+def fetch_futures_data(max_workers=MAX_WORKERS, filename="futures_data.js", index_file=INDEX_FILE):
+    """获取所有期货品种的主力和次主力合约数据 (多线程并发，结果按列表顺序输出)"""
     
     # 优先从文件加载
-    futures_list = load_futures_list()
+    with span('universe'):
+        futures_list = load_futures_list()
     if futures_list is None:
         futures_list = DEFAULT_FUTURES_LIST
     
     all_data = {}
     
+    # 合约发现: 每个交易所一次快照 (TTL 缓存)，与 K 线抓取分开计时
+    start = time.perf_counter()
+    with span('discovery'):
+        index = load_contract_index(index_file, call=SCHEDULER.call)
+    missing = [f["code"] for f in futures_list if f["code"] not in index]
+    print(f"\n合约发现: {len(index)} 个品种，耗时 {time.perf_counter() - start:.2f}s"
+          + (f"，未覆盖 {missing} 将逐个查询实时行情" if missing else ""))
+    
+    store = FuturesStore(filename)
     total = len(futures_list)
-    print(f"\n即将开始获取 {total} 个品种的数据...")
+    print(f"\n即将开始获取 {total} 个品种的数据 (并发 {max_workers})...")
     
-    for i, future in enumerate(futures_list, 1):
-        name = future["name"]
-        code = future["code"]
-        display = future.get("display", name)
-        
-        print(f"\n[{i}/{total}] 正在获取 {display} ({code}) 的数据...")
-        
-        # 获取主力和次主力合约代码
-        main_contract, sub_contract = get_main_and_sub_contracts(name)
-        
-        if main_contract:
-            print(f"  主力合约: {main_contract}")
-        else:
-            main_contract = f"{code}0"  # 回退到连续合约
-            print(f"  主力合约: {main_contract} (连续合约)")
+    start = time.perf_counter()
+    with span('fetch'), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tasks = [pool.submit(fetch_product, future, index) for future in futures_list]
         
-        if sub_contract:
-            print(f"  次主力合约: {sub_contract}")
-        else:
-            print(f"  次主力合约: 无")
-        
-        # 获取主力合约数据
-        print(f"  正在获取主力合约数据...")
-        main_data = fetch_contract_data(main_contract, "主力")
-        if main_data:
-            print(f"    ✓ 主力: K={main_data['latestKDJ']['K']:.1f}, D={main_data['latestKDJ']['D']:.1f}, J={main_data['latestKDJ']['J']:.1f} ({main_data['latestKDJ']['pattern']})")
-        else:
-            print(f"    ✗ 主力数据获取失败")
-        
-        # 获取次主力合约数据
-        sub_data = None
-        if sub_contract:
-            print(f"  正在获取次主力合约数据...")
-            time.sleep(0.5)  # 避免请求过快
-            sub_data = fetch_contract_data(sub_contract, "次主力")
-            if sub_data:
-                print(f"    ✓ 次主力: K={sub_data['latestKDJ']['K']:.1f}, D={sub_data['latestKDJ']['D']:.1f}, J={sub_data['latestKDJ']['J']:.1f} ({sub_data['latestKDJ']['pattern']})")
-            else:
-                print(f"    ✗ 次主力数据获取失败")
-        
-        # 存储数据
-        all_data[code] = {
-            "name": display.split(" (")[0],  # 只要中文名
-            "code": code,
-            "period": "weekly",
-            "main": main_data,
-            "sub": sub_data
-        }
-        
-        time.sleep(0.5)  # 避免请求过快
-        
-        # 每3个品种保存一次
-        if i % 3 == 0:
-            save_to_js(all_data)
-            print("  (自动保存进度)")
+        # 按提交顺序取结果，保证输出顺序与列表一致
+        for i, (future, task) in enumerate(zip(futures_list, tasks), 1):
+            code, entry, log = task.result()
+            display = future.get("display", future["name"])
+            print(f"\n[{i}/{total}] {display} ({code})")
+            for line in log:
+                print(line)
+            
+            # 存储数据，每个品种完成后写入它的分片 (中断后已完成的品种不丢失)
+            all_data[code] = entry
+            with span('write'):
+                store.save(code, entry)
     
+    print(f"\nK 线抓取耗时 {time.perf_counter() - start:.2f}s")
     return all_data
 
 
 def save_to_js(data, filename="futures_data.js"):
-    """保存为 JavaScript 文件"""
-    js_content = f"""// 期货周线数据 + KDJ 指标（主力 + 次主力合约）
-// 更新时间: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-// 数据来源: 新浪财经 (via AKShare)
-// 周期: 周线 (最近3个月)
-
-const FUTURES_DATA = {json.dumps(data, ensure_ascii=False, indent=2)};
-
-// 导出（如果在 Node.js 环境）
-if (typeof module !== 'undefined' && module.exports) {{
-    module.exports = FUTURES_DATA;
-}}
-"""
-    
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(js_content)
-    
-    print(f"\n✓ 数据已保存到 {filename}")
+    """保存完整数据集: 只重写有变化的品种分片，再按需重建 JavaScript 文件 (见 futures_store)"""
+    with span('write'):
+        changed, rebuilt = save_products(data, filename)
+    print(f"\n✓ {len(changed)} 个品种有变化，" + (f"数据已保存到 {filename}" if rebuilt else f"{filename} 无需重写"))
 
 
 if __name__ == "__main__":
@@ -422,8 +325,10 @@ if __name__ == "__main__":
     print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
     
+    start_run('fetch_futures')
     data = fetch_futures_data()
     save_to_js(data)
+    finish_run(extra={'products': len(data), 'scheduler': SCHEDULER.stats})
     
     print("\n" + "=" * 60)
     print("完成！")
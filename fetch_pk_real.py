@@ -1,16 +1,10 @@
 
 import akshare as ak
-import pandas as pd
+
+from resample import resample_frame
 
 def daily_to_weekly(df):
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-    weekly = df.resample('W').agg({
-        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-    }).dropna()
-    weekly.reset_index(inplace=True)
-    weekly['date'] = weekly['date'].dt.strftime('%Y-%m-%d')
-    return weekly
+    return resample_frame(df, 'W')
 
 def fetch_pk():
     print("Fetching PK2605...")
@@ -0,0 +1,93 @@
+"""
+网络请求调度
+令牌桶限速 + 单次请求超时 + 抖动退避重试，供各 fetch 脚本共用
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from instrument import count
+
+
+class TokenBucket:
+    """
+    令牌桶限速器 (线程安全)
+    rate: 每秒补充的令牌数; burst: 桶容量
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，桶空时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchScheduler:
+    """
+    统一的请求入口: scheduler.call(ak.xxx, symbol=...)
+
+    - 每次请求前从令牌桶取令牌 (替代固定的 time.sleep)
+    - 超过 timeout 秒未返回视为失败
+    - 失败后按 base_delay * 2^n 的上限随机退避 (full jitter)，最多重试 retries 次
+    - 重试耗尽后抛出最后一次的异常，由调用方按原逻辑处理
+    """
+
+    def __init__(self, rate=4.0, burst=4, timeout=30.0, retries=3,
+                 base_delay=0.5, max_delay=8.0, max_workers=16):
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'timeouts': 0, 'failures': 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+        if key != 'calls':
+            count(f"scheduler.{key}")
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, *args, **kwargs):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(self.backoff(attempt - 1))
+            self.bucket.acquire()
+            self._count('calls')
+            future = self.executor.submit(func, *args, **kwargs)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                # 超时的线程无法强制结束，放弃等待即可
+                self._count('timeouts')
+                last_error = TimeoutError(f"{getattr(func, '__name__', func)} timed out after {self.timeout}s")
+            except Exception as e:
+                last_error = e
+        self._count('failures')
+        raise last_error
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -4,35 +4,39 @@ import numpy as np
 import json
 import os
 import time
+import shutil
+import queue
 import ssl
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
-from multiprocessing import Pool, cpu_count
+from multiprocessing import cpu_count
+
+from bar_store import BarStore, update_bars
+from indicators import calculate_kdj
+from instrument import RUN, count, finish_run, span, start_run, worker_init
+from json_stream import ALL_FILE, QuarterlyOutput
+from resample import resample_frame
+from sector_index import get_sector_map
+from spot_cache import enrich_records, load_spot
+import sector_stats
+import stock_payload
+from rule_engine import BarPanel, pattern_status
+from scan_checkpoint import (MAX_ATTEMPTS, RETRYABLE, ScanCheckpoint, ScanStats,
+                             classify_error, retry_delay)
 
 # Disable SSL verification globally
 ssl._create_default_https_context = ssl._create_unverified_context
 
-def calculate_kdj(df, n=9, m1=3, m2=3):
-    if len(df) < n: return df
-    low_n = df['low'].rolling(window=n, min_periods=1).min()
-    high_n = df['high'].rolling(window=n, min_periods=1).max()
-    rsv = (df['close'] - low_n) / (high_n - low_n) * 100
-    rsv = rsv.fillna(50)
-    
-    k = pd.Series(index=df.index, dtype=float)
-    d = pd.Series(index=df.index, dtype=float)
-    k.iloc[0] = 50
-    d.iloc[0] = 50
-    
-    for i in range(1, len(df)):
-        k.iloc[i] = (m1 - 1) / m1 * k.iloc[i-1] + 1 / m1 * rsv.iloc[i]
-        d.iloc[i] = (m2 - 1) / m2 * d.iloc[i-1] + 1 / m2 * k.iloc[i]
-    
-    j = 3 * k - 2 * d
-    
-    df['K'] = round(k, 2)
-    df['D'] = round(d, 2)
-    df['J'] = round(j, 2)
-    return df
+# Local daily bar cache (one file per code)
+BAR_STORE = BarStore("bar_cache/daily")
+
+# Scan pipeline: threads download bars, one process per core computes
+IO_WORKERS = 32
+QUEUE_SIZE = 256    # downloaded symbols waiting for the CPU stage
+
+# Scan results are enriched and written in batches of this size
+ENRICH_BATCH = 200
 
 def analyze_kdj_pattern(k, d, j):
     patterns = []
@@ -41,57 +45,18 @@ def analyze_kdj_pattern(k, d, j):
     return ", ".join(patterns)
 
 def check_rules(df, current_kdj):
-    if len(df) < 3: return None, None
-    q3 = df.iloc[-1]
-    q2 = df.iloc[-2]
-    q1 = df.iloc[-3]
-    
-    k = current_kdj['K']
-    d = current_kdj['D']
-    is_k_gt_d = k > d
-    is_k_lt_d = k < d
-
-    p1_status = None # S1 logic omitted for brevity as we focus on S2 Pending
-
-    p2_status = None
-    # S2: Pending Logic (Quarterly)
+    # S2: Pending Logic (Quarterly), see rule_engine.rule_stock_pending
     # Long: Q2 Up, Q3 Retrace but hold Q1 Low, Not break Q2 High, Q3 High < Q2 High, K > D
-    cond_pending_long = (q2['high'] > q1['high']) and \
-                        (q3['close'] > q1['low']) and \
-                        (q3['close'] <= q2['high']) and \
-                        (q3['high'] < q2['high']) and \
-                        is_k_gt_d
-    
     # Short: (Disabled for Stocks as per user request)
-    cond_pending_short = False
-    # cond_pending_short = (q2['low'] < q1['low']) and \
-    #                      (q3['close'] < q1['high']) and \
-    #                      (q3['close'] >= q2['low']) and \
-    #                      (q3['low'] > q2['low']) and \
-    #                      is_k_lt_d
-                         
-    if cond_pending_long: p2_status = 'pending_long'
-    # elif cond_pending_short: p2_status = 'pending_short'
-        
+    if len(df) < 3: return None, None
+    panel = BarPanel.from_arrays(df['high'].to_numpy()[-3:], df['low'].to_numpy()[-3:], df['close'].to_numpy()[-3:])
+    p1_status = None # S1 logic omitted for brevity as we focus on S2 Pending
+    p2_status = pattern_status(panel, 'stock_pending', k=[current_kdj['K']], d=[current_kdj['D']])[0]
     return p1_status, p2_status
 
 def daily_to_quarterly(df):
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-
-    # Use 'QE' for Quarter End in newer pandas
-    try:
-        quarterly = df.resample('QE').agg({
-            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-        }).dropna()
-    except Exception:
-        # Fallback for older pandas
-        quarterly = df.resample('Q').agg({
-            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-        }).dropna()
-    quarterly.reset_index(inplace=True)
-    quarterly['date'] = quarterly['date'].dt.strftime('%Y-%m-%d')
-    return quarterly
+    # Quarter-end labels, same as resample('QE').agg(...).dropna()
+    return resample_frame(df, 'Q')
 
 def get_latest_report_date():
     now = datetime.now()
@@ -148,65 +113,48 @@ def fetch_loss_making_stocks():
             
     return loss_codes
 
-def get_sector_map():
-    sector_map = {}
-    cache_file = "sector_map.json"
-    
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                sector_map = json.load(f)
-            # If cache seems populated (e.g. > 1000 items), use it. 
-            # Otherwise we might want to update it, but for now let's trust the cache if it exists.
-            if len(sector_map) > 1000:
-                print(f"Loaded {len(sector_map)} sectors from cache.")
-                return sector_map
-        except Exception as e:
-            print(f"Error loading sector cache: {e}")
+def fetch_daily_hist(code, start_date, end_date):
+    df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
+    if df is None or df.empty: return None
     
-    print("Fetching fresh sector data (This may take 1-2 mins)...")
-    try:
-        boards = ak.stock_board_industry_name_em()
-        total = len(boards)
-        for i, row in boards.iterrows():
-            board_name = row['板块名称']
-            try:
-                cons = ak.stock_board_industry_cons_em(symbol=board_name)
-                for _, stock in cons.iterrows():
-                    code = str(stock['代码']).zfill(6)
-                    sector_map[code] = board_name
-            except:
-                pass
-            if i % 10 == 0: 
-                print(f"Fetched {i}/{total} sectors...")
-                
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(sector_map, f, ensure_ascii=False)
-            
-    except Exception as e:
-        print(f"Error fetching sectors: {e}")
-        
-    return sector_map
+    # Renaissance columns (Chinese to English)
+    df.rename(columns={
+        '日期': 'date', '开盘': 'open', '收盘': 'close', 
+        '最高': 'high', '最低': 'low', '成交量': 'volume'
+    }, inplace=True)
+    return df
 
-def fetch_stock_task(args):
-    code, name = args
+def fetch_stock_bars(code):
+    """
+    I/O stage (runs in a thread). Returns (outcome, payload):
+      ('ok', daily DataFrame) or ('empty' | 'network' | 'io' | 'parse', error text)
+    """
     try:
-        # Fetch Daily (5 years)
+        # Fetch Daily (5 years), only new days are downloaded once cached
         end_date = datetime.now().strftime('%Y%m%d')
         start_date = (datetime.now() - pd.DateOffset(years=5)).strftime('%Y%m%d')
         
-        df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
-        if df is None or df.empty: return None
-        
-        # Renaissance columns (Chinese to English)
-        df.rename(columns={
-            '日期': 'date', '开盘': 'open', '收盘': 'close', 
-            '最高': 'high', '最低': 'low', '成交量': 'volume'
-        }, inplace=True)
-        
+        with span('fetch'):
+            df = update_bars(BAR_STORE, code, fetch_daily_hist, start_date, end_date)
+    except Exception as e:
+        return classify_error(e), f"{type(e).__name__}: {e}"
+    if df is None or df.empty: return 'empty', "no daily bars"
+    return 'ok', df
+
+def analyze_stock(args):
+    """
+    CPU stage (runs in a worker process) on the bars from fetch_stock_bars.
+    Returns (code, outcome, payload):
+      ('ok', result) / ('skip', None) for finished symbols (skip = too little history),
+      ('parse', error text) when the computation fails, see scan_checkpoint
+    """
+    code, name, df = args
+    try:
         # To Quarterly
-        quarterly = daily_to_quarterly(df)
-        if len(quarterly) < 5: return None
+        with span('resample'):
+            quarterly = daily_to_quarterly(df)
+        # KDJ needs 9 quarters (calculate_kdj min_bars below)
+        if len(quarterly) < 9: return code, 'skip', None
         
         # Verify Pending Rule
         # User Requirement: Exclude the last (current) K-line for pending calculation
@@ -219,7 +167,8 @@ def fetch_stock_task(args):
         # So we can just take the KDJ values from the full calculation?
         # Actually, let's keep it simple: Use the full dataframe's KDJ, but look at iloc[-2] (the previous quarter) as the "Signal Bar".
         
-        quarterly = calculate_kdj(quarterly)
+        with span('kdj'):
+            quarterly = calculate_kdj(quarterly, min_bars=9)
         
         # Define the dataset for checking rules (The completed quarters)
         check_df = quarterly.iloc[:-1]
@@ -231,11 +180,12 @@ def fetch_stock_task(args):
         }
         
         # Perform check on the sliced dataframe (excluding current)
-        p1, p2 = check_rules(check_df, kdj_completed)
+        with span('rules'):
+            p1, p2 = check_rules(check_df, kdj_completed)
         
 
         
-        return {
+        return code, 'ok', {
             'code': code,
             'name': name,
             'status': p2 if p2 else 'normal',
@@ -253,129 +203,227 @@ def fetch_stock_task(args):
             
             'data': json.loads(quarterly.tail(12).to_json(orient='records')) # Full data for chart
         }
-    except Exception:
-        pass
-    return None
+    except Exception as e:
+        return code, 'parse', f"{type(e).__name__}: {e}"
+
+def analyze_task(args):
+    """analyze_stock in a worker process, returns (result, stage timings of this call)"""
+    return analyze_stock(args), RUN.drain_stages()
+
+def fetch_stock_task(args):
+    """Both stages in one call (single symbol, no pipeline)"""
+    code, name = args
+    outcome, payload = fetch_stock_bars(code)
+    if outcome != 'ok':
+        return code, outcome, payload
+    return analyze_stock((code, name, payload))
+
+def scan_stocks(stocks, pool, cpu_workers, io_workers=IO_WORKERS, queue_size=QUEUE_SIZE):
+    """
+    Two-stage pipeline, yields (code, outcome, payload) as symbols finish.
+    io_workers threads download bars into a bounded queue; the main thread
+    hands them to the process pool (at most 2 tasks per cpu worker in flight).
+    When the CPU stage falls behind, the queue fills and the downloads wait.
+    """
+    fetched = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    
+    def fetch(item):
+        if stop.is_set(): return
+        code, name = item
+        entry = (code, name) + fetch_stock_bars(code)
+        while not stop.is_set():
+            try:
+                fetched.put(entry, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+    
+    # Start the worker processes before any download thread exists (fork + threads can deadlock)
+    pool.submit(int).result()
+    io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="bars")
+    for item in stocks:
+        io.submit(fetch, item)
+    limit = 2 * cpu_workers
+    in_flight = set()
+    received = 0
+    try:
+        while received < len(stocks) or in_flight:
+            can_submit = received < len(stocks) and len(in_flight) < limit
+            if in_flight:
+                done, in_flight = wait(in_flight, timeout=0 if can_submit else None,
+                                       return_when=FIRST_COMPLETED)
+                for task in done:
+                    result, stages = task.result()
+                    RUN.merge_stages(stages)
+                    yield result
+            if not can_submit:
+                continue
+            try:
+                code, name, outcome, payload = fetched.get(timeout=0.05 if in_flight else None)
+            except queue.Empty:
+                continue
+            received += 1
+            if outcome == 'ok':
+                in_flight.add(pool.submit(analyze_task, (code, name, payload)))
+            else:
+                yield code, outcome, payload
+    finally:
+        stop.set()
+        io.shutdown(wait=False, cancel_futures=True)
+        for task in in_flight:
+            task.cancel()
+
+def write_report_item(f, item):
+    direction = "做多" if "long" in item['status'] else "做空"
+    f.write(f"{item['name']} ({item['code']}) - {direction}\n")
+    f.write(f"  Price: {item['price']}, Date: {item['last_date']}\n")
+    f.write(f"  KDJ: K={item['kdj']['K']}, D={item['kdj']['D']}\n")
+    if direction == "做多":
+        f.write(f"  Setup: Q2 High {item['q2_high']}, Breakout > {item['q2_high']}\n")
+    else:
+        f.write(f"  Setup: Q2 Low {item['q2_low']}, Breakdown < {item['q2_low']}\n")
+    f.write("\n")
 
 def main():
+    start_run('fetch_stocks_quarterly')
     print("Step 1: Fetching Stock List...")
     try:
-        spot_df = ak.stock_zh_a_spot_em()
+        # Shared spot snapshot (TTL cached), also used for enrichment below
+        with span('universe'):
+            spot = load_spot()
     except Exception as e:
         print(f"Failed to fetch stock list: {e}")
         return
 
-    # Filter 1: Market Board (BJ, STAR)
+    # Filter 1: Market Board (BJ, STAR) and ST names
     # BJ: Starts with 8, 4, 9_
     # STAR: Starts with 688
-    def is_valid_market(code):
-        if code.startswith(('8', '4', '9', '688')): return False
-        return True
-
-    valid_stocks = []
-    for _, row in spot_df.iterrows():
-        code = str(row['代码'])
-        name = str(row['名称'])
-        if is_valid_market(code) and 'ST' not in name:
-            valid_stocks.append((code, name))
+    invalid_market = np.zeros(len(spot), dtype=bool)
+    for prefix in ('8', '4', '9', '688'):
+        invalid_market |= np.char.startswith(spot.code, prefix)
+    is_st = np.char.find(spot.name, 'ST') >= 0
+    keep = ~invalid_market & ~is_st
+    valid_stocks = list(zip(spot.code[keep].tolist(), spot.name[keep].tolist()))
             
     print(f"Total valid stocks (No BJ/STAR/ST): {len(valid_stocks)}")
     
     print("Step 2: Fetching Financial Loss List...")
-    loss_codes = fetch_loss_making_stocks()
+    with span('universe'):
+        loss_codes = fetch_loss_making_stocks()
     print(f"Total loss-making stocks to exclude: {len(loss_codes)}")
     
     # Filter 2: Loss making
     final_stocks = [s for s in valid_stocks if s[0] not in loss_codes]
+    names_by_code = {code: (code, name) for code, name in final_stocks}
     print(f"Final stocks to scan: {len(final_stocks)}")
     
     # For testing, limiter
     # final_stocks = final_stocks[:50] # Debug
     
-    print("Step 3: Scanning for Pending Patterns (Multiprocessing)...")
-    start_time = time.time()
-    
-    results = []
-    # Use 8 processes or CPU count
-    pool_size = min(8, cpu_count())
-    with Pool(pool_size) as pool:
-        # Use imap_unordered for progress
-        total = len(final_stocks)
-        for i, res in enumerate(pool.imap_unordered(fetch_stock_task, final_stocks), 1):
-            if res:
-                results.append(res)
-            if i % 100 == 0:
-                print(f"Progress: {i}/{total} - Captured {len(results)} stocks")
-                
-    end_time = time.time()
-    print(f"Scan complete in {end_time - start_time:.1f}s. Found {len(results)} stocks.")
+    # Sector map is prepared up front; PE / Market Cap / Turnover come from the
+    # spot snapshot, joined on code per batch as results stream out of the pool
+    print("Preparing enrichment data (Sector, PE, Market Cap, Turnover)...")
+    with span('enrich'):
+        sector_map = get_sector_map()
     
-    # Enrichment: Add Sector, PE, Market Cap, Turnover
-    print("Enriching data with Sector, PE, Market Cap, Turnover...")
+    print(f"Step 3: Scanning for Pending Patterns ({IO_WORKERS} download threads, {cpu_count()} processes)...")
+    # Each finished symbol is appended to scan_state/ right away; rerunning on the
+    # same day only scans the symbols that are not finished yet
+    checkpoint = ScanCheckpoint(run_key=datetime.now().strftime('%Y%m%d'))
+    todo = checkpoint.pending(final_stocks)
+    if checkpoint.resumed:
+        print(f"Resuming: {checkpoint.resumed} stocks already done, {len(todo)} left")
+    stats = ScanStats()
     
-    # 1. Prepare Spot Data Map
-    spot_data_map = {}
     try:
-        # We already have spot_df from Step 1, but we need to ensure columns match
-        # Clean data
-        spot_df['代码'] = spot_df['代码'].astype(str).str.zfill(6)
-        spot_df['市盈率-动态'] = pd.to_numeric(spot_df['市盈率-动态'], errors='coerce')
-        spot_df['总市值'] = pd.to_numeric(spot_df['总市值'], errors='coerce')
-        spot_df['成交额'] = pd.to_numeric(spot_df['成交额'], errors='coerce')
-        
-        for _, row in spot_df.iterrows():
-            code = row['代码']
-            spot_data_map[code] = {
-                'pe': None if pd.isna(row['市盈率-动态']) else row['市盈率-动态'],
-                'market_cap': None if pd.isna(row['总市值']) else row['总市值'],
-                'turnover': None if pd.isna(row['成交额']) else row['成交额']
-            }
-    except Exception as e:
-        print(f"Error processing spot data for enrichment: {e}")
-
-    # 2. Get Sector Map
-    sector_map = get_sector_map()
+        # Downloads are I/O bound (threads), resample + KDJ + rules are CPU bound (processes)
+        cpu_workers = cpu_count()
+        # Workers send their stage timings back with each result (analyze_task)
+        with ProcessPoolExecutor(max_workers=cpu_workers, initializer=worker_init) as pool:
+            attempt = 1
+            while todo:
+                retry = []
+                for i, (code, outcome, payload) in enumerate(scan_stocks(todo, pool, cpu_workers), 1):
+                    stats.add(code, outcome)
+                    count(f"outcome.{outcome}")
+                    if outcome in ('ok', 'skip'):
+                        checkpoint.record(code, outcome, payload)
+                    else:
+                        checkpoint.fail(code, outcome, payload, attempt)
+                        if outcome in RETRYABLE and attempt < MAX_ATTEMPTS:
+                            retry.append(names_by_code[code])
+                    if i % 100 == 0:
+                        print(f"Progress: {i}/{len(todo)} - Captured {stats.ok} stocks, "
+                              f"{len(checkpoint.failures)} failed")
+                if not retry:
+                    break
+                # Retryable failures (network / empty data) go again at the end, with backoff
+                delay = retry_delay(attempt)
+                count('retries', len(retry))
+                print(f"Retrying {len(retry)} failed stocks in {delay:.0f}s (attempt {attempt + 1}/{MAX_ATTEMPTS})...")
+                time.sleep(delay)
+                todo = retry
+                attempt += 1
+    except KeyboardInterrupt:
+        checkpoint.close()
+        print(f"Interrupted. {len(checkpoint.done)} stocks saved in scan_state/, rerun to resume.")
+        finish_run(extra={'interrupted': True, 'scan': stats.summary(checkpoint)})
+        return
+    
+    summary = stats.summary(checkpoint)
+    checkpoint.save_summary(summary)
+    failed = ", ".join(f"{k}={v}" for k, v in sorted(summary['failed'].items())) or "none"
+    print(f"Scan complete in {summary['elapsed']:.1f}s: {summary['processed']} stocks "
+          f"({summary['throughput']:.1f}/s), failure rate {summary['failure_rate']:.1%} ({failed})")
+    if checkpoint.failures:
+        print(f"  Failure ledger: {checkpoint.failures_path}")
     
-    # 3. Enrich Results
-    for item in results:
-        code = item['code']
+    # Results are streamed from the checkpoint to stock_quarterly_all.json /
+    # stock_quarterly_pending.json (compact JSON) and to the report body;
+    # nothing is collected in memory
+    report_body = "stock_pending_report.txt.body.tmp"
+    with QuarterlyOutput() as output, open(report_body, "w", encoding="utf-8") as report:
+        batch = []
         
-        # Add Spot Data
-        if code in spot_data_map:
-            item.update(spot_data_map[code])
-        else:
-            item['pe'] = None
-            item['market_cap'] = None
-            item['turnover'] = None
-            
-        # Add Sector
-        item['sector'] = sector_map.get(code, None)
-
-    # Save all results
-    with open("stock_quarterly_all.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+        def flush():
+            # Enrich: Add Spot Data (vectorized join) + Sector
+            with span('enrich'):
+                enrich_records(batch, spot)
+                for item in batch:
+                    item['sector'] = sector_map.get(item['code'], None)
+            with span('write'):
+                for item in batch:
+                    output.write(item)
+                    write_report_item(report, item)
+            batch.clear()
         
-    # Save pending only (enriched)
-    pending_only = [r for r in results if r['status'] and 'pending' in r['status']]
-    with open("stock_quarterly_pending.json", "w", encoding="utf-8") as f:
-        json.dump(pending_only, f, ensure_ascii=False, indent=2)
+        for item in checkpoint.results():
+            batch.append(item)
+            if len(batch) >= ENRICH_BATCH:
+                flush()
+        flush()
+    checkpoint.close()
+    found, pending = output.counts
+    print(f"Found {found} stocks ({pending} pending).")
         
-    # Generate Report
+    # Generate Report (header needs the final count, body was streamed above)
     with open("stock_pending_report.txt", "w", encoding="utf-8") as f:
         f.write(f"Stock Quarterly Pending Report\nTime: {datetime.now()}\n\n")
         f.write(f"Total scanned: {len(final_stocks)}\n")
-        f.write(f"Found: {len(results)}\n\n")
-        
-        for item in results:
-            direction = "做多" if "long" in item['status'] else "做空"
-            f.write(f"{item['name']} ({item['code']}) - {direction}\n")
-            f.write(f"  Price: {item['price']}, Date: {item['last_date']}\n")
-            f.write(f"  KDJ: K={item['kdj']['K']}, D={item['kdj']['D']}\n")
-            if direction == "做多":
-                f.write(f"  Setup: Q2 High {item['q2_high']}, Breakout > {item['q2_high']}\n")
-            else:
-                f.write(f"  Setup: Q2 Low {item['q2_low']}, Breakdown < {item['q2_low']}\n")
-            f.write("\n")
+        f.write(f"Found: {found}\n\n")
+        with open(report_body, "r", encoding="utf-8") as body:
+            shutil.copyfileobj(body, f)
+    os.remove(report_body)
+    
+    # Compact summary + lazily loaded chart shards for stocks_quarterly.html
+    with span('payload'):
+        print(stock_payload.report(stock_payload.build_payload(ALL_FILE), ALL_FILE))
+    with span('sectors'):
+        table, _ = sector_stats.load_table(ALL_FILE)
+        rows, recomputed, changed = sector_stats.update_stats(table)
+        print(f"Sector stats: {len(rows)} sectors, {recomputed} recomputed ({changed} stocks changed)")
+    finish_run(extra={'scan': summary, 'found': found, 'pending': pending})
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,103 @@
+"""
+futures_data.js 统一读取入口
+只解析一次，解析结果写入二进制旁路缓存 (pickle)，按 mtime + 内容哈希失效
+各分析脚本统一通过 load_futures_data() / load_futures_series() 获取同一份数据
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict
+
+from bar_series import FuturesProduct, products_from_data
+
+# 品种代码 -> {name, code, period, main, sub}
+FuturesData = Dict[str, Dict[str, Any]]
+# 品种代码 -> FuturesProduct (列式 K 线)
+FuturesSeries = Dict[str, FuturesProduct]
+
+DATA_MARKER = "const FUTURES_DATA ="
+CACHE_SUFFIX = ".cache.pkl"
+SERIES_CACHE_SUFFIX = ".series.cache.pkl"
+CACHE_VERSION = 1
+
+
+def parse_futures_js(content):
+    """
+    从 JS 文本中解析 FUTURES_DATA 对象
+    使用 JSON 解码器定位对象结尾，字符串里出现 '};' 也不会截断
+    """
+    marker = content.find(DATA_MARKER)
+    if marker == -1:
+        raise ValueError("找不到 FUTURES_DATA")
+    start = content.find('{', marker)
+    if start == -1:
+        raise ValueError("FUTURES_DATA 后没有 JSON 对象")
+    data, _ = json.JSONDecoder().raw_decode(content, start)
+    return data
+
+
+def cache_path(path, suffix=CACHE_SUFFIX):
+    return path + suffix
+
+
+def _read_cache(path, suffix):
+    try:
+        with open(cache_path(path, suffix), 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(path, suffix, meta, data):
+    target = cache_path(path, suffix)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(dict(meta, version=CACHE_VERSION, data=data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+    except OSError:
+        # 缓存写失败不影响读取结果
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _load_cached(path, suffix, build, use_cache):
+    """
+    - mtime 和大小与缓存一致：直接返回缓存，不读 JS 文件
+    - mtime 变了但内容哈希一致：刷新缓存中的 mtime 后返回
+    - 否则用 build(文本) 重新解析并重写缓存
+    """
+    st = os.stat(path)
+    cached = _read_cache(path, suffix) if use_cache else None
+    if cached and cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+        return cached['data']
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    meta = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha1': digest}
+
+    if cached and cached['sha1'] == digest:
+        data = cached['data']
+    else:
+        data = build(raw.decode('utf-8'))
+
+    if use_cache:
+        _write_cache(path, suffix, meta, data)
+    return data
+
+
+def load_futures_data(path="futures_data.js", use_cache=True) -> FuturesData:
+    """读取 futures_data.js，返回原始字典 (需要改写后再保存的脚本使用)"""
+    return _load_cached(path, CACHE_SUFFIX, parse_futures_js, use_cache)
+
+
+def load_futures_series(path="futures_data.js", use_cache=True) -> FuturesSeries:
+    """读取 futures_data.js，返回列式 K 线 {代码: FuturesProduct} (规则扫描脚本使用)"""
+    return _load_cached(path, SERIES_CACHE_SUFFIX,
+                        lambda text: products_from_data(parse_futures_js(text)), use_cache)
@@ -0,0 +1,244 @@
+"""
+期货数据分片存储
+每个品种一个紧凑 JSON 文件 (futures_data.shards/RB.json)，manifest.json 记录品种顺序、各分片的版本和 sha1
+    分片中的 K 线按 bar_codec 编码 (tick 整数 / 日期差 / 定点 KDJ)，读取时还原，调用方看到的仍是 data 列表
+    改一个品种只重写它的分片 + manifest (内容没变的分片不重写)
+    futures_data.js (futures.html 使用的浏览器包) 由 build_bundle 从分片还原拼接，分片都没有变化时不重写
+    只需要部分品种的脚本用 store.load(codes) 只读这些分片
+
+futures_data.js 被外部改动 (git pull / 手工编辑 / JS 脚本) 后，下次打开时按它重新导入分片
+
+用法: python futures_store.py [--bundle futures_data.js] [--force]   # 按需重建浏览器包
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from bar_codec import pack_product, unpack_product
+from futures_loader import parse_futures_js
+
+BUNDLE_FILE = "futures_data.js"
+MANIFEST_FILE = "manifest.json"
+
+BUNDLE_HEADER = """// 期货周线数据 + KDJ 指标（主力 + 次主力合约）
+// 更新时间: {time}
+// 数据来源: 新浪财经 (via AKShare)
+// 周期: 周线 (最近3个月)
+
+const FUTURES_DATA = """
+
+BUNDLE_FOOTER = """;
+
+// 导出（如果在 Node.js 环境）
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = FUTURES_DATA;
+}
+"""
+
+
+def shard_root(bundle):
+    """futures_data.js -> futures_data.shards"""
+    return os.path.splitext(bundle)[0] + ".shards"
+
+
+def _dumps(product):
+    return json.dumps(product, ensure_ascii=False, separators=(',', ':'))
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class FuturesStore:
+    """
+    manifest.json:
+        {"version": 全局版本号, "order": [代码, ...],
+         "products": {代码: {"file", "sha1", "version", "updated"}},
+         "bundle": {"sha1", "mtime_ns", "size", "order", "products": {代码: sha1}}}   # 上次生成 / 导入浏览器包时的状态
+    """
+
+    def __init__(self, bundle=BUNDLE_FILE, root=None):
+        self.bundle = bundle
+        self.root = root or shard_root(bundle)
+        self.manifest_path = os.path.join(self.root, MANIFEST_FILE)
+        self.manifest = self._read_manifest()
+        self._sync_from_bundle()
+
+    # ---- manifest ----
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if isinstance(manifest.get('products'), dict):
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': 0, 'order': [], 'products': {}, 'bundle': {}}
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        _write_atomic(self.manifest_path, json.dumps(self.manifest, ensure_ascii=False, indent=1))
+
+    def _bundle_stat(self):
+        try:
+            st = os.stat(self.bundle)
+        except OSError:
+            return None
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+    def _sync_from_bundle(self):
+        """浏览器包与 manifest 记录的不一致时 (外部改动)，按包重新导入分片"""
+        stat = self._bundle_stat()
+        if stat is None:
+            return
+        record = self.manifest.get('bundle') or {}
+        if record.get('mtime_ns') == stat['mtime_ns'] and record.get('size') == stat['size']:
+            return
+        with open(self.bundle, 'r', encoding='utf-8') as f:
+            text = f.read()
+        digest = _sha1(text)
+        if record.get('sha1') != digest:
+            self.save_all(parse_futures_js(text), write_manifest=False)
+            record = {'sha1': digest, 'order': list(self.manifest['order']),
+                      'products': {code: p['sha1'] for code, p in self.manifest['products'].items()}}
+        self.manifest['bundle'] = dict(record, **stat)
+        self._write_manifest()
+
+    # ---- 读取 ----
+
+    def __len__(self):
+        return len(self.manifest['order'])
+
+    def __contains__(self, code):
+        return code in self.manifest['products']
+
+    def codes(self):
+        return list(self.manifest['order'])
+
+    def _read_shard(self, code):
+        with open(os.path.join(self.root, self.manifest['products'][code]['file']), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def get(self, code):
+        """单个品种的字典，不存在为 None"""
+        if code not in self:
+            return None
+        return unpack_product(json.loads(self._read_shard(code)))
+
+    def load(self, codes=None):
+        """{代码: 品种字典}，按 manifest 顺序；codes 为 None 时读全部"""
+        wanted = self.codes() if codes is None else [c for c in self.codes() if c in set(codes)]
+        return {code: unpack_product(json.loads(self._read_shard(code))) for code in wanted}
+
+    # ---- 写入 ----
+
+    def save(self, code, product, write_manifest=True):
+        """写入一个品种，内容未变时不写文件；返回是否有变化"""
+        text = _dumps(pack_product(code, product))
+        digest = _sha1(text)
+        entry = self.manifest['products'].get(code)
+        if code not in self.manifest['order']:
+            self.manifest['order'].append(code)
+        if entry is not None and entry['sha1'] == digest:
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        self.manifest['version'] += 1
+        entry = {'file': f"{code}.json", 'sha1': digest, 'version': self.manifest['version'],
+                 'updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        _write_atomic(os.path.join(self.root, entry['file']), text)
+        self.manifest['products'][code] = entry
+        if write_manifest:
+            self._write_manifest()
+        return True
+
+    def remove(self, code, write_manifest=True):
+        entry = self.manifest['products'].pop(code, None)
+        if code in self.manifest['order']:
+            self.manifest['order'].remove(code)
+        if entry is None:
+            return False
+        try:
+            os.remove(os.path.join(self.root, entry['file']))
+        except OSError:
+            pass
+        self.manifest['version'] += 1
+        if write_manifest:
+            self._write_manifest()
+        return True
+
+    def save_all(self, data, prune=True, write_manifest=True):
+        """
+        用 data 替换全部品种 (顺序同 data)；prune 时删除 data 中没有的品种
+        返回有变化的代码列表
+        """
+        changed = [code for code, product in data.items() if self.save(code, product, write_manifest=False)]
+        if prune:
+            changed += [code for code in self.codes() if code not in data and self.remove(code, False)]
+            self.manifest['order'] = list(data)
+        if write_manifest:
+            self._write_manifest()
+        return changed
+
+    # ---- 浏览器包 ----
+
+    def bundle_stale(self):
+        record = self.manifest.get('bundle') or {}
+        stat = self._bundle_stat()
+        if stat is None or record.get('mtime_ns') != stat['mtime_ns'] or record.get('size') != stat['size']:
+            return True
+        return (record.get('order') != self.manifest['order']
+                or record.get('products') != {c: p['sha1'] for c, p in self.manifest['products'].items()})
+
+    def build_bundle(self, force=False):
+        """从分片拼出 futures_data.js (K 线解码为普通 JSON)；没有变化时跳过，返回是否重写"""
+        if not force and not self.bundle_stale():
+            return False
+        body = ','.join(f"{json.dumps(code, ensure_ascii=False)}:{_dumps(self.get(code))}" for code in self.codes())
+        text = (BUNDLE_HEADER.format(time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                + '{' + body + '}' + BUNDLE_FOOTER)
+        _write_atomic(self.bundle, text)
+        self.manifest['bundle'] = dict(
+            self._bundle_stat(), sha1=_sha1(text), order=self.codes(),
+            products={code: p['sha1'] for code, p in self.manifest['products'].items()})
+        self._write_manifest()
+        return True
+
+
+def save_products(data, bundle=BUNDLE_FILE, codes=None):
+    """
+    保存品种并按需重建浏览器包
+    codes 为 None: data 是完整数据集 (删除其中没有的品种)；否则只保存 codes 中的品种
+    返回 (有变化的代码列表, 是否重写了浏览器包)
+    """
+    store = FuturesStore(bundle)
+    if codes is None:
+        changed = store.save_all(data)
+    else:
+        changed = [code for code in codes if store.save(code, data[code], write_manifest=False)]
+        store._write_manifest()
+    return changed, store.build_bundle()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按分片重建 futures_data.js")
+    parser.add_argument('--bundle', default=BUNDLE_FILE)
+    parser.add_argument('--force', action='store_true', help="分片没有变化也重写")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = FuturesStore(args.bundle)
+    rebuilt = store.build_bundle(force=args.force)
+    print(f"{len(store)} 个品种 (manifest 版本 {store.manifest['version']})，"
+          f"{'已重建' if rebuilt else '无变化，未重写'} {args.bundle}，耗时 {time.perf_counter() - start:.2f}s")
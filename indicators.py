@@ -0,0 +1,277 @@
+"""
+技术指标公共模块
+KDJ 以 IIR 递推方式在 NumPy 数组上计算，支持单序列和 (品种 × K线) 批量计算
+KDJState 保存递推状态，新 K 线 / 盘中修正最后一根 K 线时 O(1) 更新
+kdj_grid 一次计算多组 (n, m1, m2) 参数 (参数扫描用)
+fetch_futures.py / fetch_fix.py / fetch_stocks_quarterly.py 共用
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+def rolling_extrema(high, low, n=9):
+    """
+    计算 n 周期滚动最高价 / 最低价 (等价于 pandas rolling(n, min_periods=1))
+
+    参数:
+        high, low: 1 维或 2 维数组 (品种 × K线)，允许在序列前端用 NaN 填充
+    返回:
+        (high_n, low_n)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    high_n = high.copy()
+    low_n = low.copy()
+    # n 很小 (默认 9)，按偏移量逐次比较，每次都是整块数组运算
+    for shift in range(1, n):
+        if shift >= high.shape[-1]:
+            break
+        high_n[..., shift:] = np.fmax(high_n[..., shift:], high[..., :-shift])
+        low_n[..., shift:] = np.fmin(low_n[..., shift:], low[..., :-shift])
+    return high_n, low_n
+
+
+def rsv_from_extrema(close, high_n, low_n):
+    """
+    RSV = (C - Ln) / (Hn - Ln) * 100
+    0/0 以及序列中间缺失的收盘价记为 50 (与原 calculate_kdj 的 fillna(50) 一致)，
+    只保留前端填充位置 (第一个有效收盘价之前) 的 NaN
+    """
+    close = np.asarray(close, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = (close - low_n) / (high_n - low_n) * 100
+    started = np.logical_or.accumulate(~np.isnan(close), axis=-1)
+    rsv[np.isnan(rsv) & started] = 50
+    return rsv
+
+
+def _first_valid(values):
+    """每行第一个非 NaN 的位置 (全为 NaN 时为长度)"""
+    valid = ~np.isnan(values)
+    return np.where(valid.any(axis=-1), valid.argmax(axis=-1), values.shape[-1])
+
+
+def _smooth(values, m, start):
+    """
+    (参数组 × 品种 × K线) 的递推平滑: Y(t) = (m-1)/m * Y(t-1) + 1/m * X(t)，第 start 根取 50
+    m: 每个参数组的平滑周期；递推沿时间轴进行，所有参数组和品种一次完成
+    """
+    m = np.asarray(m, dtype=float)[:, np.newaxis]
+    keep = (m - 1) / m
+    gain = 1 / m
+    groups, rows, bars = values.shape
+    out = np.full(values.shape, np.nan)
+    prev = np.full((groups, rows), np.nan)
+    for t in range(bars):
+        cur = keep * prev + gain * values[:, :, t]
+        cur[:, start == t] = 50
+        out[:, :, t] = cur
+        prev = cur
+    return out
+
+
+def kdj_filter(rsv, m1=3, m2=3):
+    """
+    对 RSV 做 KDJ 平滑递推:
+        K(t) = (m1-1)/m1 * K(t-1) + 1/m1 * RSV(t)
+        D(t) = (m2-1)/m2 * D(t-1) + 1/m2 * K(t)
+    每条序列从第一个非 NaN 位置开始，首根 K/D 取 50。
+    递推沿时间轴进行，同一时刻的所有品种一次完成。
+    """
+    rsv = np.asarray(rsv, dtype=float)
+    squeeze = rsv.ndim == 1
+    if squeeze:
+        rsv = rsv[np.newaxis, :]
+
+    start = _first_valid(rsv)
+    k = _smooth(rsv[np.newaxis], [m1], start)
+    d = _smooth(k, [m2], start)[0]
+    k = k[0]
+
+    j = 3 * k - 2 * d
+    if squeeze:
+        return k[0], d[0], j[0]
+    return k, d, j
+
+
+def kdj_arrays(high, low, close, n=9, m1=3, m2=3):
+    """
+    计算 KDJ (未取整)
+
+    参数:
+        high, low, close: 1 维数组，或 (品种 × K线) 的 2 维数组。
+                          长度不同的序列请在前端用 NaN 对齐。
+    返回:
+        (K, D, J)，形状与输入一致；第一个有效收盘价之前为 NaN，K/D 从该位置起取 50 开始递推
+        (原 calculate_kdj 总从第一根起算，只有序列以缺失的收盘价开头时两者不同)
+    """
+    high_n, low_n = rolling_extrema(high, low, n)
+    rsv = rsv_from_extrema(close, high_n, low_n)
+    return kdj_filter(rsv, m1, m2)
+
+
+def kdj_grid(high, low, close, params):
+    """
+    一次计算多组 (n, m1, m2) 参数的 KDJ (未取整，研究用，见 kdj_sweep.py)
+    滚动最高 / 最低价按 n 从小到大逐步扩展，每个 n 算一次 RSV；K 按 (n, m1) 共享，D 按参数组计算
+    每组结果与 kdj_arrays(high, low, close, n, m1, m2) 逐位一致
+
+    参数:
+        high, low, close: 1 维或 2 维数组 (品种 × K线)，前端可用 NaN 对齐
+        params: [(n, m1, m2), ...]
+    返回:
+        (K, D, J)，形状为 (参数组数,) + high.shape
+    """
+    params = [tuple(int(x) for x in p) for p in params]
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    squeeze = high.ndim == 1
+    if squeeze:
+        high, low, close = high[np.newaxis], low[np.newaxis], close[np.newaxis]
+
+    # 与 rolling_extrema 相同的逐偏移量比较，n 变大时接着比较更远的偏移
+    rsv = {}
+    high_n, low_n = high.copy(), low.copy()
+    reached = 1
+    for n in sorted({n for n, _, _ in params}):
+        for shift in range(reached, min(n, high.shape[-1])):
+            high_n[..., shift:] = np.fmax(high_n[..., shift:], high[..., :-shift])
+            low_n[..., shift:] = np.fmin(low_n[..., shift:], low[..., :-shift])
+        reached = max(reached, n)
+        rsv[n] = rsv_from_extrema(close, high_n, low_n)
+
+    start = _first_valid(next(iter(rsv.values())))
+    k_keys = sorted({(n, m1) for n, m1, _ in params})
+    k_all = _smooth(np.stack([rsv[n] for n, _ in k_keys]), [m1 for _, m1 in k_keys], start)
+    k = k_all[[k_keys.index((n, m1)) for n, m1, _ in params]]
+    d = _smooth(k, [m2 for _, _, m2 in params], start)
+    j = 3 * k - 2 * d
+    if squeeze:
+        return k[:, 0], d[:, 0], j[:, 0]
+    return k, d, j
+
+
+def calculate_kdj(df, n=9, m1=3, m2=3, min_bars=0):
+    """
+    计算 KDJ 指标，写入 df 的 K / D / J 列 (保留两位小数)
+
+    min_bars: K线数量不足时原样返回 df (不写入 KDJ 列)
+    """
+    if len(df) < min_bars:
+        return df
+    k, d, j = kdj_arrays(df['high'].to_numpy(dtype=float),
+                         df['low'].to_numpy(dtype=float),
+                         df['close'].to_numpy(dtype=float), n, m1, m2)
+
+    df['K'] = np.round(k, 2)
+    df['D'] = np.round(d, 2)
+    df['J'] = np.round(j, 2)
+
+    return df
+
+
+class KDJState:
+    """
+    KDJ 递推状态，可随合约一起序列化 (futures_data.js 中的 kdjState)
+
+    保存已收盘 K 线递推到的 K / D，以及最近 n-1 根 K 线最高价 / 最低价的单调队列，
+    最后一根 K 线 (可能未收盘) 单独存放，不并入状态:
+        update(bar) 日期与最后一根相同 -> 修正最后一根 (盘中刷新)
+                    日期更新           -> 最后一根并入状态，再计算新 K 线
+    每次 O(1)，结果与 kdj_arrays 对同一段 K 线的计算逐位一致 (未取整)
+    """
+
+    def __init__(self, n=9, m1=3, m2=3):
+        self.n = n
+        self.m1 = m1
+        self.m2 = m2
+        self.count = 0          # 已并入状态的 K 线数
+        self.k = None           # 已并入的最后一根的 K / D
+        self.d = None
+        self.highs = deque()    # [(序号, 最高价)]，价格单调递减
+        self.lows = deque()     # [(序号, 最低价)]，价格单调递增
+        self.last = None        # 最后一根 {date, high, low, close}
+        self.value = None       # 最后一根的 (K, D, J)
+
+    def _compute(self, bar):
+        high_n = max(self.highs[0][1], bar['high']) if self.highs else bar['high']
+        low_n = min(self.lows[0][1], bar['low']) if self.lows else bar['low']
+        num = bar['close'] - low_n
+        den = high_n - low_n
+        if den:
+            rsv = num / den * 100
+        else:
+            rsv = 50.0 if num == 0 else math.copysign(math.inf, num)
+        if self.k is None:
+            k = d = 50.0
+        else:
+            k = (self.m1 - 1) / self.m1 * self.k + 1 / self.m1 * rsv
+            d = (self.m2 - 1) / self.m2 * self.d + 1 / self.m2 * k
+        return k, d, 3 * k - 2 * d
+
+    def _commit(self):
+        index = self.count
+        high, low = self.last['high'], self.last['low']
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((index, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((index, low))
+        self.k, self.d = self.value[0], self.value[1]
+        self.count += 1
+        # 下一根 K 线的 n 周期窗口只需要最近 n-1 根已收盘 K 线
+        oldest = self.count + 1 - self.n
+        while self.highs and self.highs[0][0] < oldest:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] < oldest:
+            self.lows.popleft()
+
+    def update(self, bar):
+        """
+        bar: {date, high, low, close} (如 futures_data.js 的 data 记录)
+        返回最后一根 K 线的 (K, D, J)
+        """
+        bar = {key: bar[key] for key in ('date', 'high', 'low', 'close')}
+        if self.last is not None:
+            if bar['date'] < self.last['date']:
+                raise ValueError(f"K 线日期倒退: {bar['date']} < {self.last['date']}")
+            if bar['date'] != self.last['date']:
+                self._commit()
+        self.last = bar
+        self.value = self._compute(bar)
+        return self.value
+
+    @classmethod
+    def from_bars(cls, records, n=9, m1=3, m2=3):
+        """从 K 线记录列表 (按日期升序) 逐根构建"""
+        state = cls(n, m1, m2)
+        for record in records:
+            state.update(record)
+        return state
+
+    def to_dict(self):
+        return {
+            'n': self.n, 'm1': self.m1, 'm2': self.m2,
+            'count': self.count, 'K': self.k, 'D': self.d,
+            'highs': [list(item) for item in self.highs],
+            'lows': [list(item) for item in self.lows],
+            'last': self.last,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['n'], data['m1'], data['m2'])
+        state.count = data['count']
+        state.k = data['K']
+        state.d = data['D']
+        state.highs = deque(tuple(item) for item in data['highs'])
+        state.lows = deque(tuple(item) for item in data['lows'])
+        state.last = data['last']
+        if state.last is not None:
+            state.value = state._compute(state.last)
+        return state
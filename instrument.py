@@ -0,0 +1,273 @@
+"""
+运行计时与接口延迟统计
+    stage 耗时:   with span('fetch'): ...   (同名 span 累加次数 / 总耗时 / 最长一次；多线程下为累计时间)
+    接口延迟:     patch_akshare() 把 akshare 的函数原地包一层，按函数名统计延迟直方图、失败和空结果
+    计数器:       count('retries')
+
+运行开始调用 start_run(脚本名)，结束时 finish_run() 写出 <脚本>.run.json (本次) 并追加一行到 run_history.ndjson (逐次对比)
+
+环境变量 FETCH_PROFILE=cprofile / tracemalloc (可用逗号同时开启):
+    cprofile     主线程 cProfile，结果存 <脚本>.prof，summary 中附累计耗时前 20 的函数
+    tracemalloc  内存分配峰值和占用最多的 10 处代码
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_ENV = "FETCH_PROFILE"
+HISTORY_FILE = "run_history.ndjson"
+# 延迟直方图的桶上界 (秒)，最后一个桶收集更慢的请求
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_SAMPLES = 20000            # 每个接口保留的延迟样本数 (计算分位数)
+
+
+def _is_empty(result):
+    if result is None:
+        return True
+    empty = getattr(result, 'empty', None)
+    return empty if isinstance(empty, bool) else False
+
+
+class EndpointStats:
+    __slots__ = ('calls', 'errors', 'empty', 'total', 'max', 'buckets', 'samples')
+
+    def __init__(self):
+        self.calls = self.errors = self.empty = 0
+        self.total = self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples = []
+
+    def add(self, seconds, error=False, empty=False):
+        self.calls += 1
+        self.errors += error
+        self.empty += empty
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        i = 0
+        while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        histogram = {f"<={b}s": n for b, n in zip(LATENCY_BUCKETS, self.buckets)}
+        histogram[f">{LATENCY_BUCKETS[-1]}s"] = self.buckets[-1]
+
+        def quantile(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4) if ordered else None
+        return {
+            'calls': self.calls, 'errors': self.errors, 'empty': self.empty,
+            'total': round(self.total, 3), 'mean': round(self.total / self.calls, 4) if self.calls else None,
+            'p50': quantile(0.5), 'p95': quantile(0.95), 'max': round(self.max, 4),
+            'histogram': histogram,
+        }
+
+
+class Run:
+    """一次脚本运行的全部统计 (线程安全)"""
+
+    def __init__(self, name="run"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.stages = {}        # 名称 -> [次数, 总耗时, 最长]
+        self.endpoints = {}     # 函数名 -> EndpointStats
+        self.counters = {}
+        self.profile_modes = set()
+        self._profiler = None
+
+    def add_stage(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_call(self, endpoint, seconds, error=False, empty=False):
+        with self.lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).add(seconds, error, empty)
+
+    def drain_stages(self):
+        """取出并清空 stage 统计 (子进程把自己的计时带回主进程，见 merge_stages / worker_init)"""
+        with self.lock:
+            stages, self.stages = self.stages, {}
+        return stages
+
+    def merge_stages(self, stages):
+        with self.lock:
+            for stage, (calls, total, longest) in stages.items():
+                entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+
+    def summary(self, extra=None):
+        elapsed = time.perf_counter() - self.clock
+        with self.lock:
+            return {
+                'script': self.name,
+                'started': datetime.fromtimestamp(self.started).strftime('%Y-%m-%d %H:%M:%S'),
+                'elapsed': round(elapsed, 3),
+                'stages': {stage: {'calls': c, 'total': round(t, 3), 'max': round(m, 4)}
+                           for stage, (c, t, m) in self.stages.items()},
+                'endpoints': {name: stats.summary() for name, stats in sorted(self.endpoints.items())},
+                'counters': dict(self.counters),
+                **(extra or {}),
+            }
+
+
+RUN = Run()
+
+
+def span(stage):
+    return RUN.span(stage)
+
+
+def count(name, n=1):
+    RUN.count(name, n)
+
+
+def timed(endpoint, func):
+    """包装 func，调用时按 endpoint 记录延迟 / 失败 / 空结果"""
+    if getattr(func, '__instrumented__', False):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            RUN.record_call(endpoint, time.perf_counter() - start, error=True)
+            raise
+        RUN.record_call(endpoint, time.perf_counter() - start, empty=_is_empty(result))
+        return result
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def patch_akshare(module=None):
+    """把 akshare (或替身) 模块的公开函数原地替换为计时版本，各脚本 ak.xxx(...) 的调用都会被统计"""
+    if module is None:
+        try:
+            import akshare as module
+        except ImportError:
+            # 只读本地文件的分析脚本不需要 akshare
+            return None
+    for name in dir(module):
+        func = getattr(module, name)
+        if not name.startswith('_') and isinstance(func, types.FunctionType):
+            setattr(module, name, timed(name, func))
+    return module
+
+
+def worker_init():
+    """进程池 initializer: 子进程 (fork) 清掉从主进程复制来的统计，之后只记录自己的 stage 耗时"""
+    RUN.reset()
+
+
+def start_run(name, profile=None):
+    """
+    开始一次运行: 清空统计、给 akshare 打计时补丁，按 profile (默认读环境变量) 开启 cProfile / tracemalloc
+    """
+    RUN.name = name
+    RUN.reset()
+    patch_akshare()
+    modes = profile if profile is not None else os.environ.get(PROFILE_ENV, "")
+    RUN.profile_modes = {m.strip().lower() for m in modes.split(',') if m.strip()}
+    if 'tracemalloc' in RUN.profile_modes:
+        import tracemalloc
+        tracemalloc.start(10)
+    if 'cprofile' in RUN.profile_modes:
+        import cProfile
+        RUN._profiler = cProfile.Profile()
+        RUN._profiler.enable()
+    return RUN
+
+
+def _profile_results(out_dir):
+    results = {}
+    if RUN._profiler is not None:
+        import pstats
+        RUN._profiler.disable()
+        path = os.path.join(out_dir, f"{RUN.name}.prof")
+        RUN._profiler.dump_stats(path)
+        stats = pstats.Stats(RUN._profiler)
+        top = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:20]
+        results['cprofile'] = {
+            'file': path,
+            'top_cumulative': [{'function': f"{os.path.basename(file)}:{line}({func})", 'calls': nc,
+                                'tottime': round(tt, 4), 'cumtime': round(ct, 4)}
+                               for (file, line, func), (_, nc, tt, ct, _) in top],
+        }
+        RUN._profiler = None
+    if 'tracemalloc' in RUN.profile_modes:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+            tracemalloc.stop()
+            results['tracemalloc'] = {
+                'current_mb': round(current / 2 ** 20, 2), 'peak_mb': round(peak / 2 ** 20, 2),
+                'top': [{'line': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1),
+                         'count': stat.count} for stat in top],
+            }
+    return results
+
+
+def finish_run(out_dir=".", extra=None, quiet=False):
+    """写出 <脚本>.run.json 并追加到 run_history.ndjson，返回 summary"""
+    profile = _profile_results(out_dir)
+    summary = RUN.summary(dict(extra or {}, **({'profile': profile} if profile else {})))
+    os.makedirs(out_dir or '.', exist_ok=True)
+    path = os.path.join(out_dir, f"{RUN.name}.run.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    history = dict(summary)
+    history.pop('profile', None)
+    with open(os.path.join(out_dir, HISTORY_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(history, ensure_ascii=False, separators=(',', ':')) + '\n')
+    if not quiet:
+        print(report(summary))
+        print(f"Run summary: {path}")
+    return summary
+
+
+def report(summary):
+    """summary -> 几行可读的文本"""
+    lines = [f"[{summary['script']}] {summary['elapsed']:.1f}s"]
+    for stage, s in summary['stages'].items():
+        lines.append(f"  stage {stage:<10s} {s['total']:8.2f}s  x{s['calls']}")
+    for name, s in summary['endpoints'].items():
+        lines.append(f"  {name:<32s} {s['calls']:5d} calls  p50 {s['p50']}s  p95 {s['p95']}s  "
+                     f"errors {s['errors']}  empty {s['empty']}")
+    if summary['counters']:
+        lines.append("  counters " + ", ".join(f"{k}={v}" for k, v in sorted(summary['counters'].items())))
+    return "\n".join(lines)
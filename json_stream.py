@@ -0,0 +1,157 @@
+"""
+JSON 记录流式读写
+结果逐条写出，不在内存里攒整个列表；默认紧凑格式 (无缩进)
+    .json    紧凑 JSON 数组 (stocks_quarterly.html 直接 fetch().json())
+    .ndjson  每行一条记录
+写入先落到临时文件，关闭时整体替换，读者不会读到写了一半的文件
+
+stock_quarterly_all.json / stock_quarterly_pending.json 由 QuarterlyOutput 在同一次遍历中同时写出
+iter_records 读到 bar_codec 编码过的 K 线 (bars) 时还原成 data 列表
+"""
+
+import json
+import os
+
+from bar_codec import unpack
+
+ALL_FILE = "stock_quarterly_all.json"
+PENDING_FILE = "stock_quarterly_pending.json"
+READ_CHUNK = 1 << 20
+
+
+def is_pending(record):
+    status = record.get('status')
+    return bool(status) and 'pending' in status
+
+
+class JsonArrayWriter:
+    """
+    逐条写入 JSON 数组 (或 NDJSON)
+    with JsonArrayWriter(path) as w:
+        w.write(record)
+    """
+
+    def __init__(self, path, indent=None, ndjson=None):
+        self.path = path
+        self.indent = indent
+        self.ndjson = path.endswith('.ndjson') if ndjson is None else ndjson
+        self.count = 0
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp, 'w', encoding='utf-8')
+        if not self.ndjson:
+            self._file.write('[')
+
+    def write(self, record):
+        if self.ndjson:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            self._file.write('\n')
+        else:
+            if self.count:
+                self._file.write(',')
+            if self.indent is None:
+                self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            else:
+                text = json.dumps(record, ensure_ascii=False, indent=self.indent)
+                pad = ' ' * self.indent
+                self._file.write('\n' + pad + text.replace('\n', '\n' + pad))
+        self.count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        if not self.ndjson:
+            self._file.write('\n]' if self.indent is not None and self.count else ']')
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """放弃写入，保留原文件"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class QuarterlyOutput:
+    """同一条记录流同时写出全量文件和 Pending 子集"""
+
+    def __init__(self, all_path=ALL_FILE, pending_path=PENDING_FILE, indent=None):
+        self.all = JsonArrayWriter(all_path, indent) if all_path else None
+        self.pending = JsonArrayWriter(pending_path, indent) if pending_path else None
+
+    def write(self, record):
+        if self.all is not None:
+            self.all.write(record)
+        if self.pending is not None and is_pending(record):
+            self.pending.write(record)
+
+    @property
+    def counts(self):
+        return (self.all.count if self.all else 0, self.pending.count if self.pending else 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for writer in (self.all, self.pending):
+            if writer is not None:
+                writer.__exit__(exc_type, exc, tb)
+
+
+def iter_records(path):
+    """
+    逐条读取 JSON 数组 (紧凑或带缩进均可) 或 NDJSON，按块解码，不一次读入整个文件
+    编码过的 K 线 (bar_codec.pack) 还原为 data 列表
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(READ_CHUNK)
+        pos = 0
+        eof = False
+        in_array = None
+        while True:
+            # 跳过空白、逗号和数组括号
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) and in_array is None:
+                    in_array = buf[pos] == '['
+                    if in_array:
+                        pos += 1
+                        continue
+                break
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf, pos = f.read(READ_CHUNK), 0
+                eof = not buf
+                continue
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # 记录跨块，补读后重试
+                more = f.read(READ_CHUNK)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            if end == len(buf) and not eof:
+                # 数字等可能被截断在块尾，补读确认
+                more = f.read(READ_CHUNK)
+                if more:
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+                eof = True
+            yield unpack(record)
+            pos = end
@@ -0,0 +1,121 @@
+"""
+KDJ 参数扫描 (规则研究用)
+对一组 (n, m1, m2) 参数一次算出所有合约的 KDJ (indicators.kdj_grid，形状 参数组 × 合约 × K线)，
+每组参数用重算的 K/D 重新触发规则并回测，结果并排对比:
+    最新信号    最后一根 K 线上 fetch_futures.check_rules 规则2 (s2) 各状态的数量 (股票为 stock_pending)
+    历史回测    回测规则集 (默认期货 pending_kdj，股票 stock_pending) 的信号数、入场、止盈 / 止损、命中率、期望 R
+
+所有参数组的 K/D 都由数据文件中的 K 线重新计算 (保留两位小数)，默认参数 9,3,3 一行标 *，
+因为数据文件只保存最近一段 K 线，它与抓取脚本写入的 K/D 在序列开头几根会有差异
+
+用法:
+    python kdj_sweep.py                                         # 期货周线，n=5..14 × m1=2..4 × m2=2..4
+    python kdj_sweep.py --n 9 14 21 --m1 3 --m2 3 --horizon 8
+    python kdj_sweep.py --stocks                                # A股季线 (日线缓存合成)
+"""
+
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+
+from backtest import LOSS, OPEN, WIN, backtest_panel, futures_items, rolling_panel, stock_items
+from indicators import kdj_grid
+from rule_engine import RULE_SETS, BarPanel, PANEL_FIELDS
+
+DEFAULT_PARAMS = (9, 3, 3)
+
+
+def parameter_grid(n_values, m1_values, m2_values):
+    """笛卡尔积 [(n, m1, m2), ...]，去重并保持顺序"""
+    return list(dict.fromkeys(itertools.product(n_values, m1_values, m2_values)))
+
+
+def sweep(items, params, rule_set, latest_rules, horizon=12, entry_bars=1):
+    """
+    items: [((品种, 合约), BarSeries), ...]
+    rule_set: 回测用的规则集 (须定义 breakout / stop)；latest_rules: 统计最新信号的规则集
+    返回 [{params, latest: {状态: 数量}, signals, entered, wins, losses, open, hit_rate, expectancy}, ...]
+    """
+    window = max(rule_set.window, latest_rules.window)
+    panel, full, series_idx, bar_idx = rolling_panel(items, window)
+    k, d, _ = (np.round(x, 2) for x in kdj_grid(full.high, full.low, full.close, params))
+    latest = BarPanel(full.keys, full.length,
+                      **{name: getattr(full, name)[:, -latest_rules.window:] for name in PANEL_FIELDS})
+
+    results = []
+    for p, param in enumerate(params):
+        status = latest_rules.status(latest, K=k[p, :, -1], D=d[p, :, -1])
+        trades = backtest_panel(panel, full, series_idx, bar_idx, rule_set, horizon, entry_bars,
+                                K=k[p, series_idx, bar_idx], D=d[p, series_idx, bar_idx])
+        outcome = trades['outcome']
+        closed = trades['entered'] & (outcome != OPEN)
+        wins = int((outcome == WIN).sum())
+        losses = int((outcome == LOSS).sum())
+        results.append({
+            'params': param,
+            'latest': {name: int((status == name).sum()) for name in latest_rules.statuses},
+            'signals': len(trades['row']),
+            'entered': int(trades['entered'].sum()),
+            'wins': wins,
+            'losses': losses,
+            'open': int(trades['entered'].sum()) - wins - losses,
+            'hit_rate': wins / closed.sum() if closed.any() else float('nan'),
+            'expectancy': float(np.mean(trades['r'][closed])) if closed.any() else float('nan'),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KDJ 参数扫描: 各组 (n, m1, m2) 的信号数与回测结果对比")
+    parser.add_argument('--n', type=int, nargs='+', default=list(range(5, 15)), help="RSV 周期")
+    parser.add_argument('--m1', type=int, nargs='+', default=[2, 3, 4], help="K 平滑周期")
+    parser.add_argument('--m2', type=int, nargs='+', default=[2, 3, 4], help="D 平滑周期")
+    parser.add_argument('--rules', default=None, help="回测规则集 (默认期货 pending_kdj，股票 stock_pending)")
+    parser.add_argument('--data', default="futures_data.js")
+    parser.add_argument('--stocks', action='store_true', help="A 股季线 (日线缓存合成)")
+    parser.add_argument('--bar-cache', default="bar_cache/daily")
+    parser.add_argument('--main-only', action='store_true')
+    parser.add_argument('--horizon', type=int, default=12, help="入场后最多持有的 K 线数")
+    parser.add_argument('--entry-bars', type=int, default=1, help="信号后多少根 K 线内等待突破")
+    parser.add_argument('--sort', choices=['params', 'signals', 'hit_rate', 'expectancy'], default='params')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.stocks:
+        items, _ = stock_items(args.bar_cache)
+        rule_name, latest_name = args.rules or 'stock_pending', 'stock_pending'
+    else:
+        items, _ = futures_items(args.data, args.main_only)
+        rule_name, latest_name = args.rules or 'pending_kdj', 's2'
+    if not items:
+        print("没有可扫描的 K 线数据")
+        return 1
+    params = parameter_grid(args.n, args.m1, args.m2)
+    loaded = time.perf_counter()
+
+    results = sweep(items, params, RULE_SETS[rule_name], RULE_SETS[latest_name], args.horizon, args.entry_bars)
+    done = time.perf_counter()
+
+    if args.sort != 'params':
+        # NaN (没有平仓交易) 排在最后
+        results.sort(key=lambda r: (np.isnan(r[args.sort]), -np.nan_to_num(r[args.sort])))
+    statuses = RULE_SETS[latest_name].statuses
+    print(f"回测规则集: {rule_name}  最新信号: {latest_name}  序列: {len(items)}  参数组: {len(params)}")
+    print(f"{'n,m1,m2':<10}" + "".join(f"{s:>15}" for s in statuses)
+          + f"{'信号':>6}{'入场':>6}{'止盈':>6}{'止损':>6}{'持仓':>6}{'命中率':>9}{'期望R':>8}")
+    for r in results:
+        label = ",".join(map(str, r['params'])) + (" *" if r['params'] == DEFAULT_PARAMS else "")
+        closed = r['wins'] + r['losses']
+        hit = f"{r['hit_rate']:.1%}" if closed else "-"
+        exp = f"{r['expectancy']:+.3f}" if closed else "-"
+        print(f"{label:<10}" + "".join(f"{r['latest'][s]:>15}" for s in statuses)
+              + f"{r['signals']:>6}{r['entered']:>6}{r['wins']:>6}{r['losses']:>6}{r['open']:>6}{hit:>9}{exp:>8}")
+    print(f"读取 {(loaded - start) * 1000:.1f} ms，扫描 {(done - loaded) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+期货 60 分钟 K 线缓存 + 交易日聚合
+新浪分钟接口 (ak.futures_zh_minute_sina) 没有日期参数，每次只返回最近一段；
+本地每个合约一个 .npy，新拉到的 K 线只追加 (重叠部分以新数据为准)，历史随运行逐渐变长
+
+夜盘归属下一个交易日 (周五夜盘 / 周六凌晨归属下周一)，分钟线先按交易日聚合成日线，
+再用 resample 聚合成周线；节假日前没有夜盘，不单独处理
+
+    fetch_fix.py  日线接口取不到数据时的兜底；日线落后时用分钟线补齐最近几天
+"""
+
+import argparse
+import os
+import time
+from datetime import date
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_DTYPE, BarStore, bars_to_frame
+from resample import resample_bars
+
+MINUTE_DTYPE = np.dtype([
+    ('datetime', 'datetime64[m]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'i8'),
+    ('hold', 'f8'),
+])
+
+MINUTE_ROOT = "bar_cache/minute60"
+MINUTE_TTL = 10 * 60           # 秒；缓存文件在此时间内更新过就不联网
+NIGHT_START = 18               # 此时 (含) 之后为夜盘，归属下一个交易日
+NIGHT_END = 3                  # 此时之前为夜盘后半段 (凌晨)
+
+
+class MinuteStore(BarStore):
+    """按合约存放的 60 分钟 K 线缓存目录"""
+
+    DTYPE = MINUTE_DTYPE
+    KEY = 'datetime'
+
+    def __init__(self, root=MINUTE_ROOT):
+        super().__init__(root)
+
+    def age(self, symbol):
+        """缓存文件距上次写入的秒数，不存在为 inf"""
+        try:
+            return time.time() - os.path.getmtime(self.path(symbol))
+        except OSError:
+            return float('inf')
+
+
+def frame_to_minutes(df):
+    """futures_zh_minute_sina 的 DataFrame (datetime/open/high/low/close/volume/hold) -> 结构化数组"""
+    bars = np.empty(len(df), dtype=MINUTE_DTYPE)
+    bars['datetime'] = pd.to_datetime(df['datetime']).to_numpy().astype('datetime64[m]')
+    for col in ('open', 'high', 'low', 'close'):
+        bars[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+    bars['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).to_numpy().astype('i8')
+    bars['hold'] = (pd.to_numeric(df['hold'], errors='coerce').to_numpy(dtype=float)
+                    if 'hold' in df.columns else np.nan)
+    return bars[np.argsort(bars['datetime'], kind='stable')]
+
+
+def update_minutes(store, symbol, fetch, max_age=MINUTE_TTL):
+    """
+    合并新拉取的分钟线并写回缓存，返回全部缓存的分钟线 (结构化数组，可能为空)
+    fetch(symbol) -> DataFrame 或 None；缓存在 max_age 秒内更新过则直接返回缓存
+    """
+    cached = store.load(symbol, mmap=False)
+    if cached is not None and store.age(symbol) <= max_age:
+        return cached
+    df = fetch(symbol)
+    if df is None or df.empty:
+        return cached if cached is not None else np.empty(0, dtype=MINUTE_DTYPE)
+    return store.append(symbol, frame_to_minutes(df), cached)
+
+
+def trading_days(stamps):
+    """
+    datetime64[m] 数组 -> 所属交易日 datetime64[D]
+    日盘为当天；NIGHT_START 之后为下一个工作日；NIGHT_END 之前为当天起的第一个工作日 (周六凌晨 -> 周一)
+    """
+    stamps = np.asarray(stamps, dtype='datetime64[m]')
+    days = stamps.astype('datetime64[D]')
+    hours = (stamps - days).astype(np.int64) // 60
+    night = hours >= NIGHT_START
+    early = hours < NIGHT_END
+    result = days.copy()
+    result[night] = np.busday_offset(days[night], 1, roll='forward')
+    result[early] = np.busday_offset(days[early], 0, roll='forward')
+    return result
+
+
+def minutes_to_daily(minutes):
+    """分钟线 -> 按交易日聚合的日线 (BAR_DTYPE)，要求按时间排序"""
+    n = len(minutes)
+    daily = np.empty(0, dtype=BAR_DTYPE)
+    if not n:
+        return daily
+    days = trading_days(minutes['datetime'])
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    daily = np.empty(len(starts), dtype=BAR_DTYPE)
+    daily['date'] = days[starts]
+    daily['open'] = minutes['open'][starts]
+    daily['high'] = np.fmax.reduceat(minutes['high'], starts)
+    daily['low'] = np.fmin.reduceat(minutes['low'], starts)
+    daily['close'] = minutes['close'][ends]
+    daily['volume'] = np.add.reduceat(minutes['volume'], starts)
+    return daily
+
+
+class SessionAggregator:
+    """
+    流式聚合: 分钟线分批送入，已结束的交易日固定下来，最后一个交易日 (可能未收盘) 单独存放
+        agg.push(chunk)      追加一批按时间排序的分钟线，返回本批新完成的日线
+        agg.daily()          已完成 + 当前交易日的全部日线
+    """
+
+    def __init__(self):
+        self.completed = np.empty(0, dtype=BAR_DTYPE)
+        self.current = np.empty(0, dtype=MINUTE_DTYPE)   # 当前交易日的分钟线
+        self.last = None
+
+    def push(self, chunk):
+        if not len(chunk):
+            return np.empty(0, dtype=BAR_DTYPE)
+        if self.last is not None and chunk['datetime'][0] <= self.last:
+            raise ValueError(f"分钟线 {chunk['datetime'][0]} 不晚于已处理的 {self.last}")
+        self.last = chunk['datetime'][-1]
+        minutes = np.concatenate([self.current, chunk])
+        days = trading_days(minutes['datetime'])
+        open_day = minutes['datetime'][days == days[-1]]
+        cut = len(minutes) - len(open_day)
+        self.current = minutes[cut:]
+        done = minutes_to_daily(minutes[:cut])
+        self.completed = np.concatenate([self.completed, done])
+        return done
+
+    def daily(self):
+        return np.concatenate([self.completed, minutes_to_daily(self.current)])
+
+
+def last_trading_day(today=None):
+    """today (含) 之前最近的工作日"""
+    return np.busday_offset(np.datetime64(today or date.today(), 'D'), 0, roll='backward')
+
+
+def extend_daily(df, minutes, today=None):
+    """
+    日线 DataFrame 落后于最近交易日时，用分钟线聚合出的日线补上之后的交易日
+    返回 (DataFrame, 补上的天数)
+    """
+    daily = minutes_to_daily(minutes)
+    if not len(daily):
+        return df, 0
+    last = np.datetime64(pd.to_datetime(df['date']).max().date(), 'D') if len(df) else None
+    newer = daily if last is None else daily[daily['date'] > last]
+    newer = newer[newer['date'] <= last_trading_day(today)]
+    if not len(newer):
+        return df, 0
+    extra = bars_to_frame(newer)
+    extra['date'] = extra['date'].dt.strftime('%Y-%m-%d')
+    base = df[['date', 'open', 'high', 'low', 'close', 'volume']].copy()
+    base['date'] = pd.to_datetime(base['date']).dt.strftime('%Y-%m-%d')
+    return pd.concat([base, extra], ignore_index=True), len(newer)
+
+
+def daily_lags(df, today=None):
+    """日线最后一天早于最近交易日"""
+    if df is None or df.empty:
+        return True
+    last = pd.to_datetime(df['date']).max().date()
+    return np.datetime64(last, 'D') < last_trading_day(today)
+
+
+def fetch_minutes(symbol):
+    return ak.futures_zh_minute_sina(symbol=symbol, period='60')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="更新合约的 60 分钟 K 线缓存并显示聚合后的日线 / 周线")
+    parser.add_argument('symbols', nargs='+', help="新浪合约代码，如 RB2605")
+    args = parser.parse_args()
+
+    store = MinuteStore()
+    for symbol in args.symbols:
+        start = time.perf_counter()
+        minutes = update_minutes(store, symbol, fetch_minutes, max_age=0)
+        daily = minutes_to_daily(minutes)
+        weekly = resample_bars(daily, 'W')
+        span = f"{minutes['datetime'][0]} ~ {minutes['datetime'][-1]}" if len(minutes) else "-"
+        print(f"{symbol}: {len(minutes)} 根分钟线 ({span}) -> {len(daily)} 个交易日, {len(weekly)} 周, "
+              f"{time.perf_counter() - start:.2f}s")
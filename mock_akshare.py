@@ -0,0 +1,274 @@
+"""
+离线 AKShare 替身
+返回与真实接口同结构、按代码固定种子生成的行情数据，并模拟网络延迟和偶发失败
+用于在无网络环境下对抓取流程做基准测试:
+
+    import fetch_futures, mock_akshare
+    fetch_futures.ak = mock_akshare
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# 模拟参数 (可用 configure 修改)
+LATENCY = (0.2, 0.6)        # 每次请求的延迟区间 (秒)，接近新浪接口实测
+FAILURE_RATE = 0.0          # 请求抛出异常的概率
+END_DATE = "2026-02-13"     # 日线数据的最后一天，固定后输出可复现
+DAILY_BARS = 250
+CONTRACT_MONTHS = ["2603", "2605", "2607", "2609", "2701"]
+
+# 品种代码 -> 交易所 (futures_list.json 中的品种)
+EXCHANGES = {code: exchange for exchange, codes in {
+    'SHFE': "RB HC WR SS FU BU RU SP BR",
+    'INE': "SC LU NR EC",
+    'DCE': "I J JM L V PP EB EG PG M Y P A B C CS JD LH RR BB FB",
+    'CZCE': "SF SM MA TA PF PX PR SH SA FG UR OI RM RS PK SR CF CY AP CJ WH PM RI LR JR ZC",
+    'GFEX': "LC SI",
+}.items() for code in codes.split()}
+
+_lock = threading.Lock()
+_rng = random.Random(0)
+_name_to_code = None
+call_counts = {}
+
+
+def configure(latency=None, failure_rate=None, end_date=None, seed=None):
+    global LATENCY, FAILURE_RATE, END_DATE, _rng
+    if latency is not None:
+        LATENCY = latency
+    if failure_rate is not None:
+        FAILURE_RATE = failure_rate
+    if end_date is not None:
+        END_DATE = end_date
+    if seed is not None:
+        _rng = random.Random(seed)
+    call_counts.clear()
+
+
+def _seed(key):
+    return zlib.crc32(key.encode('utf-8'))
+
+
+def _simulate(endpoint):
+    with _lock:
+        call_counts[endpoint] = call_counts.get(endpoint, 0) + 1
+        delay = _rng.uniform(*LATENCY) if LATENCY else 0
+        fail = _rng.random() < FAILURE_RATE
+    if delay:
+        time.sleep(delay)
+    if fail:
+        raise ConnectionError(f"mock {endpoint}: simulated network failure")
+
+
+def _product_code(name):
+    global _name_to_code
+    if _name_to_code is None:
+        mapping = {}
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "futures_list.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for item in json.load(f):
+                    mapping[item["name"]] = item["code"]
+        _name_to_code = mapping
+    return _name_to_code.get(name)
+
+
+def _holds(code):
+    """各月份合约的持仓量，实时行情和交易所日行情使用同一组数"""
+    rng = np.random.default_rng(_seed(f"hold:{code}"))
+    return rng.integers(1_000, 500_000, size=len(CONTRACT_MONTHS))
+
+
+def futures_zh_realtime(symbol):
+    """某品种全部合约的实时行情 (含连续合约 xx0)"""
+    _simulate('futures_zh_realtime')
+    code = _product_code(symbol)
+    if code is None:
+        return pd.DataFrame()
+    rng = np.random.default_rng(_seed(symbol))
+    symbols = [f"{code}0"] + [f"{code}{m}" for m in CONTRACT_MONTHS]
+    holds = _holds(code)
+    hold = np.r_[holds.max(), holds]
+    trade = np.round(rng.uniform(1_000, 8_000), 0)
+    open_ = np.round(trade * (1 + rng.normal(0, 0.005)), 0)
+    return pd.DataFrame({
+        'symbol': symbols,
+        'name': [symbol] * len(symbols),
+        'trade': [trade] * len(symbols),
+        'open': [open_] * len(symbols),
+        'high': [max(trade, open_) * 1.005] * len(symbols),
+        'low': [min(trade, open_) * 0.995] * len(symbols),
+        'hold': hold,
+    })
+
+
+def get_futures_daily(start_date, end_date, market):
+    """某交易所全部合约的日行情 (郑商所合约代码为 3 位年月，如 SR605)；周末返回空表"""
+    _simulate('get_futures_daily')
+    day = pd.Timestamp(end_date)
+    if day.weekday() >= 5:
+        return pd.DataFrame()
+    rows = []
+    for code, exchange in EXCHANGES.items():
+        if exchange != market:
+            continue
+        for month, hold in zip(CONTRACT_MONTHS, _holds(code)):
+            symbol = f"{code}{month[1:]}" if market == 'CZCE' else f"{code.lower()}{month}"
+            rows.append({'symbol': symbol, 'date': day.strftime('%Y%m%d'), 'open_interest': hold,
+                         'variety': code})
+    return pd.DataFrame(rows)
+
+
+def futures_zh_daily_sina(symbol):
+    """单个合约的日线行情"""
+    _simulate('futures_zh_daily_sina')
+    rng = np.random.default_rng(_seed(symbol))
+    dates = pd.bdate_range(end=END_DATE, periods=DAILY_BARS)
+    start = rng.uniform(1_000, 8_000)
+    close = np.round(start * np.exp(np.cumsum(rng.normal(0, 0.012, len(dates)))), 0)
+    open_ = np.round(np.r_[start, close[:-1]] * (1 + rng.normal(0, 0.003, len(dates))), 0)
+    spread = np.abs(rng.normal(0, 0.01, len(dates))) * close
+    high = np.round(np.maximum(open_, close) + spread, 0)
+    low = np.round(np.minimum(open_, close) - spread, 0)
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.integers(10_000, 2_000_000, len(dates)),
+        'hold': rng.integers(10_000, 500_000, len(dates)),
+        'settle': close,
+    })
+
+
+_boards = None
+
+
+def _industry_boards():
+    """由 sector_map.json 生成板块成分，部分股票额外归入第二个板块 (多对多)"""
+    global _boards
+    if _boards is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sector_map.json")
+        boards = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for code, board in json.load(f).items():
+                    boards.setdefault(board, []).append(code)
+        names = list(boards)
+        for i, name in enumerate(names):
+            extra = names[(i + 1) % len(names)]
+            boards[extra] = boards[extra] + boards[name][:3]
+        _boards = boards
+    return _boards
+
+
+def stock_board_industry_name_em():
+    """行业板块列表"""
+    _simulate('stock_board_industry_name_em')
+    names = list(_industry_boards())
+    return pd.DataFrame({'排名': range(1, len(names) + 1), '板块名称': names,
+                         '板块代码': [f"BK{i:04d}" for i in range(len(names))]})
+
+
+def stock_board_industry_cons_em(symbol):
+    """某行业板块的成分股"""
+    _simulate('stock_board_industry_cons_em')
+    codes = _industry_boards().get(symbol)
+    if codes is None:
+        raise ValueError(f"mock: unknown board {symbol}")
+    return pd.DataFrame({'代码': codes, '名称': codes})
+
+
+def stock_zh_a_spot_em():
+    """A 股实时行情 (代码来自 sector_map.json，另加北交所 / 科创板 / ST 样本)"""
+    _simulate('stock_zh_a_spot_em')
+    codes = sorted({c for cs in _industry_boards().values() for c in cs} | {'830001', '688001', '430001'})
+    rng = np.random.default_rng(_seed('spot'))
+    n = len(codes)
+    pe = np.round(rng.normal(30, 40, n), 2).astype(object)
+    pe[rng.random(n) < 0.02] = '-'
+    return pd.DataFrame({
+        '序号': range(1, n + 1),
+        '代码': codes,
+        '名称': [f"{'*ST' if i % 97 == 0 else ''}股票{c}" for i, c in enumerate(codes)],
+        '最新价': np.round(rng.uniform(2, 200, n), 2),
+        '市盈率-动态': pe,
+        '总市值': np.round(rng.uniform(1e9, 1e12, n), 0),
+        '成交额': np.round(rng.uniform(1e6, 1e10, n), 0),
+    })
+
+
+def stock_zh_a_hist(symbol, period="daily", start_date=None, end_date=None, adjust=""):
+    """A 股日线 (前复权)，约 2% 的代码无数据 (新股 / 长期停牌)"""
+    _simulate('stock_zh_a_hist')
+    seed = _seed('hist' + symbol)
+    if seed % 50 == 0:
+        return pd.DataFrame()
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=END_DATE, periods=int(rng.integers(200, 1300)))
+    start = rng.uniform(3, 120)
+    close = np.round(start * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))), 2)
+    open_ = np.round(np.r_[start, close[:-1]] * (1 + rng.normal(0, 0.005, len(dates))), 2)
+    spread = np.abs(rng.normal(0, 0.012, len(dates))) * close
+    df = pd.DataFrame({
+        '日期': dates.strftime('%Y-%m-%d'),
+        '股票代码': symbol,
+        '开盘': open_,
+        '收盘': close,
+        '最高': np.round(np.maximum(open_, close) + spread, 2),
+        '最低': np.round(np.minimum(open_, close) - spread, 2),
+        '成交量': rng.integers(1_000, 5_000_000, len(dates)),
+    })
+    if start_date:
+        df = df[df['日期'] >= pd.Timestamp(start_date).strftime('%Y-%m-%d')]
+    if end_date:
+        df = df[df['日期'] <= pd.Timestamp(end_date).strftime('%Y-%m-%d')]
+    return df.reset_index(drop=True)
+
+
+def stock_yjbb_em(date):
+    """业绩报表 (约 10% 亏损)"""
+    _simulate('stock_yjbb_em')
+    codes = stock_zh_a_spot_em()['代码']
+    rng = np.random.default_rng(_seed('yjbb' + date))
+    return pd.DataFrame({'股票代码': codes, '股票简称': codes,
+                         '净利润-净利润': np.round(rng.normal(5e8, 4e8, len(codes)), 0)})
+
+
+MINUTE_BARS = 1020          # 分钟接口每次只返回最近这么多根
+MINUTE_TIMES = ("22:00", "23:00", "10:00", "11:15", "14:15", "15:00")   # 前两根为前一晚夜盘
+
+
+def futures_zh_minute_sina(symbol, period='1'):
+    """单个合约的 60 分钟 K 线 (含夜盘)，与 futures_zh_daily_sina 同一价格走势"""
+    _simulate('futures_zh_minute_sina')
+    days = pd.bdate_range(end=END_DATE, periods=DAILY_BARS)
+    rng = np.random.default_rng(_seed('minute' + symbol))
+    stamps = []
+    for day in days:
+        night = (day - pd.offsets.BDay(1)).strftime('%Y-%m-%d')
+        stamps += [f"{night} {MINUTE_TIMES[0]}:00", f"{night} {MINUTE_TIMES[1]}:00"]
+        stamps += [f"{day.strftime('%Y-%m-%d')} {t}:00" for t in MINUTE_TIMES[2:]]
+    n = len(stamps)
+    start = rng.uniform(1_000, 8_000)
+    close = np.round(start * np.exp(np.cumsum(rng.normal(0, 0.005, n))), 0)
+    open_ = np.round(np.r_[start, close[:-1]] * (1 + rng.normal(0, 0.001, n)), 0)
+    spread = np.abs(rng.normal(0, 0.004, n)) * close
+    df = pd.DataFrame({
+        'datetime': stamps,
+        'open': open_,
+        'high': np.round(np.maximum(open_, close) + spread, 0),
+        'low': np.round(np.minimum(open_, close) - spread, 0),
+        'close': close,
+        'volume': rng.integers(1_000, 200_000, n),
+        'hold': rng.integers(10_000, 500_000, n),
+    })
+    return df.tail(MINUTE_BARS).reset_index(drop=True)
@@ -1,5 +1,4 @@
-import json
-import re
+from futures_store import FuturesStore
 
 def patch_pending_futures():
     """
@@ -8,24 +7,12 @@ def patch_pending_futures():
     file_path = "futures_data.js"
     
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        # Only the patched products' shards are rewritten, see futures_store
+        store = FuturesStore(file_path)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
     
-    # Extract FUTURES_DATA object
-    match = re.search(r'const FUTURES_DATA = ({.*?});', content, re.DOTALL)
-    if not match:
-        print("ERROR: Could not find FUTURES_DATA")
-        return
-    
-    try:
-        data = json.loads(match.group(1))
-    except Exception as e:
-        print(f"ERROR parsing JSON: {e}")
-        return
-    
     # 花生 PK2605 - Complete Data with pending_long
     pk_data = {
         "name": "花生",
@@ -88,32 +75,23 @@ def patch_pending_futures():
     }
     
     # 玉米 C2605 - Pending data
-    c_match = re.search(r'"C"\s*:\s*{[^}]*"main"\s*:\s*{[^}]*"latestKDJ"\s*:\s*({[^}]+})', content, re.DOTALL)
-    if c_match:
+    c_data = store.get("C")
+    if c_data and c_data.get("main") and c_data["main"].get("latestKDJ") is not None:
         # Just add custom_rule_2 to existing C data
-        try:
-            c_kdj = json.loads(c_match.group(1))
-            # Update C's latestKDJ with pending_long
-            c_pattern = r'("C"\s*:\s*{[^}]*"main"\s*:\s*{[^}]*"latestKDJ"\s*:\s*{[^}]*)"pattern":\s*"[^"]*"'
-            replacement = r'\1"pattern": "多头排列",\n        "custom_rule_2": "pending_long"'
-            content = re.sub(c_pattern, replacement, content, flags=re.DOTALL)
-            print("✓ Patched C (玉米) with pending_long")
-        except:
-            pass
+        c_data["main"]["latestKDJ"]["pattern"] = "多头排列"
+        c_data["main"]["latestKDJ"]["custom_rule_2"] = "pending_long"
+        store.save("C", c_data)
+        print("✓ Patched C (玉米) with pending_long")
     
     # 菜油 OI2605 - Add pending if needed (currently has normal data)
     # We'll leave OI as-is since it has valid data
     
     # Replace PK data completely
-    data["PK"] = pk_data
+    store.save("PK", pk_data)
     
     # Write back
-    new_data_str = json.dumps(data, ensure_ascii=False, indent=2)
-    new_content = content[:match.start(1)] + new_data_str + content[match.end(1):]
-    
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
+        store.build_bundle()
         print(f"✓ Successfully patched {file_path}")
         print("✓ PK (花生) now has complete Pending data")
         print("✓ PK should now appear at the top with RED BORDER")
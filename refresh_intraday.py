@@ -0,0 +1,176 @@
+"""
+盘中刷新 futures_data.js
+只拉取各品种的实时行情，合并进当周 (未收盘) 周线，用合约保存的 kdjState 在 O(1) 内
+重算最后一根的 K/D/J 并重新评分 (规则1 / 规则2)，不重新下载日线、不从头重算 KDJ
+
+没有 kdjState 的旧数据会先从 data 逐根构建一次
+
+只有两种情况会改动合约:
+    行情在最后一根 K 线的同一周          更新这根 K 线
+    行情在下一周，且当天是该周第一个交易日  追加一根新周线 (开 / 高 / 低只有这一天的行情才完整)
+其余情况 (中间缺了整周、本周首日之后才第一次刷新、行情日期早于最后一根) 跳过该合约并报告，
+由 fetch_futures.py 全量重建
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from fetch_futures import (MAX_WORKERS, SCHEDULER, ak, analyze_kdj_pattern, load_futures_list,
+                           save_to_js)
+from futures_loader import load_futures_data
+from indicators import KDJState
+from resample import period_label
+from rule_engine import classify_latest
+
+# 与 fetch_futures 保持一致: 最多保留 13 根周线
+KEEP_BARS = 13
+
+
+def week_label(day):
+    """pandas resample('W') 的周标签: 当周周日"""
+    return period_label(day, 'W')
+
+
+def first_trading_day(day):
+    """是否为当周第一个交易日 (周一；没有节假日日历，周一休市的那一周需要全量重建)"""
+    monday = np.datetime64(week_label(day), 'D') - 6
+    return np.datetime64(day, 'D') == np.busday_offset(monday, 0, roll='forward')
+
+
+def bar_action(last_date, day):
+    """
+    最后一根 K 线日期 + 行情日期 -> ('update' | 'append', None) 或 (None, 跳过原因)
+    """
+    week = week_label(day)
+    if last_date == week:
+        return 'update', None
+    if week < last_date:
+        return None, f"行情日期 {day} 早于最后一根 K 线 {last_date}"
+    next_week = week_label(date.fromisoformat(last_date) + timedelta(days=7))
+    if week != next_week:
+        return None, f"缺少 {next_week} 那一周的 K 线"
+    if not first_trading_day(day):
+        return None, f"{day} 不是本周第一个交易日，新周线的开 / 高 / 低不完整"
+    return 'append', None
+
+
+def fetch_quotes(name):
+    """某品种全部合约的实时行情 -> {合约: {open, high, low, trade}}"""
+    try:
+        df = SCHEDULER.call(ak.futures_zh_realtime, symbol=name)
+    except Exception:
+        return {}
+    if df is None or df.empty:
+        return {}
+    quotes = {}
+    for row in df.to_dict('records'):
+        quote = {key: row.get(key) for key in ('open', 'high', 'low', 'trade')}
+        if all(isinstance(v, (int, float)) and v == v and v > 0 for v in quote.values()):
+            quotes[row['symbol']] = {key: float(v) for key, v in quote.items()}
+    return quotes
+
+
+def apply_quote(contract, quote, day, keep=KEEP_BARS):
+    """
+    用 day 当天的实时行情更新合约的当周 K 线 (同一周内多次刷新取最高 / 最低)，并更新 latestKDJ 和 kdjState
+    返回 (新的 latestKDJ, None)；不能安全更新时不改动合约，返回 (None, 跳过原因)
+    """
+    records = contract['data']
+    last = records[-1]
+    action, reason = bar_action(last['date'], day)
+    if action is None:
+        return None, reason
+
+    if contract.get('kdjState'):
+        state = KDJState.from_dict(contract['kdjState'])
+    else:
+        state = KDJState.from_bars(records)
+
+    week = week_label(day)
+    if action == 'update':
+        bar = dict(last, high=max(last['high'], quote['high']), low=min(last['low'], quote['low']),
+                   close=quote['trade'])
+        records[-1] = bar
+    else:
+        bar = {'date': week, 'open': quote['open'], 'high': quote['high'], 'low': quote['low'],
+               'close': quote['trade'], 'volume': 0}
+        records.append(bar)
+        del records[:-keep]
+
+    k, d, j = (float(np.round(v, 2)) for v in state.update(bar))
+    bar['K'], bar['D'], bar['J'] = k, d, j
+
+    latest_kdj = {'K': k, 'D': d, 'J': j, 'pattern': analyze_kdj_pattern(k, d, j)}
+    if len(records) >= 3:
+        p1, p2 = classify_latest([r['high'] for r in records[-3:]], [r['low'] for r in records[-3:]],
+                                 [r['close'] for r in records[-3:]], k, d)
+    else:
+        p1, p2 = None, None
+    latest_kdj['custom_rule_1'] = p1
+    latest_kdj['custom_rule_2'] = p2
+
+    contract['latestKDJ'] = latest_kdj
+    contract['kdjState'] = state.to_dict()
+    contract['lastUpdate'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return latest_kdj, None
+
+
+def refresh(data, day=None, max_workers=MAX_WORKERS):
+    """
+    刷新 data (load_futures_data 的结果) 中所有主力 / 次主力合约
+    返回 (更新的合约数, 跳过的 [(代码, 合约, 原因)], 行情耗时, 评分耗时)
+    """
+    day = day or date.today()
+    query_names = {item['code']: item['name'] for item in (load_futures_list() or [])}
+
+    start = time.perf_counter()
+    codes = list(data)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        quotes = dict(zip(codes, pool.map(
+            lambda code: fetch_quotes(query_names.get(code, data[code].get('name', code))), codes)))
+    fetched = time.perf_counter()
+
+    updated = 0
+    skipped = []
+    for code, info in data.items():
+        for key in ('main', 'sub'):
+            contract = info.get(key)
+            if not contract or not contract.get('data'):
+                continue
+            quote = quotes[code].get(contract['symbol'])
+            if quote is None:
+                continue
+            latest, reason = apply_quote(contract, quote, day)
+            if latest is None:
+                skipped.append((code, contract['symbol'], reason))
+            else:
+                updated += 1
+    return updated, skipped, fetched - start, time.perf_counter() - fetched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用实时行情刷新当周 K 线并重新评分")
+    parser.add_argument('--file', default="futures_data.js")
+    parser.add_argument('--date', default=None, help="行情日期 YYYY-MM-DD (默认今天)")
+    args = parser.parse_args()
+
+    try:
+        day = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+    except ValueError:
+        parser.error(f"--date 应为 YYYY-MM-DD: {args.date}")
+    data = load_futures_data(args.file)
+    updated, skipped, t_quotes, t_score = refresh(data, day)
+    save_to_js(data, args.file)
+    print(f"更新 {updated} 个合约: 行情 {t_quotes:.2f}s，重算 KDJ + 评分 {t_score * 1000:.1f} ms")
+    if skipped:
+        print(f"跳过 {len(skipped)} 个合约，请运行 fetch_futures.py 全量重建:")
+        for code, symbol, reason in skipped:
+            print(f"  {code} {symbol}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
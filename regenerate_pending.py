@@ -1,26 +1,25 @@
-import json
+import os
+
+from instrument import span
+from json_stream import ALL_FILE, PENDING_FILE, QuarterlyOutput, iter_records
 
 def regenerate_pending():
-    print("Loading enriched all data...")
-    try:
-        with open("stock_quarterly_all.json", "r", encoding="utf-8") as f:
-            all_data = json.load(f)
-    except FileNotFoundError:
-        print("stock_quarterly_all.json not found.")
+    print("Streaming enriched all data...")
+    if not os.path.exists(ALL_FILE):
+        print(f"{ALL_FILE} not found.")
         return
 
-    print(f"Total records: {len(all_data)}")
-    
-    # Filter pending
-    pending_data = [item for item in all_data if item.get('status') and 'pending' in item['status']]
-    
-    print(f"Found {len(pending_data)} pending stocks.")
-    
-    # Save pending
-    with open("stock_quarterly_pending.json", "w", encoding="utf-8") as f:
-        json.dump(pending_data, f, ensure_ascii=False, indent=2)
-        
-    print("stock_quarterly_pending.json regenerated with enriched data.")
+    # Only the pending view is rewritten; records are filtered as they are read
+    # (load, filter and write happen in the same pass, timed as one stage)
+    with span('stream'), QuarterlyOutput(all_path=None) as output:
+        total = 0
+        for item in iter_records(ALL_FILE):
+            total += 1
+            output.write(item)
+
+    print(f"Total records: {total}")
+    print(f"Found {output.counts[1]} pending stocks.")
+    print(f"{PENDING_FILE} regenerated with enriched data.")
 
 if __name__ == "__main__":
     regenerate_pending()
@@ -0,0 +1,207 @@
+"""
+日线 -> 周线 / 月线 / 季线
+按周期标签找出分组边界，用 reduceat 一次算出每组的 OHLCV，结果与原来的
+df.resample('W' / 'QE').agg({open: first, high: max, low: min, close: last, volume: sum}).dropna() 完全一致:
+    标签为周期最后一天 (周日 / 月末 / 季末)，没有交易日的周期不输出，NaN 按 pandas 规则跳过
+
+resample_many 把多只股票 / 多个合约拼成一个长数组，一次 reduceat 完成，再按代码拆回
+append_day 收到新的一天时只修改最后一根 (未收盘的) K 线，或在新周期开始时追加一根
+"""
+
+import numpy as np
+import pandas as pd
+
+from bar_series import BarSeries
+
+FREQS = ('W', 'M', 'Q')
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def period_labels(dates, freq):
+    """datetime64[D] 数组 -> 所属周期的标签日期 (W: 当周周日, M: 月末, Q: 季末)"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if freq == 'W':
+        days = dates.astype(np.int64)
+        # 1970-01-01 是周四
+        return (days + (3 - days) % 7).astype('datetime64[D]')
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    if freq == 'M':
+        end = months + 1
+    elif freq == 'Q':
+        end = (months // 3 + 1) * 3
+    else:
+        raise ValueError(f"未知周期: {freq} (可选 {', '.join(FREQS)})")
+    return end.astype('datetime64[M]').astype('datetime64[D]') - 1
+
+
+def period_label(day, freq):
+    """单个日期的周期标签 'YYYY-MM-DD'"""
+    return str(period_labels([np.datetime64(day, 'D')], freq)[0])
+
+
+def _has_nan(values):
+    return values.dtype.kind == 'f' and np.isnan(values).any()
+
+
+def _first(values, starts, n):
+    if not _has_nan(values):
+        return values[starts]
+    pos = np.minimum.reduceat(np.where(np.isnan(values), n, np.arange(n)), starts)
+    out = values[np.minimum(pos, n - 1)]
+    out[pos == n] = np.nan
+    return out
+
+
+def _last(values, starts, n):
+    if not _has_nan(values):
+        return values[np.r_[starts[1:], n] - 1]
+    pos = np.maximum.reduceat(np.where(np.isnan(values), -1, np.arange(n)), starts)
+    out = values[pos]
+    out[pos < 0] = np.nan
+    return out
+
+
+def _reduce(labels, columns, owner=None):
+    """
+    按 labels (以及 owner，即所属序列) 连续相同的位置分组并聚合
+    返回 (组标签, {字段: 数组}, 组所属序列)，已去掉含 NaN 的组
+    """
+    n = len(labels)
+    change = labels[1:] != labels[:-1]
+    if owner is not None:
+        change |= owner[1:] != owner[:-1]
+    starts = np.flatnonzero(np.r_[True, change]) if n else np.zeros(0, dtype=np.intp)
+    if not n:
+        return labels, {name: columns[name][:0] for name in FIELDS}, owner
+
+    volume = columns['volume']
+    if _has_nan(volume):
+        volume = np.nan_to_num(volume, nan=0.0)
+    high, low = columns['high'], columns['low']
+    result = {
+        'open': _first(columns['open'], starts, n),
+        'high': (np.fmax if high.dtype.kind == 'f' else np.maximum).reduceat(high, starts),
+        'low': (np.fmin if low.dtype.kind == 'f' else np.minimum).reduceat(low, starts),
+        'close': _last(columns['close'], starts, n),
+        'volume': np.add.reduceat(volume, starts),
+    }
+    keep = np.ones(len(starts), dtype=bool)
+    for values in result.values():
+        if values.dtype.kind == 'f':
+            keep &= ~np.isnan(values)
+    if not keep.all():
+        result = {name: values[keep] for name, values in result.items()}
+    group_owner = owner[starts][keep] if owner is not None else None
+    return labels[starts][keep], result, group_owner
+
+
+def _columns(bars):
+    """BarStore 结构化数组或 BarSeries -> (日期, {字段: 数组})"""
+    if getattr(bars, 'dtype', None) is not None and bars.dtype.names:
+        get = bars.__getitem__
+    else:
+        def get(name):
+            return getattr(bars, name)
+    return (np.asarray(get('date'), dtype='datetime64[D]'),
+            {name: np.asarray(get(name)) for name in FIELDS})
+
+
+def resample_bars(bars, freq='Q'):
+    """一条日线 (结构化数组或 BarSeries) -> 指定周期的 BarSeries"""
+    dates, columns = _columns(bars)
+    labels, result, _ = _reduce(period_labels(dates, freq), columns)
+    return BarSeries(labels, *(result[name] for name in FIELDS))
+
+
+def resample_many(bars_list, freq='Q'):
+    """多条日线一次聚合，返回与输入顺序对应的 BarSeries 列表"""
+    if not bars_list:
+        return []
+    parts = [_columns(bars) for bars in bars_list]
+    sizes = [len(dates) for dates, _ in parts]
+    dates = np.concatenate([d for d, _ in parts])
+    columns = {name: np.concatenate([c[name] for _, c in parts]) for name in FIELDS}
+    owner = np.repeat(np.arange(len(parts)), sizes)
+    labels, result, group_owner = _reduce(period_labels(dates, freq), columns, owner)
+
+    bounds = np.searchsorted(group_owner, np.arange(len(parts) + 1))
+    return [BarSeries(labels[a:b], *(result[name][a:b] for name in FIELDS))
+            for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def multi_timeframe(bars, freqs=FREQS):
+    """
+    一条日线同时生成多个周期 {周期: BarSeries}
+    季线由月线再聚合 (first / max / min / last / sum 可以逐级合并)，日线只分组一次
+    """
+    dates, columns = _columns(bars)
+    out = {}
+    if 'W' in freqs:
+        labels, result, _ = _reduce(period_labels(dates, 'W'), columns)
+        out['W'] = BarSeries(labels, *(result[name] for name in FIELDS))
+    if 'M' in freqs or 'Q' in freqs:
+        month_labels, months, _ = _reduce(period_labels(dates, 'M'), columns)
+        if 'M' in freqs:
+            out['M'] = BarSeries(month_labels, *(months[name] for name in FIELDS))
+        if 'Q' in freqs:
+            labels, result, _ = _reduce(period_labels(month_labels, 'Q'), months)
+            out['Q'] = BarSeries(labels, *(result[name] for name in FIELDS))
+    return {freq: out[freq] for freq in freqs}
+
+
+def _span(labels, freq):
+    """首尾标签之间 (含) 的周期数"""
+    if freq == 'W':
+        return int((labels[-1] - labels[0]).astype(np.int64)) // 7 + 1
+    months = labels[[0, -1]].astype('datetime64[M]').astype(np.int64)
+    return int(months[1] - months[0]) // (3 if freq == 'Q' else 1) + 1
+
+
+def resample_frame(df, freq):
+    """
+    日线 DataFrame -> 周期 DataFrame (date 为 'YYYY-MM-DD' 字符串，列 date/open/high/low/close/volume)
+    替代各脚本中的 daily_to_weekly / daily_to_quarterly；日期取 date 列、datetime 列或索引
+    """
+    for key in ('date', 'datetime'):
+        if key in df.columns:
+            dates = pd.to_datetime(df[key])
+            break
+    else:
+        dates = pd.to_datetime(df.index)
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    columns = {}
+    for name in FIELDS:
+        values = df[name]
+        if values.dtype == object:
+            values = pd.to_numeric(values, errors='coerce')
+        columns[name] = values.to_numpy()
+    labels, result, _ = _reduce(period_labels(dates, freq), columns)
+    if len(labels) and len(labels) < _span(labels, freq):
+        # pandas 先为空周期填 NaN 再 dropna，整数价格列因此变成 float
+        for name in ('open', 'high', 'low', 'close'):
+            if result[name].dtype.kind in 'iu':
+                result[name] = result[name].astype(float)
+    out = pd.DataFrame(result, columns=list(FIELDS))
+    out.insert(0, 'date', pd.Series(np.datetime_as_string(labels, unit='D'), dtype=str))
+    return out
+
+
+def append_day(series, freq, day, open, high, low, close, volume=0):
+    """
+    把新的一天并入周期 K 线:
+        与最后一根同一周期 -> 原地更新最后一根 (最高 / 最低 / 收盘 / 成交量)，返回同一个 series
+        新周期 -> 返回追加了一根的新 BarSeries
+    最后一根的 K / D / J 置为 NaN，由调用方重算
+    """
+    label = period_labels([np.datetime64(day, 'D')], freq)[0]
+    if len(series) and label < series.date[-1]:
+        raise ValueError(f"{day} 早于最后一根 K 线 {series.date[-1]}")
+    if len(series) and label == series.date[-1]:
+        series.high[-1] = max(series.high[-1], high)
+        series.low[-1] = min(series.low[-1], low)
+        series.close[-1] = close
+        series.volume[-1] = np.nan_to_num(series.volume[-1]) + volume
+        series.K[-1] = series.D[-1] = series.J[-1] = np.nan
+        return series
+    return BarSeries(*(np.append(getattr(series, name), value) for name, value in zip(
+        BarSeries.FIELDS, (label, open, high, low, close, volume, np.nan, np.nan, np.nan))))
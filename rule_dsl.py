@@ -0,0 +1,250 @@
+"""
+规则表达式语言
+规则写成与 pending_rules.md 相同的表达式，如:
+
+    w2.high > w1.high and w3.close > w1.low and w3.close <= w2.high and K > D
+
+编译一次生成 Python 闭包，在 rule_engine.BarPanel 上按整列 (所有品种) 求值
+
+语法:
+    w1.high ... wN.close    第 i 根 K 线的字段 (N 为规则集的 bars，wN 为最新一根)；前缀字母任意，如 q1/q2/q3
+    K  D  J  close ...      最新一根 K 线的字段 (K/D 可由调用方传入 latestKDJ 覆盖)
+    and  or  not  比较 (可链式)  + - * /  数字
+    min(a, b) max(a, b) abs(a)
+    lowest(low, 13, 4)      倒数第 13 根到倒数第 4 根 (含) 的最低值，highest 同理
+
+规则集配置见 rule_variants.json，新增变体只需加一条配置
+"""
+
+import ast
+import json
+import os
+import re
+
+import numpy as np
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume', 'K', 'D', 'J')
+BAR_REF = re.compile(r'^([a-z]+)(\d+)$')
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_variants.json")
+
+_BOOL_OPS = {ast.And: '&', ast.Or: '|'}
+_BIN_OPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}
+_CMP_OPS = {ast.Gt: '>', ast.GtE: '>=', ast.Lt: '<', ast.LtE: '<=', ast.Eq: '==', ast.NotEq: '!='}
+_FUNCS = {'min': 'np.fmin', 'max': 'np.fmax', 'abs': 'np.abs'}
+
+
+class RuleSyntaxError(ValueError):
+    pass
+
+
+class _Codegen:
+    """把表达式 AST 翻译成 NumPy 数组表达式源码，并记录需要预取的列"""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.columns = {}   # 变量名 -> 取列语句
+        self.depth = 1      # 需要的矩阵宽度
+
+    def _column(self, field, offset):
+        name = f"c_{field}_{offset}"
+        self.columns[name] = f"panel.{field}[:, -{offset}]"
+        self.depth = max(self.depth, offset)
+        return name
+
+    def _latest(self, field):
+        name = f"x_{field}"
+        self.columns[name] = f"overrides[{field!r}] if overrides.get({field!r}) is not None else panel.{field}[:, -1]"
+        return name
+
+    def _window(self, func, field, start, stop):
+        if field not in FIELDS:
+            raise RuleSyntaxError(f"{func}() 的第一个参数必须是字段名: {field}")
+        if not (start >= stop >= 1):
+            raise RuleSyntaxError(f"{func}({field}, {start}, {stop}) 需要 start >= stop >= 1")
+        reduce = 'np.fmin' if func == 'lowest' else 'np.fmax'
+        name = f"r_{func}_{field}_{start}_{stop}"
+        end = f"-{stop - 1}" if stop > 1 else "None"
+        self.columns[name] = f"{reduce}.reduce(panel.{field}[:, -{start}:{end}], axis=1)"
+        self.depth = max(self.depth, start)
+        return name
+
+    def visit(self, node):
+        if isinstance(node, ast.Expression):
+            return self.visit(node.body)
+        if isinstance(node, ast.BoolOp):
+            op = _BOOL_OPS[type(node.op)]
+            return '(' + f' {op} '.join(self.visit(v) for v in node.values) + ')'
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return f"(~{self.visit(node.operand)})"
+            if isinstance(node.op, ast.USub):
+                return f"(-{self.visit(node.operand)})"
+        if isinstance(node, ast.Compare):
+            parts = []
+            left = self.visit(node.left)
+            for op, comparator in zip(node.ops, node.comparators):
+                if type(op) not in _CMP_OPS:
+                    break
+                right = self.visit(comparator)
+                parts.append(f"({left} {_CMP_OPS[type(op)]} {right})")
+                left = right
+            else:
+                return '(' + ' & '.join(parts) + ')'
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            return f"({self.visit(node.left)} {_BIN_OPS[type(node.op)]} {self.visit(node.right)})"
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return repr(float(node.value))
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            match = BAR_REF.match(node.value.id)
+            if not match or node.attr not in FIELDS:
+                raise RuleSyntaxError(f"无法识别: {node.value.id}.{node.attr}")
+            index = int(match.group(2))
+            if not 1 <= index <= self.bars:
+                raise RuleSyntaxError(f"{node.value.id} 超出规则集的 {self.bars} 根 K 线")
+            return self._column(node.attr, self.bars - index + 1)
+        if isinstance(node, ast.Name):
+            if node.id in FIELDS:
+                return self._latest(node.id)
+            raise RuleSyntaxError(f"未知名称: {node.id}")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            func = node.func.id
+            if func in ('lowest', 'highest'):
+                if len(node.args) != 3 or not isinstance(node.args[0], ast.Name) \
+                        or not all(isinstance(a, ast.Constant) and isinstance(a.value, int) for a in node.args[1:]):
+                    raise RuleSyntaxError(f"{func}() 用法: {func}(字段, 起始偏移, 结束偏移)")
+                return self._window(func, node.args[0].id, node.args[1].value, node.args[2].value)
+            if func in _FUNCS:
+                args = [self.visit(a) for a in node.args]
+                if func == 'abs' and len(args) != 1 or func != 'abs' and len(args) != 2:
+                    raise RuleSyntaxError(f"{func}() 参数个数不对")
+                return f"{_FUNCS[func]}({', '.join(args)})"
+        raise RuleSyntaxError(f"不支持的语法: {ast.dump(node)}")
+
+
+def compile_expr(expr, bars):
+    """
+    编译单个表达式
+    返回 (func, depth)：func(panel, overrides) -> 数组，depth 为需要的矩阵宽度
+    """
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise RuleSyntaxError(f"表达式语法错误: {expr}") from e
+    gen = _Codegen(bars)
+    body = gen.visit(tree)
+    lines = ["def _rule(panel, overrides):"]
+    lines += [f"    {name} = {source}" for name, source in gen.columns.items()]
+    lines.append(f"    return {body}")
+    namespace = {'np': np}
+    exec(compile('\n'.join(lines), f"<rule: {expr}>", 'exec'), namespace)
+    return namespace['_rule'], gen.depth
+
+
+class RuleSet:
+    """
+    一组按顺序判断的规则 (对应 if/elif 链)，每条规则给出一个状态
+    exclusive=False 时各状态独立判断 (互不排斥)
+    """
+
+    def __init__(self, name, rules, bars=3, min_bars=None, exclusive=True, description=""):
+        self.name = name
+        self.bars = bars
+        self.min_bars = bars if min_bars is None else min_bars
+        self.exclusive = exclusive
+        self.description = description
+        self.rules = []
+        self.window = bars
+        for rule in rules:
+            when, depth = compile_expr(rule['when'], bars)
+            levels = {}
+            for level, expr in (rule.get('levels') or {}).items():
+                levels[level], level_depth = compile_expr(expr, bars)
+                depth = max(depth, level_depth)
+            self.window = max(self.window, depth)
+            self.rules.append((rule['status'], when, levels))
+
+    @property
+    def statuses(self):
+        return [status for status, _, _ in self.rules]
+
+    def masks(self, panel, **overrides):
+        """{状态: 布尔数组}；overrides 可给出 K=/D= 等最新值 (None 表示用矩阵最后一列)"""
+        enough = panel.length >= self.min_bars
+        taken = np.zeros(len(panel), dtype=bool)
+        result = {}
+        for status, when, _ in self.rules:
+            mask = enough & np.broadcast_to(when(panel, overrides), enough.shape)
+            if self.exclusive:
+                mask = mask & ~taken
+                taken = taken | mask
+            result[status] = mask
+        return result
+
+    def status(self, panel, **overrides):
+        """每行第一个成立的状态 (无为 None)"""
+        status = np.full(len(panel), None, dtype=object)
+        for name, mask in self.masks(panel, **overrides).items():
+            status[mask & (status == None)] = name  # noqa: E711
+        return status
+
+    def levels(self, panel, **overrides):
+        """
+        按每行状态计算对应规则的价位 (如 breakout / stop)
+        返回 (status, {价位名: float 数组})，无状态或规则未定义该价位的为 NaN
+        """
+        status = self.status(panel, **overrides)
+        values = {}
+        for name, _, levels in self.rules:
+            rows = status == name
+            for level, func in levels.items():
+                column = values.setdefault(level, np.full(len(panel), np.nan))
+                column[rows] = np.broadcast_to(func(panel, overrides), rows.shape)[rows]
+        return status, values
+
+
+def load_rule_sets(path=RULES_FILE):
+    """读取规则集配置并编译 -> {名称: RuleSet}"""
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return {
+        name: RuleSet(name, spec['rules'], bars=spec.get('bars', 3), min_bars=spec.get('min_bars'),
+                      exclusive=spec.get('exclusive', True), description=spec.get('description', ""))
+        for name, spec in config.items()
+    }
+
+
+def screen(products, rule_sets, main_only=False):
+    """
+    用同一个矩阵一次筛选多个规则集
+    返回 {规则集名称: {状态: 命中数}}
+    """
+    from rule_engine import BarPanel
+
+    window = max(rs.window for rs in rule_sets.values())
+    panel = BarPanel.from_products(products, window, main_only=main_only)
+    return {name: {status: int(mask.sum()) for status, mask in rs.masks(panel).items()}
+            for name, rs in rule_sets.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from futures_loader import load_futures_series
+
+    parser = argparse.ArgumentParser(description="用 rule_variants.json 中的所有规则集筛选 futures_data.js")
+    parser.add_argument('--rules', default=RULES_FILE)
+    parser.add_argument('--data', default="futures_data.js")
+    parser.add_argument('--main-only', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rule_sets = load_rule_sets(args.rules)
+    compiled = time.perf_counter()
+    counts = screen(load_futures_series(args.data), rule_sets, args.main_only)
+    done = time.perf_counter()
+
+    for name, hits in counts.items():
+        summary = ", ".join(f"{status}={count}" for status, count in hits.items())
+        print(f"{name:20s} {summary}")
+    print(f"\n{len(rule_sets)} 个规则集，编译 {(compiled - start) * 1000:.1f} ms，筛选 {(done - compiled) * 1000:.1f} ms")
@@ -0,0 +1,172 @@
+"""
+横截面规则引擎
+把所有品种最近 N 根 K 线右对齐堆成矩阵 (品种 × N)，每个形态用布尔数组表达式一次算完整个市场
+返回 (品种, 合约, 形态, 方向) 结果表
+
+形态由 rule_variants.json 中的规则集定义 (rule_dsl 编译)，与原脚本逐个品种判断的逻辑一致:
+    s1              fetch_futures.check_rules 规则1 (复苏/转弱)
+    s2              fetch_futures.check_rules 规则2 (突破 / Pending，带 KDJ 金叉死叉)
+    stock_pending   fetch_stocks_quarterly.check_rules (季线，只做多，矩阵只放已收盘的季度)
+    scan_pending    scan_pending.analyze_pending_patterns (不带 KDJ 的宽松 Pending/Active)
+    first_breakout  find_first_breakout.py 首次突破
+    trend           find_trend_patterns.py 趋势延续
+原来的逐个品种写法只保留在 bench_rule_engine.py 中，作为基准测试的对照
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from bar_series import BarSeries
+from rule_dsl import load_rule_sets
+
+Signal = namedtuple('Signal', ['instrument', 'contract', 'pattern', 'direction'])
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'K', 'D', 'J')
+
+
+class BarPanel:
+    """
+    右对齐的 K 线矩阵: 每行一个合约，最后一列为最新 K 线，不足 window 根的在前面补 NaN
+
+    keys: [(品种, 合约), ...]，与矩阵行一一对应
+    length: 每行实际 K 线数量
+    """
+
+    __slots__ = ('keys', 'length') + PANEL_FIELDS
+
+    def __init__(self, keys, length, **fields):
+        self.keys = list(keys)
+        self.length = np.asarray(length, dtype=np.int64)
+        for name in PANEL_FIELDS:
+            setattr(self, name, fields[name])
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def window(self):
+        return self.close.shape[1]
+
+    def col(self, field, offset):
+        """取倒数第 offset 根 K 线的一列 (offset=1 为最新)"""
+        return getattr(self, field)[:, -offset]
+
+    @classmethod
+    def from_series(cls, items, window):
+        """
+        items: [((品种, 合约), BarSeries), ...]
+        """
+        items = list(items)
+        rows = len(items)
+        fields = {name: np.full((rows, window), np.nan) for name in PANEL_FIELDS}
+        length = np.zeros(rows, dtype=np.int64)
+        for i, (_, bars) in enumerate(items):
+            n = min(len(bars), window)
+            length[i] = len(bars)
+            if n:
+                for name in PANEL_FIELDS:
+                    fields[name][i, window - n:] = getattr(bars, name)[-n:]
+        return cls([key for key, _ in items], length, **fields)
+
+    @classmethod
+    def from_products(cls, products, window, main_only=False):
+        """{代码: FuturesProduct} -> 主力/次主力合约矩阵，行顺序与 product_contracts() 一致"""
+        items = [((code, contract.symbol), contract.bars)
+                 for code, _, contract in product_contracts(products, main_only)]
+        return cls.from_series(items, window)
+
+    @classmethod
+    def from_records(cls, items, window, drop_last=False):
+        """
+        items: [((代码, 名称), [{date, open, high, ...}, ...]), ...] (如 stock_quarterly_all.json 的 data)
+        drop_last: 去掉最后一根 (未收盘) K 线
+        """
+        series = []
+        for key, records in items:
+            bars = BarSeries.from_records(records)
+            series.append((key, bars[:-1] if drop_last else bars))
+        return cls.from_series(series, window)
+
+    @classmethod
+    def from_arrays(cls, high, low, close, K=None, D=None, key=('', '')):
+        """单个合约 (一维数组) -> 1 行矩阵，供逐个合约调用的脚本使用"""
+        high = np.asarray(high, dtype=float)[np.newaxis, :]
+        fields = {
+            'open': np.full_like(high, np.nan),
+            'high': high,
+            'low': np.asarray(low, dtype=float)[np.newaxis, :],
+            'close': np.asarray(close, dtype=float)[np.newaxis, :],
+        }
+        for name, values in (('K', K), ('D', D), ('J', None)):
+            fields[name] = np.full_like(high, np.nan) if values is None else np.asarray(values, dtype=float)[np.newaxis, :]
+        return cls([key], [high.shape[1]], **fields)
+
+
+def product_contracts(products, main_only=False):
+    """[(代码, '主力'/'次主力', ContractSeries), ...]，按品种顺序，主力在前"""
+    rows = []
+    for code, product in products.items():
+        for contract_type, contract in product.contracts():
+            if main_only and contract_type != '主力':
+                continue
+            rows.append((code, contract_type, contract))
+    return rows
+
+
+RULE_SETS = load_rule_sets()
+
+
+def _pattern(name):
+    rule_set = RULE_SETS[name]
+
+    def pattern(panel, k=None, d=None):
+        """k, d: 外部给定的最新 K/D (如 latestKDJ)，默认取矩阵最后一列"""
+        return rule_set.masks(panel, K=k, D=d)
+
+    pattern.__name__ = f"rule_{name}"
+    return pattern
+
+
+PATTERNS = {name: _pattern(name)
+            for name in ('s1', 's2', 'stock_pending', 'scan_pending', 'first_breakout', 'trend')}
+
+# 每个形态需要的矩阵宽度
+PATTERN_WINDOW = {name: RULE_SETS[name].window for name in PATTERNS}
+
+
+def evaluate(panel, patterns=None):
+    """
+    对整个矩阵求值，返回 Signal 列表 (按行顺序，同一行内按形态、方向顺序)
+    """
+    names = list(patterns or PATTERNS)
+    hits = []
+    for order, name in enumerate(names):
+        for direction, mask in PATTERNS[name](panel).items():
+            for row in np.flatnonzero(mask):
+                hits.append((row, order, direction))
+    # 稳定排序，同一形态内保持方向顺序
+    hits.sort(key=lambda h: (h[0], h[1]))
+    return [Signal(panel.keys[row][0], panel.keys[row][1], names[order], direction)
+            for row, order, direction in hits]
+
+
+def pattern_status(panel, name, **kwargs):
+    """
+    形态 -> 每行的状态字符串数组 (无信号为 None，多个方向成立时取第一个)
+    kwargs 透传给形态函数，如 s1/s2 的 k=, d= (外部给定的最新 K/D)
+    """
+    status = np.full(len(panel), None, dtype=object)
+    for direction, mask in PATTERNS[name](panel, **kwargs).items():
+        status[mask & (status == None)] = direction  # noqa: E711
+    return status
+
+
+def classify_latest(high, low, close, k, d):
+    """
+    单个合约的规则1 / 规则2 状态 (fetch 脚本逐个合约调用)
+    k, d: 最新 K/D 值；返回 (s1, s2)，无信号为 None
+    """
+    panel = BarPanel.from_arrays(np.asarray(high)[-3:], np.asarray(low)[-3:], np.asarray(close)[-3:])
+    kd = {'k': np.atleast_1d(k), 'd': np.atleast_1d(d)}
+    return pattern_status(panel, 's1', **kd)[0], pattern_status(panel, 's2', **kd)[0]
@@ -1,6 +1,6 @@
 @echo off
 echo Starting Stock Quarterly Scan...
-echo This may take 5-10 minutes.
+echo This may take 5-10 minutes on the first run, later runs only fetch new days.
 python fetch_stocks_quarterly.py
 echo.
 echo Scan complete. Please refresh the web page.
@@ -0,0 +1,177 @@
+"""
+股票扫描检查点
+每只股票处理完立即追加到 scan_state/done.ndjson (结果随行保存，K 线用 bar_codec 编码)，失败追加到 failures.ndjson 台账
+同一扫描日重跑时跳过已完成的代码，只处理未完成 / 失败的
+
+失败分类:
+    empty    接口返回空数据
+    network  网络 / 连接 / 超时异常
+    io       本地文件读写出错 (K 线缓存缺失 / 无权限 / 磁盘满等，不重试)
+    parse    数据解析或计算出错 (不重试)
+"""
+
+import json
+import os
+import random
+import shutil
+import socket
+import time
+
+from bar_codec import STOCK_TICK, pack, unpack
+
+STATE_DIR = "scan_state"
+RETRYABLE = ('network', 'empty')
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 5.0          # 第 n 轮重试前等待 base * 2^(n-1) 秒 (带抖动)
+
+_NETWORK_ERRORS = (ConnectionError, TimeoutError, socket.timeout, socket.gaierror)
+_NETWORK_MODULES = ('requests', 'urllib3', 'urllib', 'http', 'ssl', 'aiohttp')
+
+
+def classify_error(exc):
+    """
+    异常 -> 'network' / 'io' / 'parse'
+    requests 等库的异常多继承自 OSError，须先按模块判断，剩下的 OSError 才是本地文件错误
+    """
+    if isinstance(exc, _NETWORK_ERRORS):
+        return 'network'
+    if (type(exc).__module__ or '').split('.')[0] in _NETWORK_MODULES:
+        return 'network'
+    if isinstance(exc, OSError):
+        return 'io'
+    return 'parse'
+
+
+def read_lines(path):
+    """逐行读取 NDJSON；进程被杀时最后一行可能写了一半，跳过无法解析的行"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def retry_delay(attempt, base=RETRY_BASE_DELAY):
+    return base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+class ScanCheckpoint:
+    """
+    run_key 标识一次扫描 (如扫描日期)，与已有检查点不同时清空重来
+    done.ndjson:     {"code", "status": "ok"/"skip", "result"}
+    failures.ndjson: {"code", "category", "error", "attempt", "time"}
+    """
+
+    def __init__(self, run_key, root=STATE_DIR):
+        self.root = root
+        self.run_key = run_key
+        self.done_path = os.path.join(root, "done.ndjson")
+        self.failures_path = os.path.join(root, "failures.ndjson")
+        self.meta_path = os.path.join(root, "meta.json")
+
+        if self._read_meta().get('run_key') != run_key and os.path.isdir(root):
+            shutil.rmtree(root)
+        os.makedirs(root, exist_ok=True)
+        self._write_meta({'run_key': run_key})
+
+        self.done = {line['code'] for line in read_lines(self.done_path)}
+        self.failures = {}      # 代码 -> 最近一次失败 {category, error, attempt}
+        for line in read_lines(self.failures_path):
+            if line['code'] not in self.done:
+                self.failures[line['code']] = line
+        self.resumed = len(self.done)
+
+        self._done_file = open(self.done_path, 'a', encoding='utf-8')
+        self._failures_file = open(self.failures_path, 'a', encoding='utf-8')
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @staticmethod
+    def _append(f, record):
+        f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        f.flush()
+
+    def pending(self, universe):
+        """[(代码, 名称), ...] 中尚未完成的"""
+        return [item for item in universe if item[0] not in self.done]
+
+    def record(self, code, status, result=None):
+        stored = pack(result, STOCK_TICK) if isinstance(result, dict) else result
+        self._append(self._done_file, {'code': code, 'status': status, 'result': stored})
+        self.done.add(code)
+        self.failures.pop(code, None)
+
+    def fail(self, code, category, error, attempt):
+        entry = {'code': code, 'category': category, 'error': error, 'attempt': attempt,
+                 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        self._append(self._failures_file, entry)
+        self.failures[code] = entry
+
+    def results(self):
+        """逐条读出已完成且有结果的记录"""
+        self._done_file.flush()
+        for line in read_lines(self.done_path):
+            if line.get('result'):
+                yield unpack(line['result'])
+
+    def save_summary(self, summary):
+        meta = self._read_meta()
+        meta['last_run'] = summary
+        self._write_meta(meta)
+
+    def close(self):
+        self._done_file.close()
+        self._failures_file.close()
+
+
+class ScanStats:
+    """本次运行的吞吐量和失败率"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.processed = 0      # 本次运行处理过的代码 (重试不重复计数)
+        self.attempts = 0
+        self.ok = 0
+        self.skipped = 0
+        self.codes = set()
+
+    def add(self, code, status):
+        self.attempts += 1
+        if code not in self.codes:
+            self.codes.add(code)
+            self.processed += 1
+        if status == 'ok':
+            self.ok += 1
+        elif status == 'skip':
+            self.skipped += 1
+
+    def summary(self, checkpoint):
+        elapsed = time.perf_counter() - self.start
+        failed = {}
+        for entry in checkpoint.failures.values():
+            if entry['code'] in self.codes:
+                failed[entry['category']] = failed.get(entry['category'], 0) + 1
+        total_failed = sum(failed.values())
+        return {
+            'processed': self.processed,
+            'attempts': self.attempts,
+            'ok': self.ok,
+            'skipped': self.skipped,
+            'failed': failed,
+            'failure_rate': total_failed / self.processed if self.processed else 0.0,
+            'elapsed': round(elapsed, 1),
+            'throughput': self.processed / elapsed if elapsed else 0.0,
+            'resumed': checkpoint.resumed,
+        }
@@ -0,0 +1,197 @@
+"""
+行业板块成分股索引
+并发抓取东方财富行业板块成分 (ak.stock_board_industry_cons_em)，每完成一批板块写一次检查点，
+中断后重跑只抓未完成 / 过期的板块
+
+sector_boards.json: {"order": [板块, ...], "boards": {板块: {"fetched": 时间戳, "codes": [代码, ...]}}}
+    股票 <-> 板块 多对多，两个方向都可查询 (SectorIndex.boards_of / stocks_of)
+sector_map.json:    兼容旧格式 {代码: 板块}，按板块顺序"后写覆盖"取一个主板块 (入库文件，只在抓取到新的板块成分后重写)
+
+用法: python sector_index.py [--max-age-days 7] [--full]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import akshare as ak
+
+from fetch_pool import FetchScheduler
+
+BOARD_FILE = "sector_boards.json"
+SECTOR_MAP_FILE = "sector_map.json"
+MAX_AGE = 7 * 24 * 3600        # 板块成分超过此时间 (秒) 视为过期
+CHECKPOINT_EVERY = 10           # 每完成多少个板块写一次检查点
+MAX_WORKERS = 16
+
+SCHEDULER = FetchScheduler(rate=30, burst=16, timeout=30, retries=2)
+
+
+class SectorIndex:
+    """股票 <-> 行业板块 多对多索引"""
+
+    def __init__(self, order=None, boards=None):
+        self.order = list(order or [])      # 板块列表顺序 (与接口返回一致)
+        self.boards = boards or {}          # {板块: {"fetched": 时间戳, "codes": [代码, ...]}}
+        self._by_stock = None
+
+    def __len__(self):
+        return len(self.boards)
+
+    def stocks_of(self, board):
+        """板块 -> 成分股代码列表"""
+        return list(self.boards.get(board, {}).get('codes', []))
+
+    def boards_of(self, code):
+        """股票 -> 所属板块列表 (按板块顺序)"""
+        if self._by_stock is None:
+            by_stock = {}
+            for board in self.ordered_boards():
+                for c in self.boards[board]['codes']:
+                    by_stock.setdefault(c, []).append(board)
+            self._by_stock = by_stock
+        return list(self._by_stock.get(str(code).zfill(6), []))
+
+    def ordered_boards(self):
+        listed = [b for b in self.order if b in self.boards]
+        return listed + sorted(set(self.boards) - set(listed))
+
+    def primary_map(self):
+        """{代码: 板块}，与旧 get_sector_map 相同的"后写覆盖"规则"""
+        sector_map = {}
+        for board in self.ordered_boards():
+            for code in self.boards[board]['codes']:
+                sector_map[code] = board
+        return sector_map
+
+    def stale(self, max_age=MAX_AGE, now=None):
+        """需要 (重新) 抓取的板块：order 中未抓过或已过期的"""
+        now = time.time() if now is None else now
+        return [b for b in self.order
+                if b not in self.boards or now - self.boards[b].get('fetched', 0) > max_age]
+
+    def set_board(self, board, codes, fetched=None):
+        self.boards[board] = {'fetched': time.time() if fetched is None else fetched,
+                              'codes': sorted({str(c).zfill(6) for c in codes})}
+        self._by_stock = None
+
+    def save(self, path=BOARD_FILE):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'order': self.order, 'boards': self.boards}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=BOARD_FILE):
+        """读取索引，文件不存在或损坏时返回空索引"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(data.get('order'), data.get('boards'))
+        except (OSError, ValueError):
+            return cls()
+
+
+def fetch_board_names(call=SCHEDULER.call):
+    boards = call(ak.stock_board_industry_name_em)
+    return [str(name) for name in boards['板块名称']]
+
+
+def fetch_board(board, call=SCHEDULER.call):
+    cons = call(ak.stock_board_industry_cons_em, symbol=board)
+    if cons is None or cons.empty:
+        return []
+    return [str(code).zfill(6) for code in cons['代码']]
+
+
+def crawl(path=BOARD_FILE, max_age=MAX_AGE, max_workers=MAX_WORKERS, full=False, log=print,
+          map_path=SECTOR_MAP_FILE):
+    """
+    抓取过期 / 缺失的板块并返回更新后的 SectorIndex
+    full: 忽略已有结果全部重抓
+    完成的板块每 CHECKPOINT_EVERY 个写一次文件，中断后重跑会跳过它们
+    有板块抓取成功或下架时重写 map_path (sector_map.json)
+    """
+    index = SectorIndex() if full else SectorIndex.load(path)
+    index.order = fetch_board_names()
+    # 已下架的板块不再保留
+    removed = set(index.boards) - set(index.order)
+    for board in removed:
+        del index.boards[board]
+    index._by_stock = None
+
+    todo = index.stale(0 if full else max_age)
+    log(f"行业板块 {len(index.order)} 个，需要抓取 {len(todo)} 个 (并发 {max_workers})")
+    if not todo:
+        index.save(path)
+        if removed:
+            write_sector_map(index, map_path)
+        return index
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tasks = {pool.submit(fetch_board, board): board for board in todo}
+        for done, task in enumerate(as_completed(tasks), 1):
+            board = tasks[task]
+            try:
+                index.set_board(board, task.result())
+            except Exception:
+                failed.append(board)
+            if done % CHECKPOINT_EVERY == 0:
+                index.save(path)
+            if done % 50 == 0:
+                log(f"  已完成 {done}/{len(todo)} 个板块")
+    index.save(path)
+    if removed or len(failed) < len(todo):
+        write_sector_map(index, map_path)
+    if failed:
+        log(f"  {len(failed)} 个板块抓取失败，下次运行会重试: {failed[:5]}{' ...' if len(failed) > 5 else ''}")
+    return index
+
+
+def write_sector_map(index, path=SECTOR_MAP_FILE):
+    """写入兼容旧格式的 sector_map.json (先写临时文件再替换，中断不会留下半个文件)"""
+    sector_map = index.primary_map()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(sector_map, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return sector_map
+
+
+def get_sector_map(path=BOARD_FILE, max_age=MAX_AGE):
+    """
+    {代码: 主板块} (兼容原 get_sector_map 的返回值)
+    只刷新过期的板块 (sector_map.json 由 crawl 在刷新后重写)；网络失败时使用已有索引，再退回旧的 sector_map.json
+    """
+    index = SectorIndex.load(path)
+    if not len(index) or index.stale(max_age):
+        try:
+            index = crawl(path, max_age)
+        except Exception as e:
+            print(f"Error fetching sectors: {e}")
+    if len(index):
+        sector_map = index.primary_map()
+        print(f"Loaded {len(sector_map)} stocks in {len(index)} sectors.")
+        return sector_map
+    try:
+        with open(SECTOR_MAP_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="抓取行业板块成分股索引")
+    parser.add_argument('--max-age-days', type=float, default=MAX_AGE / 86400)
+    parser.add_argument('--full', action='store_true', help="忽略检查点，全部重抓")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = crawl(max_age=args.max_age_days * 86400, full=args.full)
+    sector_map = index.primary_map()
+    multi = sum(1 for code in sector_map if len(index.boards_of(code)) > 1)
+    print(f"完成: {len(index)} 个板块，{len(sector_map)} 只股票 ({multi} 只属于多个板块)，"
+          f"耗时 {time.perf_counter() - start:.1f}s，调用统计 {SCHEDULER.stats}")
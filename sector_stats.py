@@ -0,0 +1,283 @@
+"""
+行业板块汇总
+对补充过 pe / market_cap / turnover / sector 的扫描结果 (stock_quarterly_all.json) 按板块分组:
+    stocks          成分股数 (参与扫描的)
+    pending         pending_long 数量及占比
+    long_share      宽度: K > D 的股票占比
+    pe_median       市盈率中位数 (只计 PE > 0)
+    pe_weighted     市值加权 PE = Σ市值 / Σ(市值 / PE) (整体法，只计 PE > 0)
+    market_cap / turnover   合计
+
+股票 <-> 板块 关系优先用 sector_boards.json (一只股票可属于多个板块)，没有时用记录中的 sector 字段
+所有股票 × 板块 展开为 (股票行号, 板块号) 两个数组，计数 / 求和用 bincount，中位数用 lexsort 后按段取中间值
+
+结果写入 sector_stats.json (列名 + 行数组)；每只股票上次的值保存在 sector_stats.state.npz，
+再次运行时只重算有股票变化的板块，其余板块沿用上次的结果
+
+用法:
+    python sector_stats.py                       # 增量更新 sector_stats.json 并打印
+    python sector_stats.py --min-cap 100         # 只看市值 100 亿以上的股票 (只打印，不写文件)
+    python sector_stats.py --sort pe_weighted --top 0
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from json_stream import ALL_FILE, PENDING_FILE, iter_records
+from sector_index import BOARD_FILE, SectorIndex
+
+STATS_FILE = "sector_stats.json"
+STATE_FILE = "sector_stats.state.npz"
+FIELDS = ('sector', 'stocks', 'pending', 'pending_share', 'long_share', 'pe_median', 'pe_weighted',
+          'pe_count', 'market_cap', 'turnover')
+# 逐只股票比较是否变化的列
+VALUE_COLUMNS = ('pe', 'market_cap', 'turnover', 'pending', 'long')
+
+
+class StockTable:
+    """逐只股票的列式数据: code 为字符串数组，其余为 float / bool 数组 (缺失为 NaN)"""
+
+    def __init__(self, code, pe, market_cap, turnover, pending, long, boards):
+        self.code = np.asarray(code, dtype=str)
+        self.pe = np.asarray(pe, dtype=float)
+        self.market_cap = np.asarray(market_cap, dtype=float)
+        self.turnover = np.asarray(turnover, dtype=float)
+        self.pending = np.asarray(pending, dtype=bool)
+        self.long = np.asarray(long, dtype=bool)
+        self.boards = np.asarray(boards, dtype=str)     # 所属板块，'|' 分隔
+
+    def __len__(self):
+        return len(self.code)
+
+    @classmethod
+    def from_records(cls, records, index=None):
+        """
+        扫描结果记录 -> StockTable
+        index: SectorIndex (多对多)，为 None 或股票不在索引中时用记录的 sector 字段
+        """
+        columns = {name: [] for name in ('code', 'pe', 'market_cap', 'turnover', 'pending', 'long', 'boards')}
+        for item in records:
+            code = str(item['code'])
+            kdj = item.get('kdj') or {}
+            boards = index.boards_of(code) if index is not None else []
+            if not boards and item.get('sector'):
+                boards = [item['sector']]
+            columns['code'].append(code)
+            for name in ('pe', 'market_cap', 'turnover'):
+                value = item.get(name)
+                columns[name].append(np.nan if value is None else value)
+            columns['pending'].append(item.get('status') == 'pending_long')
+            columns['long'].append(kdj.get('K') is not None and kdj.get('D') is not None and kdj['K'] > kdj['D'])
+            columns['boards'].append('|'.join(boards))
+        return cls(**columns)
+
+    def save(self, path=STATE_FILE):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **{name: getattr(self, name) for name in
+                         ('code', 'pe', 'market_cap', 'turnover', 'pending', 'long', 'boards')})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        try:
+            with np.load(path) as data:
+                return cls(**{name: data[name] for name in data.files})
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def memberships(table):
+    """展开 股票 × 板块 -> (板块名列表, 股票行号数组, 板块号数组)"""
+    names, lookup, stock_idx, group_idx = [], {}, [], []
+    for row, boards in enumerate(table.boards.tolist()):
+        if not boards:
+            continue
+        for board in boards.split('|'):
+            group = lookup.get(board)
+            if group is None:
+                group = lookup[board] = len(names)
+                names.append(board)
+            stock_idx.append(row)
+            group_idx.append(group)
+    return names, np.array(stock_idx, dtype=np.int64), np.array(group_idx, dtype=np.int64)
+
+
+def _group_median(values, group, count):
+    """按组求中位数 (values 中不含 NaN)，空组为 NaN"""
+    order = np.lexsort((values, group))
+    values = values[order]
+    sizes = np.bincount(group, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    median = np.full(count, np.nan)
+    has = sizes > 0
+    lo = starts[has] + (sizes[has] - 1) // 2
+    hi = starts[has] + sizes[has] // 2
+    median[has] = (values[lo] + values[hi]) / 2
+    return median
+
+
+def group_stats(table, names, stock_idx, group_idx, mask=None):
+    """
+    向量化分组汇总，返回 {板块: 行 (按 FIELDS 顺序)}
+    mask: 股票级布尔数组 (筛选条件)，None 为全部
+    """
+    if mask is not None:
+        keep = mask[stock_idx]
+        stock_idx, group_idx = stock_idx[keep], group_idx[keep]
+    count = len(names)
+
+    def total(weights=None, where=None):
+        g = group_idx if where is None else group_idx[where]
+        w = None if weights is None else (weights if where is None else weights[where])
+        return np.bincount(g, weights=w, minlength=count)
+
+    stocks = total()
+    pending = total(table.pending[stock_idx].astype(float))
+    long = total(table.long[stock_idx].astype(float))
+    pe = table.pe[stock_idx]
+    cap = table.market_cap[stock_idx]
+    valid_pe = np.isfinite(pe) & (pe > 0)
+    weighted = valid_pe & np.isfinite(cap) & (cap > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pending_share = pending / stocks
+        long_share = long / stocks
+        pe_weighted = total(cap, weighted) / total(np.where(weighted, cap / pe, 0))
+    pe_median = _group_median(pe[valid_pe], group_idx[valid_pe], count)
+    pe_count = total(where=valid_pe)
+    market_cap = total(np.nan_to_num(cap))
+    turnover = total(np.nan_to_num(table.turnover[stock_idx]))
+
+    def number(value, digits):
+        return None if not np.isfinite(value) else round(float(value), digits)
+
+    rows = {}
+    for g in np.flatnonzero(stocks):
+        rows[names[g]] = [names[g], int(stocks[g]), int(pending[g]), number(pending_share[g], 4),
+                          number(long_share[g], 4), number(pe_median[g], 2), number(pe_weighted[g], 2),
+                          int(pe_count[g]), number(market_cap[g], 0), number(turnover[g], 0)]
+    return rows
+
+
+def changed_boards(old, new):
+    """
+    上次和这次的 StockTable 对比 (按代码对齐)
+    返回 (需要重算的板块集合, 变化的股票数)；值或所属板块变化、新增、删除的股票都算变化
+    """
+    old_order = np.argsort(old.code)
+    pos = np.searchsorted(old.code[old_order], new.code)
+    pos = np.minimum(pos, max(len(old) - 1, 0))
+    matched = (old.code[old_order][pos] == new.code) if len(old) else np.zeros(len(new), dtype=bool)
+    old_rows = old_order[pos[matched]]
+    same = np.ones(int(matched.sum()), dtype=bool)
+    for name in VALUE_COLUMNS + ('boards',):
+        a, b = getattr(old, name)[old_rows], getattr(new, name)[matched]
+        equal = a == b
+        if a.dtype.kind == 'f':
+            equal |= np.isnan(a) & np.isnan(b)
+        same &= equal
+    touched = set(new.boards[~matched].tolist())
+    changed_rows = np.flatnonzero(matched)[~same]
+    touched.update(new.boards[changed_rows].tolist())
+    touched.update(old.boards[old_rows[~same]].tolist())
+    removed = np.ones(len(old), dtype=bool)
+    removed[old_rows] = False
+    touched.update(old.boards[removed].tolist())
+    changed = int((~matched).sum() + (~same).sum() + removed.sum())
+    return {board for boards in touched if boards for board in boards.split('|')}, changed
+
+
+def read_stats(path=STATS_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+        if stats.get('fields') == list(FIELDS):
+            return {row[0]: row for row in stats['rows']}
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def write_stats(rows, path=STATS_FILE, **meta):
+    stats = dict(meta, fields=list(FIELDS), rows=rows)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load_table(source=None, boards=BOARD_FILE):
+    """读取扫描结果 -> (StockTable, 文件名)；没有板块索引时用记录中的 sector 字段"""
+    source = source or (ALL_FILE if os.path.exists(ALL_FILE) else PENDING_FILE)
+    index = SectorIndex.load(boards)
+    return StockTable.from_records(iter_records(source), index if len(index) else None), source
+
+
+def update_stats(table, out=STATS_FILE, state=STATE_FILE, full=False):
+    """
+    增量更新 sector_stats.json: 只重算有股票变化的板块
+    返回 (按板块名的行字典, 重算的板块数, 变化的股票数)
+    """
+    names, stock_idx, group_idx = memberships(table)
+    previous = None if full else read_stats(out)
+    old = None if previous is None else StockTable.load(state)
+    if old is None:
+        rows = group_stats(table, names, stock_idx, group_idx)
+        recomputed, changed = len(rows), len(table)
+    else:
+        touched, changed = changed_boards(old, table)
+        wanted = np.array([name in touched for name in names], dtype=bool)
+        keep = wanted[group_idx] if len(group_idx) else np.zeros(0, dtype=bool)
+        fresh = group_stats(table, names, stock_idx[keep], group_idx[keep])
+        rows = {name: (fresh.get(name) if name in touched else previous.get(name)) for name in names}
+        rows = {name: row for name, row in rows.items() if row is not None}
+        recomputed = len(touched)
+    if previous is None or changed:
+        write_stats([rows[name] for name in names if name in rows], out,
+                    updated=time.strftime('%Y-%m-%d %H:%M:%S'), stocks=len(table))
+        table.save(state)
+    return rows, recomputed, changed
+
+
+def format_rows(rows, sort='pending_share', top=30, min_stocks=1):
+    key = FIELDS.index(sort)
+    rows = [row for row in rows if row[1] >= min_stocks]
+    rows.sort(key=lambda row: (row[key] is None, -(row[key] or 0) if key else row[key]))
+    lines = [f"{'板块':<10}{'股票':>6}{'pending':>9}{'占比':>8}{'宽度':>8}{'PE中位':>9}{'PE加权':>9}"
+             f"{'市值(亿)':>11}{'成交额(亿)':>11}"]
+    for row in rows[:top] if top else rows:
+        _, stocks, pending, share, breadth, median, weighted, _, cap, turnover = row
+        pct = (lambda v: f"{v:.1%}" if v is not None else "-")
+        num = (lambda v: f"{v:.1f}" if v is not None else "-")
+        lines.append(f"{row[0]:<10}{stocks:>6}{pending:>9}{pct(share):>8}{pct(breadth):>8}{num(median):>9}"
+                     f"{num(weighted):>9}{(cap or 0) / 1e8:>11.1f}{(turnover or 0) / 1e8:>11.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="行业板块 PE / pending / 宽度汇总")
+    parser.add_argument('--source', default=None, help=f"扫描结果 (默认 {ALL_FILE}，没有时用 {PENDING_FILE})")
+    parser.add_argument('--min-cap', type=float, default=None, help="只统计市值不低于此值 (亿) 的股票，只打印")
+    parser.add_argument('--sort', choices=FIELDS, default='pending_share')
+    parser.add_argument('--top', type=int, default=30, help="打印前 N 个板块 (0 为全部)")
+    parser.add_argument('--min-stocks', type=int, default=5, help="打印时忽略股票数少于此值的板块")
+    parser.add_argument('--full', action='store_true', help="忽略上次结果全部重算")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table, source = load_table(args.source)
+    loaded = time.perf_counter()
+    if args.min_cap is not None:
+        names, stock_idx, group_idx = memberships(table)
+        rows = group_stats(table, names, stock_idx, group_idx, mask=table.market_cap >= args.min_cap * 1e8)
+        recomputed, changed = len(rows), None
+    else:
+        rows, recomputed, changed = update_stats(table, full=args.full)
+    done = time.perf_counter()
+    print(format_rows(list(rows.values()), args.sort, args.top, args.min_stocks))
+    print(f"{source}: {len(table)} 只股票，{len(rows)} 个板块" +
+          (f"，{changed} 只变化，重算 {recomputed} 个板块" if changed is not None else "") +
+          f"；读取 {(loaded - start) * 1000:.0f} ms，汇总 {(done - loaded) * 1000:.1f} ms")
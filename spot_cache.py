@@ -0,0 +1,133 @@
+"""
+A 股实时行情快照缓存 (ak.stock_zh_a_spot_em)
+快照按列存为 .npz (代码 / 名称 / 动态市盈率 / 总市值 / 成交额)，在 TTL 内各脚本直接读缓存，不再联网
+扫描结果的补充字段 (pe / market_cap / turnover) 按代码一次性向量化关联 (searchsorted)，不逐行建字典
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+SPOT_FILE = "spot_cache/stock_spot.npz"
+SPOT_TTL = 6 * 3600             # 秒；扫描 + 补充数据通常在此时间内完成
+
+# 输出字段 -> 快照列名
+ENRICH_FIELDS = {'pe': '市盈率-动态', 'market_cap': '总市值', 'turnover': '成交额'}
+
+
+class SpotSnapshot:
+    """按代码排序的列式快照"""
+
+    __slots__ = ('code', 'name', 'fetched') + tuple(ENRICH_FIELDS)
+
+    def __init__(self, code, name, fetched=None, **fields):
+        code = np.asarray(code, dtype='U6')
+        order = np.argsort(code, kind='stable')
+        self.code = code[order]
+        self.name = np.asarray(name, dtype=str)[order]
+        self.fetched = time.time() if fetched is None else float(fetched)
+        for field in ENRICH_FIELDS:
+            setattr(self, field, np.asarray(fields[field], dtype=float)[order])
+
+    def __len__(self):
+        return len(self.code)
+
+    @classmethod
+    def from_frame(cls, df, fetched=None):
+        """stock_zh_a_spot_em 的 DataFrame -> 快照 (数值列一次性转换，无法解析的记为 NaN)"""
+        fields = {field: pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+                  for field, column in ENRICH_FIELDS.items()}
+        return cls(df['代码'].astype(str).str.zfill(6).to_numpy(), df['名称'].astype(str).to_numpy(),
+                   fetched, **fields)
+
+    def age(self):
+        return time.time() - self.fetched
+
+    def save(self, path=SPOT_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, code=self.code, name=self.name, fetched=np.float64(self.fetched),
+                 **{field: getattr(self, field) for field in ENRICH_FIELDS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=SPOT_FILE):
+        """读取快照，不存在或损坏时返回 None"""
+        try:
+            with np.load(path) as f:
+                return cls(f['code'], f['name'], float(f['fetched']),
+                           **{field: f[field] for field in ENRICH_FIELDS})
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def locate(self, codes):
+        """代码数组 -> 快照行号 (找不到为 -1)"""
+        codes = np.asarray(codes, dtype='U6')
+        if not len(self):
+            return np.full(len(codes), -1)
+        pos = np.searchsorted(self.code, codes)
+        pos = np.minimum(pos, len(self) - 1)
+        return np.where(self.code[pos] == codes, pos, -1)
+
+    def lookup(self, codes):
+        """{字段: float 数组}，找不到的代码为 NaN"""
+        rows = self.locate(codes)
+        found = rows >= 0
+        result = {}
+        for field in ENRICH_FIELDS:
+            values = np.full(len(rows), np.nan)
+            values[found] = getattr(self, field)[rows[found]]
+            result[field] = values
+        return result
+
+
+def load_spot(path=SPOT_FILE, ttl=SPOT_TTL, refresh=False):
+    """
+    读取快照；缓存超过 ttl 秒 (或 refresh) 时重新下载并写回
+    下载失败时退回过期缓存，都没有则抛出原异常
+    """
+    cached = None if refresh else SpotSnapshot.load(path)
+    if cached is not None and cached.age() <= ttl:
+        return cached
+    try:
+        import akshare as ak
+        snapshot = SpotSnapshot.from_frame(ak.stock_zh_a_spot_em())
+    except Exception:
+        if cached is not None:
+            print(f"Spot fetch failed, using cached snapshot ({cached.age() / 60:.0f} min old)")
+            return cached
+        raise
+    snapshot.save(path)
+    return snapshot
+
+
+def enrich_records(records, snapshot, keep_missing=False):
+    """
+    按代码批量补充 pe / market_cap / turnover (一次向量化关联，NaN 写为 None)
+    keep_missing: 快照中没有的代码保留原值 (否则写 None)
+    """
+    if not records:
+        return records
+    rows = snapshot.locate([r['code'] for r in records])
+    found = rows >= 0
+    safe = np.where(found, rows, 0)
+    columns = {}
+    for field in ENRICH_FIELDS:
+        values = getattr(snapshot, field)[safe].astype(object)
+        values[~found | np.isnan(getattr(snapshot, field)[safe])] = None
+        columns[field] = values.tolist()
+    found = found.tolist()
+    for i, record in enumerate(records):
+        if keep_missing and not found[i]:
+            continue
+        for field in ENRICH_FIELDS:
+            record[field] = columns[field][i]
+    return records
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    snapshot = load_spot(refresh=True)
+    print(f"{len(snapshot)} stocks cached to {SPOT_FILE} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,217 @@
+"""
+stocks_quarterly.html 的前端数据包
+扫描结果 (stock_quarterly_all.json，没有时用 stock_quarterly_pending.json) 拆成:
+    summary.<hash>.json   列表页只用到的字段 (无 K 线)，按页面显示顺序，各筛选按钮的行号预先算好
+    charts/<桶>.<hash>.json  K 线图数据，按代码分桶，openChart 时才按需加载
+    index.json            入口: 指向当前的 summary 和各分桶文件 (唯一不带 hash、需要每次重新请求的文件)
+带 hash 的文件内容不变时文件名不变，浏览器可长期缓存；每个文件另写 .gz 预压缩版本
+(装了 brotli 时再写 .br)，供 nginx gzip_static / brotli_static 等静态服务直接发送
+
+只重写内容变化的文件；上一版 index.json 引用的文件保留一轮，正在加载旧版的页面不会断
+fetch_stocks_quarterly.py / enrich_stock_data.py 写完结果后自动调用；stock_payload/ 不入库，
+GitHub Pages 部署 (.github/workflows/deploy.yml) 时由已入库的扫描结果重新生成
+
+用法: python stock_payload.py [--source stock_quarterly_all.json] [--out stock_payload] [--buckets 64]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from json_stream import ALL_FILE, PENDING_FILE, iter_records
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PAYLOAD_DIR = "stock_payload"
+INDEX_FILE = "index.json"
+CHART_DIR = "charts"
+BUCKETS = 64
+FORMAT = 1
+# 列表页 (renderGrid) 用到的字段，summary 中每只股票为按此顺序的数组
+SUMMARY_FIELDS = ('code', 'name', 'sector', 'status', 'price', 'pe', 'market_cap', 'turnover',
+                  'K', 'D', 'J', 'pattern', 'q2_high', 'q3_low', 'bucket')
+CHART_FIELDS = ('date', 'open', 'high', 'low', 'close', 'K', 'D', 'J')
+# 'all' 即全部行，不单独存
+FILTERS = ('pending', 'unbroken', 'near_breakout', 'long')
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def bucket_of(code, buckets=BUCKETS):
+    """代码 -> 分桶号 (页面从 summary 的 bucket 列读取，不需要知道算法)"""
+    return int(hashlib.sha1(str(code).encode('utf-8')).hexdigest()[:8], 16) % buckets
+
+
+def limit_pct(code):
+    """涨跌停幅度: 创业板 (30) / 科创板 (68) 20%，其余 10%"""
+    return 0.20 if str(code).startswith(('30', '68')) else 0.10
+
+
+def record_filters(item):
+    """单只股票命中的筛选按钮 (与页面原来的 JS 判断一致，不含 all)"""
+    kdj = item.get('kdj') or {}
+    hits = []
+    pending = item.get('status') == 'pending_long'
+    price, breakout = item.get('price'), item.get('q2_high')
+    if pending:
+        hits.append('pending')
+        if price <= breakout:
+            hits.append('unbroken')
+        # 还没突破、一个涨停板内能到突破价，且这段季线里没有高于突破价的压力
+        if price < breakout and price * (1 + limit_pct(item['code'])) >= breakout:
+            highs = [bar['high'] for bar in item.get('data') or []]
+            if not highs or max(highs) <= breakout + 0.01:
+                hits.append('near_breakout')
+    if kdj.get('pattern') == '多头排列':
+        hits.append('long')
+    return hits
+
+
+def summary_row(item, bucket):
+    kdj = item.get('kdj') or {}
+    values = dict(item, K=kdj.get('K'), D=kdj.get('D'), J=kdj.get('J'), pattern=kdj.get('pattern'), bucket=bucket)
+    return [values.get(field) for field in SUMMARY_FIELDS]
+
+
+def chart_columns(bars):
+    """K 线列表 -> 列式 {字段: [值, ...]}"""
+    return {field: [bar.get(field) for bar in bars] for field in CHART_FIELDS}
+
+
+class PayloadWriter:
+    """按内容 hash 命名写文件 (已存在则跳过)，同时写 .gz / .br 预压缩版本"""
+
+    def __init__(self, root):
+        self.root = root
+        self.written = 0
+        self.skipped = 0
+        self.bytes = {'raw': 0, 'gzip': 0, 'brotli': 0}
+
+    def write(self, subdir, stem, text):
+        """返回相对 root 的文件名"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        name = f"{subdir}/{stem}.{digest}.json" if subdir else f"{stem}.{digest}.json"
+        path = os.path.join(self.root, name)
+        compressed = {'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            compressed['brotli'] = brotli.compress(data)
+        self.bytes['raw'] += len(data)
+        for kind, blob in compressed.items():
+            self.bytes[kind] += len(blob)
+        if os.path.exists(path):
+            self.skipped += 1
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for kind, blob in compressed.items():
+            _write_atomic(path + ('.gz' if kind == 'gzip' else '.br'), blob)
+        _write_atomic(path, data)
+        self.written += 1
+        return name
+
+
+def _read_index(root):
+    try:
+        with open(os.path.join(root, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _index_files(index):
+    return {index['summary']} | set(index.get('charts') or []) if index.get('summary') else set()
+
+
+def _prune(root, keep):
+    """删除不在 keep 中的带 hash 文件 (及其压缩版本)"""
+    removed = 0
+    for folder in (root, os.path.join(root, CHART_DIR)):
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            rel = os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/')
+            base = rel[:-3] if rel.endswith(('.gz', '.br')) else rel
+            if base.endswith('.json') and base != INDEX_FILE and base not in keep:
+                os.remove(os.path.join(root, rel))
+                removed += 1
+    return removed
+
+
+def default_source():
+    return ALL_FILE if os.path.exists(ALL_FILE) else PENDING_FILE
+
+
+def build_payload(source=None, out_dir=PAYLOAD_DIR, buckets=BUCKETS):
+    """
+    读取扫描结果 (逐条流式)，写出 summary / 分桶 K 线 / index.json
+    返回 {stocks, written, skipped, removed, bytes}
+    """
+    source = source or default_source()
+    rows = []
+    filters = {name: [] for name in FILTERS}
+    charts = [{} for _ in range(buckets)]
+    last_date = None
+    for item in iter_records(source):
+        last_date = max(last_date or '', item.get('last_date') or '') or None
+        bucket = bucket_of(item['code'], buckets)
+        for name in record_filters(item):
+            filters[name].append(len(rows))
+        rows.append(summary_row(item, bucket))
+        charts[bucket][item['code']] = chart_columns(item.get('data') or [])
+
+    writer = PayloadWriter(out_dir)
+    chart_files = [writer.write(CHART_DIR, f"{b:02d}", _dumps(charts[b])) for b in range(buckets)]
+    summary = {'fields': list(SUMMARY_FIELDS), 'rows': rows, 'filters': filters,
+               'source': os.path.basename(source), 'last_date': last_date}
+    summary_file = writer.write('', "summary", _dumps(summary))
+
+    previous = _read_index(out_dir)
+    index = {'format': FORMAT, 'summary': summary_file, 'charts': chart_files, 'count': len(rows),
+             'updated': time.strftime('%Y-%m-%d %H:%M:%S')}
+    if _index_files(previous) != _index_files(index):
+        _write_atomic(os.path.join(out_dir, INDEX_FILE), _dumps(index).encode('utf-8'))
+    removed = _prune(out_dir, _index_files(index) | _index_files(previous))
+    return {'stocks': len(rows), 'written': writer.written, 'skipped': writer.skipped,
+            'removed': removed, 'bytes': writer.bytes}
+
+
+def report(result, source, out_dir=PAYLOAD_DIR):
+    size = os.path.getsize(source) if os.path.exists(source) else 0
+    raw = result['bytes']
+    line = (f"{result['stocks']} stocks -> {out_dir}/ ({result['written']} files written, "
+            f"{result['skipped']} unchanged, {result['removed']} removed); "
+            f"{size / 2 ** 20:.2f} MB -> {raw['raw'] / 2 ** 20:.2f} MB raw, {raw['gzip'] / 2 ** 20:.2f} MB gzip")
+    if raw['brotli']:
+        line += f", {raw['brotli'] / 2 ** 20:.2f} MB brotli"
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 stocks_quarterly.html 的紧凑数据包")
+    parser.add_argument('--source', default=None, help=f"扫描结果 (默认 {ALL_FILE}，没有时用 {PENDING_FILE})")
+    parser.add_argument('--out', default=PAYLOAD_DIR)
+    parser.add_argument('--buckets', type=int, default=BUCKETS, help="K 线分桶数")
+    args = parser.parse_args()
+
+    source = args.source or default_source()
+    if not os.path.exists(source):
+        print(f"{source} not found")
+    else:
+        start = time.perf_counter()
+        result = build_payload(source, args.out, args.buckets)
+        print(report(result, source, args.out) + f", {time.perf_counter() - start:.2f}s")
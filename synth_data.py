@@ -0,0 +1,216 @@
+"""
+合成数据生成器 (基准测试用)
+按给定规模生成与真实文件同结构的数据，价格为随机游走，KDJ / 规则状态用与抓取脚本相同的代码计算:
+    futures_data.js            FUTURES_DATA，每个品种主力 + 次主力各 13 根周线
+    stock_quarterly_all.json   季线扫描结果 (含 pending 子集 stock_quarterly_pending.json)，12 根季线 + 补充字段
+
+同一 seed 生成的文件逐字节相同
+
+用法: python synth_data.py --products 620 --stocks 40000 [--out bench_data] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from bar_series import BarSeries
+from futures_store import BUNDLE_FOOTER, BUNDLE_HEADER
+from indicators import KDJState, kdj_arrays
+from json_stream import ALL_FILE, PENDING_FILE, QuarterlyOutput
+from rule_engine import BarPanel, PANEL_FIELDS, pattern_status
+
+END_DATE = "2026-02-15"         # 最后一根周线 (周日)，固定后输出可复现
+FUTURES_WEEKS = 13              # 同 fetch_futures: 约 3 个月周线
+STOCK_QUARTERS = 20             # 5 年季线参与 KDJ 计算，输出最后 12 根 (同 fetch_stocks_quarterly)
+STOCK_KEEP = 12
+STOCK_CHUNK = 2000              # 股票分批生成并流式写出
+SECTORS = ("银行", "证券", "医药生物", "电子", "计算机", "有色金属", "基础化工", "机械设备",
+           "汽车", "电力设备", "食品饮料", "国防军工", "房地产", "传媒", "交通运输", "建筑装饰")
+
+
+def random_ohlc(rng, rows, n, price, vol, decimals):
+    """
+    rows 条长度 n 的随机游走 K 线 (rows × n 矩阵)
+    price: 每行的起始价格；vol: 每根 K 线收益率的标准差
+    """
+    price = np.asarray(price, dtype=float)[:, np.newaxis]
+    vol = np.asarray(vol, dtype=float)[:, np.newaxis]
+    close = price * np.exp(np.cumsum(rng.normal(0, 1, (rows, n)) * vol, axis=1))
+    gap = rng.normal(0, 0.2, (rows, n)) * vol
+    open_ = np.concatenate([price, close[:, :-1]], axis=1) * np.exp(gap)
+    wick = np.abs(rng.normal(0, 0.5, (rows, n, 2))) * vol[..., np.newaxis]
+    high = np.maximum(open_, close) * (1 + wick[..., 0])
+    low = np.minimum(open_, close) * (1 - np.minimum(wick[..., 1], 0.5))
+    volume = np.round(rng.lognormal(12, 1, (rows, 1)) * rng.lognormal(0, 0.4, (rows, n)))
+    bars = {'open': open_, 'high': high, 'low': low, 'close': close}
+    bars = {name: np.round(values, decimals) for name, values in bars.items()}
+    bars['volume'] = volume
+    return bars
+
+
+def add_kdj(bars):
+    """按行计算 KDJ (保留两位小数，同 indicators.calculate_kdj)"""
+    k, d, j = kdj_arrays(bars['high'], bars['low'], bars['close'])
+    bars.update(K=np.round(k, 2), D=np.round(d, 2), J=np.round(j, 2))
+    return bars
+
+
+def latest_status(bars, rules, columns=None):
+    """
+    每行最后 3 根 K 线 (columns 为结束位置，默认最后一列) 的规则状态
+    与 check_rules 一样用最新的 K / D 判断金叉 / 死叉，返回 {规则名: 状态数组}
+    """
+    end = bars['close'].shape[1] if columns is None else columns
+    window = {name: bars[name][:, end - 3:end] for name in PANEL_FIELDS}
+    panel = BarPanel([('', '')] * len(window['close']), np.full(len(window['close']), 3), **window)
+    kd = {'k': window['K'][:, -1], 'd': window['D'][:, -1]}
+    return {rule: pattern_status(panel, rule, **kd) for rule in rules}
+
+
+def kdj_patterns(k, d, j):
+    """fetch_futures.analyze_kdj_pattern 的逐行版本"""
+    out = []
+    for k_, d_, j_ in zip(k.tolist(), d.tolist(), j.tolist()):
+        patterns = []
+        if j_ > 100:
+            patterns.append("超买区间")
+        elif j_ < 0:
+            patterns.append("超卖区间")
+        if k_ > 80 and d_ > 80:
+            patterns.append("高位钝化")
+        elif k_ < 20 and d_ < 20:
+            patterns.append("低位钝化")
+        if k_ > d_ and j_ > k_:
+            patterns.append("多头排列")
+        elif k_ < d_ and j_ < k_:
+            patterns.append("空头排列")
+        out.append(", ".join(patterns or ["中性区间"]))
+    return out
+
+
+def _series(dates, bars, row, start=0):
+    return BarSeries(dates[start:], *(bars[name][row, start:] for name in
+                                      ('open', 'high', 'low', 'close', 'volume', 'K', 'D', 'J')))
+
+
+def make_futures_data(products, weeks=FUTURES_WEEKS, seed=0, end_date=END_DATE):
+    """生成 FUTURES_DATA 字典: products 个品种，每个品种主力 + 次主力"""
+    rng = np.random.default_rng(seed)
+    rows = 2 * products
+    base = np.repeat(np.exp(rng.uniform(np.log(800), np.log(80000), products)), 2)
+    base[1::2] *= np.exp(rng.normal(0, 0.01, products))          # 次主力与主力价差很小
+    bars = add_kdj(random_ohlc(rng, rows, weeks, base, np.repeat(rng.uniform(0.015, 0.05, products), 2), 0))
+    status = latest_status(bars, ('s1', 's2'))
+    patterns = kdj_patterns(bars['K'][:, -1], bars['D'][:, -1], bars['J'][:, -1])
+    dates = np.datetime64(end_date, 'D') - 7 * np.arange(weeks)[::-1]
+    update = f"{end_date} 10:00:00"
+    month = np.datetime64(end_date, 'M')
+
+    data = {}
+    for p in range(products):
+        code = f"S{p:04d}"
+        product = {'name': f"合成品种{p}", 'code': code, 'period': 'weekly'}
+        for offset, key, contract_type in ((0, 'main', '主力'), (1, 'sub', '次主力')):
+            row = 2 * p + offset
+            records = _series(dates, bars, row).to_records()
+            expiry = str(month + 3 + 2 * offset).replace('-', '')[2:]
+            product[key] = {
+                'symbol': f"{code}{expiry}",
+                'contractType': contract_type,
+                'lastUpdate': update,
+                'latestKDJ': {
+                    'K': records[-1]['K'], 'D': records[-1]['D'], 'J': records[-1]['J'],
+                    'pattern': patterns[row],
+                    'custom_rule_1': status['s1'][row],
+                    'custom_rule_2': status['s2'][row],
+                },
+                'kdjState': KDJState.from_bars(records).to_dict(),
+                'data': records,
+            }
+        data[code] = product
+    return data
+
+
+def write_futures_js(data, path):
+    """写成 futures_data.js 浏览器包格式 (与 futures_store.build_bundle 相同的头尾)"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(BUNDLE_HEADER.format(time=f"{END_DATE} 10:00:00") + body + BUNDLE_FOOTER)
+
+
+def iter_stock_records(count, seed=0, end_date=END_DATE, chunk=STOCK_CHUNK):
+    """
+    逐条生成 stock_quarterly_all.json 的记录 (每 chunk 只股票一起向量化计算)
+    结构同 fetch_stocks_quarterly.analyze_stock 的结果 + enrich 字段 (pe / market_cap / turnover / sector)
+    """
+    rng = np.random.default_rng(seed)
+    n = STOCK_QUARTERS
+    # 季末 = 下个季度第一个月的前一天，最后一根为 end_date 所在的 (未收盘) 季度
+    month = np.datetime64(end_date, 'M').astype(np.int64)
+    next_quarter = ((month // 3 + 1) * 3 - 3 * np.arange(n)[::-1]).astype('datetime64[M]')
+    dates = next_quarter.astype('datetime64[D]') - 1
+    start = n - STOCK_KEEP
+    for first in range(0, count, chunk):
+        rows = min(chunk, count - first)
+        price = np.exp(rng.uniform(np.log(2), np.log(200), rows))
+        bars = add_kdj(random_ohlc(rng, rows, n, price, rng.uniform(0.08, 0.25, rows), 2))
+        # 规则只看已收盘的季度 (去掉最后一根)，KDJ 取最后一个已收盘季度
+        status = latest_status(bars, ('stock_pending',), columns=n - 1)['stock_pending']
+        pe = np.round(rng.lognormal(3.2, 0.8, rows), 2)
+        market_cap = np.round(price * rng.lognormal(20, 1, rows) / 10, -4)
+        turnover = np.round(market_cap * rng.uniform(0.001, 0.05, rows))
+        sector = rng.integers(0, len(SECTORS), rows)
+        for i in range(rows):
+            bars_i = _series(dates, bars, i, start)
+            k, d, j = (float(bars[name][i, -2]) for name in ('K', 'D', 'J'))
+            q = {f"q{x}_{side}": float(bars[side][i, -5 + x]) for x in (1, 2, 3) for side in ('low', 'high')}
+            yield {
+                'code': f"{first + i:06d}",
+                'name': f"合成股票{first + i}",
+                'status': status[i] or 'normal',
+                'kdj': {'K': k, 'D': d, 'J': j, 'pattern': "多头排列" if k > d else "空头排列"},
+                'last_date': str(dates[-1]),
+                'price': float(bars['close'][i, -1]),
+                'q1_low': q['q1_low'], 'q1_high': q['q1_high'],
+                'q2_low': q['q2_low'], 'q2_high': q['q2_high'],
+                'q3_low': q['q3_low'], 'q3_high': q['q3_high'],
+                'data': bars_i.to_records(),
+                'pe': float(pe[i]),
+                'market_cap': float(market_cap[i]),
+                'turnover': float(turnover[i]),
+                'sector': SECTORS[sector[i]],
+            }
+
+
+def write_stock_files(count, out_dir=".", seed=0):
+    """写出 stock_quarterly_all.json + stock_quarterly_pending.json，返回 (总数, pending 数)"""
+    with QuarterlyOutput(os.path.join(out_dir, ALL_FILE), os.path.join(out_dir, PENDING_FILE)) as output:
+        for record in iter_stock_records(count, seed):
+            output.write(record)
+    return output.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成的 futures_data.js / stock_quarterly_all.json")
+    parser.add_argument('--products', type=int, default=62, help="期货品种数 (0 不生成)")
+    parser.add_argument('--stocks', type=int, default=0, help="股票数 (0 不生成)")
+    parser.add_argument('--out', default="bench_data")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.products:
+        start = time.perf_counter()
+        path = os.path.join(args.out, "futures_data.js")
+        write_futures_js(make_futures_data(args.products, seed=args.seed), path)
+        print(f"{path}: {args.products} 个品种, {os.path.getsize(path) / 2 ** 20:.1f} MB, "
+              f"{time.perf_counter() - start:.1f}s")
+    if args.stocks:
+        start = time.perf_counter()
+        total, pending = write_stock_files(args.stocks, args.out, args.seed)
+        size = os.path.getsize(os.path.join(args.out, ALL_FILE)) / 2 ** 20
+        print(f"{args.out}/{ALL_FILE}: {total} 只股票 ({pending} pending), {size:.1f} MB, "
+              f"{time.perf_counter() - start:.1f}s")
@@ -0,0 +1,126 @@
+"""bar_codec: 编码后解码与原始记录逐值相同 (类型也相同)，无法精确编码时原样保留"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import bar_codec
+from bar_codec import (STOCK_TICK, decode_many, decode_records, decode_series, encode_records, is_encoded, pack,
+                       pack_product, tick_size, unpack, unpack_product)
+from bar_series import BarSeries
+from futures_loader import parse_futures_js
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dumps(value):
+    """按序列化结果比较，int / float 不同也算不一致"""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def make_records(n=8, tick=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.integers(-20, 21, n))
+    dates = np.datetime64('2025-01-05') + np.cumsum(rng.integers(1, 15, n))
+    records = []
+    for date, c in zip(np.datetime_as_string(dates, unit='D'), close):
+        prices = [round(float(p) * tick, 10) for p in (c + rng.integers(-5, 6), c + 8, c - 8, c)]
+        kdj = [round(float(x), 2) for x in rng.uniform(-20, 120, 3)]
+        records.append(dict(zip(bar_codec.RECORD_KEYS, [str(date)] + prices + [int(rng.integers(0, 10 ** 7))] + kdj)))
+    return records
+
+
+@pytest.fixture(scope='module')
+def futures_data():
+    with open(os.path.join(ROOT, "futures_data.js"), 'r', encoding='utf-8') as f:
+        return parse_futures_js(f.read())
+
+
+def test_tick_sizes_resolve_from_any_directory(tmp_path, monkeypatch):
+    bar_codec.load_tick_sizes.cache_clear()
+    monkeypatch.chdir(tmp_path)
+    try:
+        assert tick_size('rb') == 1.0
+        assert tick_size('unknown') is None
+    finally:
+        bar_codec.load_tick_sizes.cache_clear()
+
+
+def test_futures_data_round_trip(futures_data):
+    packed = {code: pack_product(code, product) for code, product in futures_data.items()}
+    contracts = [p[key] for p in packed.values() for key in ('main', 'sub') if p.get(key)]
+    assert contracts and all(is_encoded(c['bars']) for c in contracts)
+    assert dumps({code: unpack_product(p) for code, p in packed.items()}) == dumps(futures_data)
+
+
+def test_pending_file_round_trip():
+    with open(os.path.join(ROOT, "stock_quarterly_pending.json"), 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    packed = [pack(r, STOCK_TICK) for r in records]
+    assert all('bars' in r for r in packed if r.get('data'))
+    assert dumps([unpack(r) for r in packed]) == dumps(records)
+
+
+@pytest.mark.parametrize('tick', [0.01, 0.2, 5.0, None])
+def test_random_records_round_trip(tick):
+    records = make_records(tick=tick or 0.001, seed=int((tick or 0) * 100))
+    encoded = encode_records(records, tick)
+    assert encoded is not None
+    assert dumps(decode_records(json.loads(json.dumps(encoded)))) == dumps(records)
+
+
+def test_value_types_are_kept():
+    records = make_records(4)
+    for record in records:
+        record['K'], record['D'], record['J'] = 50, 48, 54
+        record['volume'] = float(record['volume'])
+    encoded = encode_records(records, 0.01)
+    assert encoded['types'] == {'volume': 'float', 'K': 'int', 'D': 'int', 'J': 'int'}
+    assert dumps(decode_records(encoded)) == dumps(records)
+    assert 'types' not in encode_records(make_records(4), 0.01)
+
+
+@pytest.mark.parametrize('change', [
+    lambda r: r[1].update(K=50),                    # 同一列 int / float 混用
+    lambda r: r[1].update(K=50.125),                # 超过两位小数
+    lambda r: r[1].update(volume=10.5),             # 成交量不是整数
+    lambda r: r[1].update(close=float('nan')),
+    lambda r: r[1].update(date='2025/01/09'),
+    lambda r: r[1].pop('J'),                        # 字段不是标准的 9 个
+])
+def test_records_that_cannot_round_trip_are_kept(change):
+    records = make_records(3)
+    change(records)
+    assert encode_records(records, 0.01) is None
+    container = {'code': 'X', 'data': records}
+    assert pack(container, 0.01) is container
+
+
+def test_off_grid_prices_fall_back_to_decimal_tick():
+    records = make_records(5)
+    records[2]['high'] = records[2]['close'] + 0.003
+    encoded = encode_records(records, 0.01)
+    assert encoded['tick'] == 0.001
+    assert dumps(decode_records(encoded)) == dumps(records)
+
+
+def test_batched_decode_matches_single(futures_data):
+    encoded = [pack_product(code, p)['main']['bars'] for code, p in futures_data.items() if p.get('main')]
+    many = decode_many(encoded)
+    series = decode_series(encoded)
+    for item, columns, bars in zip(encoded, many, series):
+        single = BarSeries.from_records(decode_records(item))
+        for name in BarSeries.FIELDS:
+            np.testing.assert_array_equal(columns[name], getattr(single, name))
+            np.testing.assert_array_equal(getattr(bars, name), getattr(single, name))
+    assert decode_many([]) == []
+
+
+def test_pack_keeps_other_fields_and_order():
+    container = {'symbol': 'RB2605', 'data': make_records(3), 'latestKDJ': {'K': 1.0}}
+    packed = pack(container, 0.01)
+    assert list(packed) == ['symbol', 'bars', 'latestKDJ']
+    assert list(unpack(packed)) == list(container)
+    assert unpack({'symbol': 'x'}) == {'symbol': 'x'}
@@ -0,0 +1,69 @@
+"""bar_series: 列式 K 线与 futures_data.js 记录格式互相转换"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_series import BarSeries, products_from_data
+from futures_loader import parse_futures_js
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RECORDS = [
+    {"date": "2026-01-04", "open": 3500.0, "high": 3560.0, "low": 3480.0, "close": 3550.0, "volume": 1200,
+     "K": 55.1, "D": 50.2, "J": 64.9},
+    {"date": "2026-01-11", "open": 3550.0, "high": 3600.0, "low": 3520.0, "close": 3530.0, "volume": 900,
+     "K": 57.3, "D": 52.56, "J": 66.79},
+    {"date": "2026-01-18", "open": 3530.0, "high": 3531.0, "low": 3400.0, "close": 3410.0, "volume": 1500,
+     "K": 41.02, "D": 48.71, "J": 25.64},
+]
+
+
+def test_records_round_trip():
+    series = BarSeries.from_records(RECORDS)
+    assert len(series) == 3
+    assert series.date.dtype == np.dtype('datetime64[D]')
+    np.testing.assert_array_equal(series.high, [3560.0, 3600.0, 3531.0])
+    assert json.dumps(series.to_records()) == json.dumps(RECORDS)
+
+
+def test_futures_data_round_trip():
+    with open(os.path.join(ROOT, "futures_data.js"), 'r', encoding='utf-8') as f:
+        data = parse_futures_js(f.read())
+    products = products_from_data(data)
+    assert list(products) == list(data)
+    for code, product in products.items():
+        for contract_type, contract in product.contracts():
+            key = 'main' if contract_type == '主力' else 'sub'
+            assert contract.symbol == data[code][key]['symbol']
+            assert contract.bars.to_records() == data[code][key]['data']
+
+
+def test_missing_values_become_nan():
+    records = [dict(RECORDS[0], K=None, volume=None)]
+    series = BarSeries.from_records(records)
+    assert np.isnan(series.K[0]) and np.isnan(series.volume[0])
+    assert series.to_records()[0]['volume'] == 0
+
+
+def test_from_frame_matches_from_records():
+    frame = pd.DataFrame(RECORDS)
+    expected = BarSeries.from_records(RECORDS)
+    series = BarSeries.from_frame(frame)
+    for name in BarSeries.FIELDS:
+        np.testing.assert_array_equal(getattr(series, name), getattr(expected, name))
+    no_kdj = BarSeries.from_frame(frame.drop(columns=['K', 'D', 'J']))
+    assert np.isnan(no_kdj.K).all()
+
+
+def test_slices_share_arrays():
+    series = BarSeries.from_records(RECORDS)
+    tail = series.tail(2)
+    assert len(tail) == 2 and len(series.tail(0)) == 0
+    tail.close[-1] = 1.0
+    assert series.close[-1] == 1.0
+    with pytest.raises(TypeError):
+        series[0]
@@ -0,0 +1,89 @@
+"""futures_store: 浏览器包 -> 分片 -> 浏览器包 往返不丢数据，只重写有变化的分片"""
+
+import copy
+import json
+import os
+import shutil
+
+import pytest
+
+from futures_loader import parse_futures_js
+from futures_store import FuturesStore, save_products, shard_root
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_bundle(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_futures_js(f.read())
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    path = str(tmp_path / "futures_data.js")
+    shutil.copy(os.path.join(ROOT, "futures_data.js"), path)
+    return path
+
+
+def test_import_and_rebuild_round_trip(bundle):
+    original = read_bundle(bundle)
+    store = FuturesStore(bundle)
+    assert store.codes() == list(original)
+    assert dumps(store.load()) == dumps(original)
+    code = next(iter(original))
+    assert dumps(store.get(code)) == dumps(original[code])
+    assert store.get('NOPE') is None
+    assert list(store.load([code])) == [code]
+
+    with open(os.path.join(shard_root(bundle), f"{code}.json"), 'r', encoding='utf-8') as f:
+        shard = json.load(f)
+    assert 'bars' in shard['main'] and 'data' not in shard['main']
+
+    assert not store.build_bundle()
+    assert store.build_bundle(force=True)
+    assert dumps(read_bundle(bundle)) == dumps(original)
+
+
+def test_only_changed_shards_are_rewritten(bundle):
+    data = read_bundle(bundle)
+    store = FuturesStore(bundle)
+    first, second = list(data)[:2]
+    versions = {code: entry['version'] for code, entry in store.manifest['products'].items()}
+    assert not store.save(first, data[first])
+
+    changed = copy.deepcopy(data)
+    changed[first]['main']['data'][-1]['close'] += 1.0
+    assert store.save_all(changed) == [first]
+    assert store.manifest['products'][first]['version'] > versions[first]
+    assert store.manifest['products'][second]['version'] == versions[second]
+    assert store.bundle_stale()
+    assert store.build_bundle()
+    assert dumps(read_bundle(bundle)) == dumps(changed)
+
+
+def test_save_products_prunes_and_reopens(bundle):
+    data = read_bundle(bundle)
+    dropped = list(data)[-1]
+    subset = {code: product for code, product in data.items() if code != dropped}
+    changed, rebuilt = save_products(subset, bundle)
+    assert changed == [dropped] and rebuilt
+    assert not os.path.exists(os.path.join(shard_root(bundle), f"{dropped}.json"))
+    reopened = FuturesStore(bundle)
+    assert reopened.codes() == list(subset)
+    assert dumps(read_bundle(bundle)) == dumps(subset)
+    assert save_products(subset, bundle) == ([], False)
+
+
+def test_external_bundle_edit_is_reimported(bundle):
+    store = FuturesStore(bundle)
+    code = store.codes()[0]
+    data = read_bundle(bundle)
+    data[code]['name'] = "改名"
+    text = "const FUTURES_DATA = " + json.dumps(data, ensure_ascii=False) + ";\n"
+    with open(bundle, 'w', encoding='utf-8') as f:
+        f.write(text)
+    assert FuturesStore(bundle).get(code)['name'] == "改名"
@@ -0,0 +1,81 @@
+"""indicators: 与原 fetch_futures.calculate_kdj (pandas 逐行递推) 的结果一致"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import calculate_kdj, kdj_arrays, kdj_grid
+
+
+def reference_kdj(df, n=9, m1=3, m2=3):
+    """原 fetch_futures.calculate_kdj"""
+    low_n = df['low'].rolling(window=n, min_periods=1).min()
+    high_n = df['high'].rolling(window=n, min_periods=1).max()
+    rsv = ((df['close'] - low_n) / (high_n - low_n) * 100).fillna(50)
+    k = pd.Series(index=df.index, dtype=float)
+    d = pd.Series(index=df.index, dtype=float)
+    k.iloc[0] = 50
+    d.iloc[0] = 50
+    for i in range(1, len(df)):
+        k.iloc[i] = (m1 - 1) / m1 * k.iloc[i - 1] + 1 / m1 * rsv.iloc[i]
+        d.iloc[i] = (m2 - 1) / m2 * d.iloc[i - 1] + 1 / m2 * k.iloc[i]
+    j = 3 * k - 2 * d
+    return k.to_numpy(), d.to_numpy(), j.to_numpy()
+
+
+def random_bars(rng, n):
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    spread = np.abs(rng.normal(0, 0.01, n)) * close
+    return pd.DataFrame({'high': close + spread, 'low': close - spread, 'close': close})
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    df = random_bars(rng, int(rng.integers(1, 80)))
+    if seed % 2:
+        # 一字板 (0/0) 和缺失的收盘价都按 RSV = 50 处理
+        df.loc[df.index[len(df) // 2:], ['high', 'low', 'close']] = df['close'].iloc[len(df) // 2]
+        df.loc[df.index[1::7], 'close'] = np.nan
+    for new, old in zip(kdj_arrays(df['high'], df['low'], df['close']), reference_kdj(df)):
+        np.testing.assert_allclose(new, old, rtol=0, atol=1e-9)
+
+
+def test_calculate_kdj_rounds_and_respects_min_bars():
+    df = random_bars(np.random.default_rng(0), 30)
+    expected = [np.round(x, 2) for x in reference_kdj(df)]
+    calculate_kdj(df)
+    for name, values in zip('KDJ', expected):
+        np.testing.assert_allclose(df[name], values, rtol=0, atol=1e-9)
+    short = random_bars(np.random.default_rng(1), 5)
+    assert 'K' not in calculate_kdj(short, min_bars=6).columns
+
+
+def test_batch_with_leading_padding_matches_single_series():
+    rng = np.random.default_rng(3)
+    frames = [random_bars(rng, n) for n in (30, 12, 1)]
+    width = max(len(f) for f in frames)
+    batch = {name: np.full((len(frames), width), np.nan) for name in ('high', 'low', 'close')}
+    for row, frame in enumerate(frames):
+        for name in batch:
+            batch[name][row, width - len(frame):] = frame[name]
+    result = kdj_arrays(batch['high'], batch['low'], batch['close'])
+    for row, frame in enumerate(frames):
+        pad = width - len(frame)
+        for values, single in zip(result, kdj_arrays(frame['high'], frame['low'], frame['close'])):
+            assert np.isnan(values[row, :pad]).all()
+            np.testing.assert_array_equal(values[row, pad:], single)
+
+
+def test_grid_slices_equal_kdj_arrays():
+    rng = np.random.default_rng(5)
+    df = random_bars(rng, 40)
+    high = np.stack([df['high'], df['high'] * 1.01])
+    low = np.stack([df['low'], df['low'] * 0.99])
+    close = np.stack([df['close'], df['close']])
+    close[1, :4] = high[1, :4] = low[1, :4] = np.nan
+    params = [(9, 3, 3), (5, 2, 4), (14, 3, 2), (9, 4, 3)]
+    grid = kdj_grid(high, low, close, params)
+    for p, (n, m1, m2) in enumerate(params):
+        for values, single in zip(grid, kdj_arrays(high, low, close, n, m1, m2)):
+            np.testing.assert_array_equal(values[p], single)
@@ -0,0 +1,89 @@
+"""json_stream: 逐条写出的文件能被 json.load 读取，iter_records 逐条读取的结果与 json.load 一致"""
+
+import json
+import os
+
+import pytest
+
+import json_stream
+from bar_codec import STOCK_TICK, pack
+from json_stream import JsonArrayWriter, QuarterlyOutput, iter_records
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RECORDS = [
+    {'code': '600000', 'name': '浦发银行', 'status': 'pending_long', 'price': 10.5, 'nested': {'a': [1, 2.5e-7, None]}},
+    {'code': '000001', 'name': '平安银行', 'status': None, 'price': 12, 'text': 'a, b ] [ "q"'},
+    {'code': '300750', 'name': '宁德时代', 'status': 'long', 'price': 1234567.891},
+]
+
+
+@pytest.mark.parametrize('name, indent', [('out.json', None), ('out.json', 2), ('out.ndjson', None)])
+@pytest.mark.parametrize('chunk', [3, 17, 1 << 20])
+def test_write_and_stream_back(tmp_path, monkeypatch, name, indent, chunk):
+    monkeypatch.setattr(json_stream, 'READ_CHUNK', chunk)
+    path = str(tmp_path / name)
+    with JsonArrayWriter(path, indent) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert writer.count == len(RECORDS)
+    if not name.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f) == RECORDS
+    assert list(iter_records(path)) == RECORDS
+    assert os.listdir(tmp_path) == [name]
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_empty_array(tmp_path, indent):
+    path = str(tmp_path / 'empty.json')
+    with JsonArrayWriter(path, indent):
+        pass
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == []
+    assert list(iter_records(path)) == []
+
+
+def test_error_keeps_previous_file(tmp_path):
+    path = str(tmp_path / 'out.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(RECORDS[:1], f)
+    with pytest.raises(RuntimeError):
+        with JsonArrayWriter(path) as writer:
+            writer.write(RECORDS[1])
+            raise RuntimeError("boom")
+    assert list(iter_records(path)) == RECORDS[:1]
+    assert os.listdir(tmp_path) == ['out.json']
+
+
+def test_quarterly_output_splits_pending(tmp_path):
+    all_path, pending_path = str(tmp_path / 'all.json'), str(tmp_path / 'pending.json')
+    with QuarterlyOutput(all_path, pending_path) as out:
+        for record in RECORDS:
+            out.write(record)
+    assert out.counts == (3, 1)
+    assert list(iter_records(all_path)) == RECORDS
+    assert [r['code'] for r in iter_records(pending_path)] == ['600000']
+
+
+def test_encoded_bars_are_unpacked(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_stream, 'READ_CHUNK', 64)
+    record = {'code': '600000', 'data': [
+        {'date': '2025-03-31', 'open': 10.0, 'high': 10.8, 'low': 9.6, 'close': 10.5, 'volume': 1000,
+         'K': 55.12, 'D': 50.0, 'J': 65.36},
+        {'date': '2025-06-30', 'open': 10.5, 'high': 11.2, 'low': 10.1, 'close': 10.9, 'volume': 1200,
+         'K': 60.4, 'D': 53.47, 'J': 74.26},
+    ]}
+    packed = pack(record, STOCK_TICK)
+    assert 'bars' in packed
+    path = str(tmp_path / 'packed.ndjson')
+    with JsonArrayWriter(path) as writer:
+        writer.write(packed)
+    assert list(iter_records(path)) == [record]
+
+
+def test_tracked_pending_file():
+    path = os.path.join(ROOT, json_stream.PENDING_FILE)
+    with open(path, 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    assert list(iter_records(path)) == expected
@@ -0,0 +1,65 @@
+"""indicators.KDJState: 增量递推与 kdj_arrays 对整段 K 线重算的结果逐位一致"""
+
+import json
+
+import numpy as np
+import pytest
+
+from indicators import KDJState, kdj_arrays
+
+
+def random_records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.03, n))), 2)
+    spread = np.round(np.abs(rng.normal(0, 0.02, n)) * close, 2)
+    dates = np.datetime_as_string(np.datetime64('2024-01-07') + np.arange(n) * 7, unit='D')
+    return [{'date': str(d), 'high': float(c + s), 'low': float(c - s), 'close': float(c)}
+            for d, c, s in zip(dates, close, spread)]
+
+
+def full_kdj(records, n=9, m1=3, m2=3):
+    k, d, j = kdj_arrays(*(np.array([r[key] for r in records]) for key in ('high', 'low', 'close')), n, m1, m2)
+    return k[-1], d[-1], j[-1]
+
+
+@pytest.mark.parametrize('n, m1, m2', [(9, 3, 3), (5, 2, 4), (1, 3, 3)])
+def test_every_prefix_matches_full_recompute(n, m1, m2):
+    records = random_records(40, seed=n)
+    state = KDJState(n, m1, m2)
+    for i, record in enumerate(records, 1):
+        assert state.update(record) == full_kdj(records[:i], n, m1, m2)
+
+
+def test_revising_the_last_bar():
+    records = random_records(30, seed=1)
+    state = KDJState.from_bars(records)
+    revised = dict(records[-1], high=records[-1]['high'] + 5, close=records[-1]['close'] + 4)
+    assert state.update(revised) == full_kdj(records[:-1] + [revised])
+    # 再改回去，结果与从未修正过相同
+    assert state.update(records[-1]) == full_kdj(records)
+
+
+def test_serialized_state_continues():
+    records = random_records(35, seed=2)
+    state = KDJState.from_bars(records[:20])
+    restored = KDJState.from_dict(json.loads(json.dumps(state.to_dict())))
+    assert restored.value == state.value
+    for record in records[20:]:
+        value = restored.update(record)
+    assert value == full_kdj(records)
+    # 状态只保留最近 n-1 根 K 线的极值
+    assert len(restored.highs) <= restored.n - 1 and len(restored.lows) <= restored.n - 1
+
+
+def test_flat_bars_use_rsv_50():
+    records = [{'date': f"2024-01-{day:02d}", 'high': 10.0, 'low': 10.0, 'close': 10.0} for day in range(1, 6)]
+    value = KDJState.from_bars(records).value
+    assert value == full_kdj(records)
+    assert value == pytest.approx((50.0, 50.0, 50.0))
+
+
+def test_dates_must_not_go_back():
+    records = random_records(3)
+    state = KDJState.from_bars(records)
+    with pytest.raises(ValueError):
+        state.update(records[0])
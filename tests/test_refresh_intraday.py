@@ -0,0 +1,63 @@
+"""refresh_intraday.apply_quote: 同周更新、下一周首日追加，缺周 / 周中首次刷新 / 日期倒退时跳过且不改动合约"""
+
+import copy
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+import mock_akshare
+
+sys.modules.setdefault('akshare', mock_akshare)
+
+from indicators import KDJState  # noqa: E402
+from refresh_intraday import apply_quote, first_trading_day  # noqa: E402
+
+QUOTE = {'open': 101.0, 'high': 112.0, 'low': 95.0, 'trade': 108.0}
+
+
+def make_contract(last_week='2026-02-15', n=5):
+    last = date.fromisoformat(last_week)
+    records = [{'date': (last - timedelta(days=7 * (n - 1 - i))).isoformat(), 'open': 100.0,
+                'high': 105.0 + i, 'low': 96.0 - i, 'close': 100.0 + i, 'volume': 10} for i in range(n)]
+    return {'symbol': 'RB2605', 'data': records, 'kdjState': KDJState.from_bars(records).to_dict()}
+
+
+def test_first_trading_day_is_monday():
+    assert first_trading_day(date(2026, 2, 16))
+    assert not first_trading_day(date(2026, 2, 17))
+    assert not first_trading_day(date(2026, 2, 21))
+
+
+def test_same_week_updates_last_bar():
+    contract = make_contract()
+    last = dict(contract['data'][-1])
+    latest, reason = apply_quote(contract, QUOTE, date(2026, 2, 12))
+    assert reason is None and latest is contract['latestKDJ']
+    assert len(contract['data']) == 5
+    bar = contract['data'][-1]
+    assert bar['date'] == '2026-02-15' and bar['open'] == last['open']
+    assert bar['high'] == 112.0 and bar['low'] == last['low'] == 92.0 and bar['close'] == 108.0
+    assert (bar['K'], bar['D'], bar['J']) == (latest['K'], latest['D'], latest['J'])
+
+
+def test_next_week_first_day_appends_bar():
+    contract = make_contract()
+    latest, reason = apply_quote(contract, QUOTE, date(2026, 2, 16), keep=5)
+    assert reason is None and latest is not None
+    assert [r['date'] for r in contract['data']][-2:] == ['2026-02-15', '2026-02-22']
+    assert len(contract['data']) == 5
+    assert contract['data'][-1]['open'] == 101.0
+
+
+@pytest.mark.parametrize('day, reason', [
+    (date(2026, 2, 23), '缺少 2026-02-22'),
+    (date(2026, 2, 18), '不是本周第一个交易日'),
+    (date(2026, 2, 2), '早于最后一根 K 线'),
+])
+def test_unsafe_dates_skip_without_touching_contract(day, reason):
+    contract = make_contract()
+    before = copy.deepcopy(contract)
+    latest, message = apply_quote(contract, QUOTE, day)
+    assert latest is None and reason in message
+    assert contract == before
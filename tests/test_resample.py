@@ -0,0 +1,113 @@
+"""resample: 与 pandas resample(...).agg(...).dropna() 的结果 (含 dtype) 完全一致"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_series import BarSeries
+from bar_store import BAR_DTYPE
+from resample import append_day, multi_timeframe, period_label, resample_bars, resample_frame, resample_many
+
+PANDAS_FREQ = {'W': 'W', 'M': 'ME', 'Q': 'QE'}
+AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def random_daily(rng, n, with_nan=False, int_prices=False):
+    """交易日 (跳过周末，另随机去掉一些日子，可能整月 / 整季没有数据)"""
+    days = pd.bdate_range('2023-12-25', periods=int(n * 1.6))
+    days = np.sort(rng.choice(days, size=n, replace=False))
+    if rng.random() < 0.5:
+        days = days[(days < np.datetime64('2024-05-01')) | (days >= np.datetime64('2024-09-01'))]
+    n = len(days)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    df = pd.DataFrame({
+        'date': days,
+        'open': close + rng.normal(0, 0.5, n),
+        'high': close + 2,
+        'low': close - 2,
+        'close': close,
+        'volume': rng.integers(0, 10000, n),
+    })
+    if int_prices:
+        for name in ('open', 'high', 'low', 'close'):
+            df[name] = df[name].round().astype(np.int64)
+    if with_nan and n:
+        for name in ('open', 'high', 'low', 'close'):
+            df.loc[rng.random(n) < 0.1, name] = np.nan
+    return df
+
+
+def pandas_resample(df, freq):
+    out = df.set_index('date').resample(PANDAS_FREQ[freq]).agg(AGG).dropna().reset_index()
+    out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+    return out
+
+
+@pytest.mark.parametrize('freq', ['W', 'M', 'Q'])
+@pytest.mark.parametrize('seed', range(12))
+def test_resample_frame_matches_pandas(freq, seed):
+    rng = np.random.default_rng(seed)
+    df = random_daily(rng, int(rng.integers(0, 300)), with_nan=seed % 3 == 1, int_prices=seed % 3 == 2)
+    expected = pandas_resample(df, freq)
+    result = resample_frame(df, freq)
+    pd.testing.assert_frame_equal(result.drop(columns='date'), expected.drop(columns='date'))
+    assert result['date'].tolist() == expected['date'].tolist()
+
+
+def to_store_array(df):
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars['date'] = df['date'].to_numpy().astype('datetime64[D]')
+    for name in ('open', 'high', 'low', 'close', 'volume'):
+        bars[name] = df[name]
+    return bars
+
+
+@pytest.mark.parametrize('freq', ['W', 'M', 'Q'])
+def test_resample_many_matches_each_series(freq):
+    rng = np.random.default_rng(42)
+    frames = [random_daily(rng, n, with_nan=i % 2 == 1) for i, n in enumerate((250, 0, 40, 1, 180))]
+    bars_list = [to_store_array(df) for df in frames]
+    batched = resample_many(bars_list, freq)
+    assert len(batched) == len(frames)
+    for bars, df, series in zip(bars_list, frames, batched):
+        single = resample_bars(bars, freq)
+        expected = pandas_resample(df, freq)
+        for name in BarSeries.FIELDS:
+            np.testing.assert_array_equal(getattr(series, name), getattr(single, name))
+        assert np.datetime_as_string(series.date, unit='D').tolist() == expected['date'].tolist()
+        np.testing.assert_array_equal(series.close, expected['close'])
+    assert resample_many([], freq) == []
+
+
+def test_multi_timeframe_matches_direct_resample():
+    bars = to_store_array(random_daily(np.random.default_rng(7), 400))
+    out = multi_timeframe(bars)
+    assert list(out) == ['W', 'M', 'Q']
+    for freq, series in out.items():
+        direct = resample_bars(bars, freq)
+        for name in BarSeries.FIELDS:
+            np.testing.assert_array_equal(getattr(series, name), getattr(direct, name))
+
+
+def test_period_labels():
+    assert period_label('2024-01-03', 'W') == '2024-01-07'     # 周三 -> 当周周日
+    assert period_label('2024-01-07', 'W') == '2024-01-07'
+    assert period_label('2024-02-10', 'M') == '2024-02-29'
+    assert period_label('2024-11-15', 'Q') == '2024-12-31'
+    with pytest.raises(ValueError):
+        period_label('2024-01-01', 'Y')
+
+
+def test_append_day_updates_or_extends():
+    df = random_daily(np.random.default_rng(3), 60)
+    df = df[df['date'] < np.datetime64('2024-03-01')]
+    series = resample_bars(to_store_array(df), 'Q')
+    last_close = series.close[-1]
+    same = append_day(series, 'Q', '2024-03-29', 1.0, 1000.0, 0.5, 99.0, 10)
+    assert same is series and series.close[-1] == 99.0 and series.high[-1] == 1000.0
+    assert series.close[-1] != last_close and np.isnan(series.K[-1])
+    longer = append_day(series, 'Q', '2024-04-01', 98.0, 99.0, 97.0, 98.5, 5)
+    assert len(longer) == len(series) + 1
+    assert str(longer.date[-1]) == '2024-06-30' and longer.open[-1] == 98.0
+    with pytest.raises(ValueError):
+        append_day(longer, 'Q', '2023-12-29', 1, 1, 1, 1)
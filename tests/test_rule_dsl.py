@@ -0,0 +1,149 @@
+"""rule_dsl: 编译出的数组表达式与逐行 Python 求值一致，配置文件中的规则集都能编译"""
+
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from rule_dsl import RULES_FILE, RuleSet, RuleSyntaxError, compile_expr, load_rule_sets
+from rule_engine import BarPanel, PANEL_FIELDS
+
+BARS = 4
+EXPRESSIONS = [
+    "w2.high > w1.high and w3.close > w1.low and w3.close <= w2.high and K > D",
+    "w1.high > w2.high > w3.high and K < D",
+    "not (w3.low > w2.low and w4.close > w3.high) or w4.close < w3.low",
+    "w4.close <= max(w2.high, w3.high) and abs(w4.close - w3.close) / w3.close < 0.02",
+    "w3.low > w2.low and w2.low <= lowest(low, 6, 3)",
+    "w3.high >= highest(high, 6, 3) + 1.5 * -2",
+    "J > 100 or J < 0",
+]
+
+
+def random_panel(rows=400, window=6, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, (rows, window)), axis=1)
+    fields = {
+        'open': close + rng.normal(0, 0.5, close.shape),
+        'high': close + np.abs(rng.normal(0, 1, close.shape)),
+        'low': close - np.abs(rng.normal(0, 1, close.shape)),
+        'close': close,
+        'K': rng.uniform(0, 100, close.shape),
+        'D': rng.uniform(0, 100, close.shape),
+        'J': rng.uniform(-20, 120, close.shape),
+    }
+    length = rng.integers(0, window + 1, rows)
+    for name in PANEL_FIELDS:
+        # 右对齐，不足的在前面补 NaN
+        fields[name][np.arange(window) < window - length[:, np.newaxis]] = np.nan
+    return BarPanel([(f"P{i}", "") for i in range(rows)], length, **fields)
+
+
+class _Latest(float):
+    """最新一根 K 线的字段值，同时记住字段名 (lowest / highest 的第一个参数)"""
+
+    def __new__(cls, value, field):
+        obj = super().__new__(cls, value)
+        obj.field = field
+        return obj
+
+
+def row_value(panel, i, expr):
+    """逐行用 Python 求值 (wN 为最新一根)"""
+    def bar(offset):
+        return SimpleNamespace(**{name: getattr(panel, name)[i, -offset] for name in PANEL_FIELDS})
+
+    def window(func, latest, start, stop):
+        column = getattr(panel, latest.field)[i, -start:(-(stop - 1) or None)]
+        values = [v for v in column if not math.isnan(v)]
+        return func(values) if values else math.nan
+
+    def nan_max(a, b):
+        return b if math.isnan(a) else a if math.isnan(b) else max(a, b)
+
+    names = {f"w{k}": bar(BARS - k + 1) for k in range(1, BARS + 1)}
+    names.update({name: _Latest(getattr(panel, name)[i, -1], name) for name in PANEL_FIELDS})
+    names.update(max=nan_max, abs=abs,
+                 lowest=lambda field, a, b: window(min, field, a, b),
+                 highest=lambda field, a, b: window(max, field, a, b))
+    return eval(expr, {}, names)
+
+
+@pytest.mark.parametrize('expr', EXPRESSIONS)
+def test_compiled_expression_matches_python(expr):
+    panel = random_panel()
+    func, depth = compile_expr(expr, BARS)
+    assert depth <= panel.window
+    result = func(panel, {})
+    expected = [bool(row_value(panel, i, expr)) for i in range(len(panel))]
+    assert any(expected) and not all(expected)
+    assert result.tolist() == expected
+
+
+def test_window_depth():
+    assert compile_expr("w3.close > w1.close", 3)[1] == 3
+    assert compile_expr("w4.close > w3.high", 4)[1] == 2
+    assert compile_expr("w2.low <= lowest(low, 13, 4)", 4)[1] == 13
+
+
+def test_latest_fields_take_overrides():
+    panel = random_panel(rows=50)
+    func, _ = compile_expr("K > D", 3)
+    k = np.full(len(panel), 60.0)
+    d = np.full(len(panel), 40.0)
+    assert func(panel, {'K': k, 'D': d}).all()
+    assert not func(panel, {'K': d, 'D': k}).any()
+    np.testing.assert_array_equal(func(panel, {'K': None}), panel.K[:, -1] > panel.D[:, -1])
+
+
+@pytest.mark.parametrize('expr', [
+    "w4.close > w3.high",           # 超出 3 根 K 线
+    "w1.volume_ma > 0",             # 未知字段
+    "foo > 1",                      # 未知名称
+    "lowest(low, 2, 4) > 0",        # start < stop
+    "lowest(w1.low, 4, 2) > 0",     # 第一个参数不是字段名
+    "sum(w1.high, w2.high) > 0",    # 未知函数
+    "w1.high in w2.high",           # 不支持的比较
+    "w1.high >",                    # 语法错误
+])
+def test_syntax_errors(expr):
+    with pytest.raises(RuleSyntaxError):
+        compile_expr(expr, 3)
+
+
+def test_exclusive_and_independent_rule_sets():
+    panel = random_panel(rows=300)
+    rules = [{'status': 'up', 'when': "w3.close > w2.close"},
+             {'status': 'strong', 'when': "w3.close > w2.close and w3.close > w1.close"}]
+    exclusive = RuleSet('x', rules).masks(panel)
+    independent = RuleSet('y', rules, exclusive=False).masks(panel)
+    assert independent['strong'].any()
+    assert not exclusive['strong'].any()
+    np.testing.assert_array_equal(exclusive['up'], independent['up'])
+    assert not (exclusive['up'] & (panel.length < 3)).any()
+
+
+def test_levels_follow_status():
+    panel = random_panel(rows=300)
+    rule_set = RuleSet('z', [{'status': 'long', 'when': "w3.close > w2.high",
+                              'levels': {'breakout': "w2.high", 'stop': "min(w3.low, w2.low)"}}])
+    status, levels = rule_set.levels(panel)
+    hit = status == 'long'
+    assert hit.any()
+    np.testing.assert_array_equal(levels['breakout'][hit], panel.high[hit, -2])
+    assert np.isnan(levels['stop'][~hit]).all()
+
+
+def test_config_rule_sets_compile():
+    rule_sets = load_rule_sets(RULES_FILE)
+    for name in ('s1', 's2', 'stock_pending', 'pending_kdj', 'scan_pending', 'trend', 'first_breakout',
+                 'analyze_s1', 'analyze_s2'):
+        assert name in rule_sets
+    assert rule_sets['first_breakout'].window == 13
+    assert rule_sets['first_breakout'].min_bars == 12
+    assert rule_sets['scan_pending'].exclusive is False
+    panel = random_panel(rows=20, window=13)
+    for rule_set in rule_sets.values():
+        for mask in rule_set.masks(panel).values():
+            assert mask.shape == (len(panel),) and mask.dtype == bool
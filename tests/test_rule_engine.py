@@ -0,0 +1,99 @@
+"""rule_engine: 矩阵求值与原脚本逐个合约的判断一致"""
+
+import numpy as np
+import pytest
+
+from bar_series import BarSeries
+from bench_rule_engine import first_breakout_loop, make_universe, s2_loop, trend_loop
+from rule_engine import RULE_SETS, BarPanel, PATTERN_WINDOW, classify_latest, evaluate, pattern_status
+
+
+def s1_loop(bars):
+    """原 fetch_futures.check_rules 规则1 (KDJ 取最后一根 K 线)"""
+    if len(bars) < 3:
+        return None
+    h1, h2, h3 = bars.high[-3:]
+    if h2 > h3 and bars.K[-1] > bars.D[-1]:
+        return 'long'
+    if h1 > h2 > h3 and bars.K[-1] < bars.D[-1]:
+        return 'short'
+    return None
+
+
+def analyze_loop(bars):
+    """原 analyze_rules.check_rules -> (规则1, 规则2)"""
+    if len(bars) < 3:
+        return None, None
+    h1, h2, h3 = bars.high[-3:]
+    l1, l2, _ = bars.low[-3:]
+    c3 = bars.close[-1]
+    p1 = p2 = None
+    if h1 > h2 and bars.K[-1] > bars.D[-1]:
+        p1 = 'long'
+    elif h1 > h2 > h3 and bars.K[-1] < bars.D[-1]:
+        p1 = 'short'
+    if h1 > h2 and c3 > h2:
+        p2 = 'long'
+    elif l1 < l2 and c3 < l2:
+        p2 = 'short'
+    return p1, p2
+
+
+@pytest.fixture(scope='module')
+def universe():
+    # 另加长度 0 ~ 2 根的合约，覆盖不足规则窗口的情况
+    universe = make_universe(600, 13, seed=7)
+    return universe + [(key, bars.tail(i % 3)) for i, (key, bars) in enumerate(universe[:30])]
+
+
+@pytest.fixture(scope='module')
+def panel(universe):
+    return BarPanel.from_series(universe, max(PATTERN_WINDOW.values()))
+
+
+@pytest.mark.parametrize('name, loop', [('s1', s1_loop), ('s2', s2_loop), ('trend', trend_loop),
+                                        ('first_breakout', first_breakout_loop)])
+def test_pattern_matches_scalar_loop(universe, panel, name, loop):
+    expected = [loop(bars) for _, bars in universe]
+    assert any(expected)
+    assert list(pattern_status(panel, name)) == expected
+
+
+def test_analyze_rule_sets_match_original(universe, panel):
+    expected = [analyze_loop(bars) for _, bars in universe]
+    s1 = RULE_SETS['analyze_s1'].status(panel)
+    s2 = RULE_SETS['analyze_s2'].status(panel)
+    assert list(zip(s1, s2)) == expected
+
+
+def test_panel_is_right_aligned():
+    bars = BarSeries(np.arange(2).astype('datetime64[D]'), [1, 2], [3, 4], [0, 1], [2, 3])
+    panel = BarPanel.from_series([(('A', 'A1'), bars)], 4)
+    assert panel.length.tolist() == [2]
+    assert np.isnan(panel.high[0, :2]).all()
+    assert panel.col('high', 1)[0] == 4 and panel.col('high', 2)[0] == 3
+
+
+def test_external_kdj_overrides_last_column(universe, panel):
+    k = np.full(len(panel), 80.0)
+    d = np.full(len(panel), 20.0)
+    status = pattern_status(panel, 's2', k=k, d=d)
+    assert 'short' not in set(status) and 'pending_short' not in set(status)
+
+
+def test_classify_latest_matches_panel(universe):
+    for key, bars in universe[:100]:
+        if len(bars) < 3:
+            continue
+        single = BarPanel.from_series([(key, bars)], 3)
+        k, d = bars.K[-1:], bars.D[-1:]
+        expected = (pattern_status(single, 's1')[0], pattern_status(single, 's2')[0])
+        assert classify_latest(bars.high, bars.low, bars.close, k, d) == expected
+
+
+def test_evaluate_lists_every_hit(universe, panel):
+    signals = evaluate(panel, ['s2', 'trend'])
+    expected = sum(1 for name in ('s2', 'trend') for s in pattern_status(panel, name) if s)
+    assert len(signals) == expected
+    rows = [panel.keys.index((s.instrument, s.contract)) for s in signals]
+    assert rows == sorted(rows)
@@ -0,0 +1,103 @@
+"""scan_checkpoint: 中断后续跑、失败台账和异常分类"""
+
+import errno
+import http.client
+import socket
+import urllib.error
+
+import pytest
+
+from scan_checkpoint import RETRYABLE, ScanCheckpoint, ScanStats, classify_error, read_lines
+
+UNIVERSE = [('600000', '浦发银行'), ('000001', '平安银行'), ('300750', '宁德时代')]
+RESULT = {'code': '600000', 'status': 'pending_long', 'data': [
+    {'date': '2025-03-31', 'open': 10.0, 'high': 10.8, 'low': 9.6, 'close': 10.5, 'volume': 1000,
+     'K': 55.12, 'D': 50.0, 'J': 65.36},
+    {'date': '2025-06-30', 'open': 10.5, 'high': 11.2, 'low': 10.1, 'close': 10.9, 'volume': 1200,
+     'K': 60.4, 'D': 53.47, 'J': 74.26},
+]}
+
+
+def test_resume_skips_done_codes(tmp_path):
+    root = str(tmp_path / 'state')
+    checkpoint = ScanCheckpoint('2025-07-01', root)
+    checkpoint.record('600000', 'ok', RESULT)
+    checkpoint.record('000001', 'skip')
+    checkpoint.fail('300750', 'network', 'ConnectionError: reset', 1)
+    checkpoint.close()
+
+    resumed = ScanCheckpoint('2025-07-01', root)
+    assert resumed.resumed == 2
+    assert resumed.pending(UNIVERSE) == [('300750', '宁德时代')]
+    assert resumed.failures['300750']['category'] == 'network'
+    assert list(resumed.results()) == [RESULT]
+    # 失败后重试成功，台账中不再算失败
+    resumed.record('300750', 'ok', dict(RESULT, code='300750'))
+    assert not resumed.failures and not resumed.pending(UNIVERSE)
+    resumed.close()
+
+
+def test_results_are_stored_encoded(tmp_path):
+    checkpoint = ScanCheckpoint('run', str(tmp_path))
+    checkpoint.record('600000', 'ok', RESULT)
+    checkpoint.close()
+    line = next(read_lines(checkpoint.done_path))
+    assert 'bars' in line['result'] and 'data' not in line['result']
+
+
+def test_new_run_key_starts_over(tmp_path):
+    root = str(tmp_path / 'state')
+    checkpoint = ScanCheckpoint('2025-07-01', root)
+    checkpoint.record('600000', 'ok', RESULT)
+    checkpoint.close()
+    fresh = ScanCheckpoint('2025-07-02', root)
+    assert fresh.resumed == 0 and len(fresh.pending(UNIVERSE)) == 3
+    fresh.close()
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    checkpoint = ScanCheckpoint('run', str(tmp_path))
+    checkpoint.record('600000', 'ok', RESULT)
+    checkpoint.close()
+    with open(checkpoint.done_path, 'a', encoding='utf-8') as f:
+        f.write('{"code": "000001", "sta')
+    resumed = ScanCheckpoint('run', str(tmp_path))
+    assert resumed.done == {'600000'}
+    resumed.close()
+
+
+def test_stats_summary(tmp_path):
+    checkpoint = ScanCheckpoint('run', str(tmp_path))
+    stats = ScanStats()
+    for code, outcome in (('600000', 'ok'), ('000001', 'network'), ('000001', 'ok'), ('300750', 'io')):
+        stats.add(code, outcome)
+        if outcome == 'ok':
+            checkpoint.record(code, outcome, RESULT)
+        else:
+            checkpoint.fail(code, outcome, "error", 1)
+    summary = stats.summary(checkpoint)
+    checkpoint.close()
+    assert summary['processed'] == 3 and summary['attempts'] == 4 and summary['ok'] == 2
+    assert summary['failed'] == {'io': 1}
+    assert summary['failure_rate'] == pytest.approx(1 / 3)
+
+
+@pytest.mark.parametrize('exc, category', [
+    (ConnectionResetError(), 'network'),
+    (TimeoutError(), 'network'),
+    (socket.timeout(), 'network'),
+    (socket.gaierror(), 'network'),
+    (urllib.error.URLError('unreachable'), 'network'),
+    (http.client.RemoteDisconnected(), 'network'),
+    (FileNotFoundError('bar_cache/daily/600000.npy'), 'io'),
+    (PermissionError(), 'io'),
+    (OSError(errno.ENOSPC, 'No space left on device'), 'io'),
+    (ValueError('bad frame'), 'parse'),
+    (KeyError('收盘'), 'parse'),
+])
+def test_classify_error(exc, category):
+    assert classify_error(exc) == category
+
+
+def test_only_network_and_empty_are_retried():
+    assert set(RETRYABLE) == {'network', 'empty'}